@@ -248,6 +248,8 @@ private function processPrediction(Student $student, ?string $model = null)
             $response = Http::timeout(30)->post($mlUrl, [
                 'data' => $inputData,
                 'model' => $modelName,
+                // Schema hash instead of the full schema in model_metadata
+                'compact' => true,
             ]);
 
             if (! $response->successful()) {
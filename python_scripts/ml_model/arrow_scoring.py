@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+import numpy as np
+
+try:  # optional: only the Arrow endpoint and CLI need it
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except ImportError:  # pragma: no cover
+    pa = None
+    ipc = None
+
+from features import FEATURE_NAMES, SCHEMA_FINGERPRINT, normalize_frame
+from metrics import StageTimer
+from predict import DEFAULT_MODEL_PATH, _classify, _encode_frame, _load_model, _resolve_engine
+
+
+logger = logging.getLogger(__name__)
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+ARROW_FILE_MEDIA_TYPE = "application/vnd.apache.arrow.file"
+# Rows normalized and scored at a time; larger input batches are sliced.
+DEFAULT_ARROW_BATCH_ROWS = int(os.environ.get("ARROW_BATCH_ROWS", 65536))
+
+_FILE_MAGIC = b"ARROW1"
+
+
+class ArrowUnavailableError(RuntimeError):
+    """Raised when Arrow scoring is requested but pyarrow is not installed."""
+
+
+def require_pyarrow() -> None:
+    if pa is None:
+        raise ArrowUnavailableError("Arrow scoring requires the optional 'pyarrow' package")
+
+
+def _open_reader(source: "pa.NativeFile") -> Any:
+    """An IPC file or stream reader, chosen from the magic bytes of ``source``."""
+    is_file_format = source.read(len(_FILE_MAGIC)) == _FILE_MAGIC
+    source.seek(0)
+    try:
+        return ipc.open_file(source) if is_file_format else ipc.open_stream(source)
+    except pa.ArrowInvalid as exc:
+        raise ValueError(f"Body is not a valid Arrow IPC stream or file: {exc}") from exc
+
+
+def _iter_batches(reader: Any, max_rows: int) -> Iterator["pa.RecordBatch"]:
+    if isinstance(reader, ipc.RecordBatchFileReader):
+        batches = (reader.get_batch(index) for index in range(reader.num_record_batches))
+    else:
+        batches = iter(reader)
+    for batch in batches:
+        for offset in range(0, batch.num_rows, max_rows):
+            yield batch.slice(offset, max_rows)
+
+
+def output_schema(class_labels: list[str], id_column: Optional["pa.Field"] = None) -> "pa.Schema":
+    fields = [] if id_column is None else [id_column]
+    fields += [pa.field("prediction", pa.string()), pa.field("confidence", pa.float64())]
+    fields += [pa.field(f"probability_{label}", pa.float64()) for label in class_labels]
+    return pa.schema(fields)
+
+
+def score_arrow_file(
+    input_path: Path | str,
+    output_path: Path | str,
+    model_path: Path | str = DEFAULT_MODEL_PATH,
+    engine: Optional[str] = None,
+    id_column: Optional[str] = None,
+    batch_rows: int = DEFAULT_ARROW_BATCH_ROWS,
+    timer: Optional[StageTimer] = None,
+) -> Dict[str, int]:
+    """Score an Arrow IPC stream or file and write the results as an Arrow IPC stream.
+
+    The input is memory-mapped, and only the columns named in
+    ``describe_features()`` are converted to pandas, ``batch_rows`` at a time,
+    so memory stays bounded by the batch size rather than the upload size.
+    Missing columns and null cells take the feature defaults, as in
+    non-strict :func:`predict.predict_batch`. Each output batch holds
+    ``prediction``, ``confidence`` and one ``probability_<class>`` column per
+    class, row-aligned with the input, plus ``id_column`` copied through when
+    given. The model path and schema hash are stored in the schema metadata.
+    """
+    require_pyarrow()
+    if batch_rows < 1:
+        raise ValueError("batch_rows must be at least 1")
+
+    timer = timer if timer is not None else StageTimer()
+    model_path = Path(model_path)
+    with timer.stage("load"):
+        model_payload = _load_model(model_path)
+        engine = _resolve_engine(model_payload, engine)
+    class_labels = model_payload["class_labels"]
+    label_array = pa.array(class_labels, type=pa.string())
+
+    counts = {"rows": 0, "batches": 0}
+    with pa.memory_map(str(input_path), "r") as source:
+        with timer.stage("read"):
+            reader = _open_reader(source)
+            input_schema = reader.schema
+        if id_column is not None and id_column not in input_schema.names:
+            raise ValueError(f"Column '{id_column}' is not in the Arrow input")
+        feature_columns = [name for name in input_schema.names if name in FEATURE_NAMES]
+        id_field = input_schema.field(id_column) if id_column is not None else None
+        schema = output_schema(class_labels, id_field).with_metadata(
+            {"model_path": model_path.name, "feature_schema_hash": SCHEMA_FINGERPRINT}
+        )
+
+        with pa.OSFile(str(output_path), "wb") as sink, ipc.new_stream(sink, schema) as writer:
+            for batch in _iter_batches(reader, batch_rows):
+                with timer.stage("read"):
+                    frame = batch.select(feature_columns).to_pandas()
+                with timer.stage("normalize"):
+                    input_df = normalize_frame(frame)
+                with timer.stage("encode"):
+                    encoded = _encode_frame(model_payload, input_df)
+                with timer.stage("classify"):
+                    probabilities = _classify(model_payload, encoded, engine)
+                with timer.stage("format"):
+                    predicted = probabilities.argmax(axis=1)
+                    columns = [] if id_column is None else [batch.column(id_column)]
+                    columns += [
+                        label_array.take(pa.array(predicted)),
+                        pa.array(probabilities[np.arange(len(predicted)), predicted], type=pa.float64()),
+                    ]
+                    columns += [pa.array(probabilities[:, index], type=pa.float64()) for index in range(len(class_labels))]
+                with timer.stage("write"):
+                    writer.write_batch(pa.RecordBatch.from_arrays(columns, schema=schema))
+                counts["rows"] += batch.num_rows
+                counts["batches"] += 1
+
+    return counts
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from predict import INFERENCE_ENGINES
+
+    parser = argparse.ArgumentParser(description="Score an Arrow IPC file or stream of student features")
+    parser.add_argument("input", type=Path, help="Arrow IPC file or stream with describe_features() columns")
+    parser.add_argument("output", type=Path, help="Arrow IPC stream to write the predictions to")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH, help="Model file to score with")
+    parser.add_argument("--engine", choices=INFERENCE_ENGINES, default=None)
+    parser.add_argument("--id-column", default=None, help="Input column copied into the output")
+    parser.add_argument("--batch-rows", type=int, default=DEFAULT_ARROW_BATCH_ROWS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    started = time.perf_counter()
+    counts = score_arrow_file(
+        args.input,
+        args.output,
+        model_path=args.model,
+        engine=args.engine,
+        id_column=args.id_column,
+        batch_rows=args.batch_rows,
+    )
+    elapsed = time.perf_counter() - started
+    logger.info("Scored %s rows in %s batches in %.2fs (%.0f rows/s)", counts["rows"], counts["batches"], elapsed, counts["rows"] / elapsed)
@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import joblib
+
+
+BASE_DIR = Path(__file__).resolve().parent
+MMAP_SUFFIX = ".mmap.joblib"
+COMPACT_SUFFIX = ".compact.joblib"
+
+logger = logging.getLogger(__name__)
+
+# os.umask can only be read by setting it, so it is sampled once at import,
+# before any worker threads exist.
+_UMASK = os.umask(0o022)
+os.umask(_UMASK)
+
+# Keys of a full payload that a serving artifact keeps; the sklearn pipeline is
+# dropped because its trees cannot be memory-mapped (they are copied into the
+# Cython Tree on unpickling).
+SERVING_KEYS = (
+    "label_encoder",
+    "feature_names",
+    "feature_schema",
+    "feature_importances",
+    "metrics",
+    "target_categories",
+    "compiled_encoder",
+    "flat_forest",
+    "lineage",
+)
+
+_MEMORY_PROBE = """
+import json
+import sys
+sys.path.insert(0, sys.argv[1])
+
+import numpy as np
+from artifacts import load_artifact
+
+# Import sklearn and the compiled classes up front so only the payload is measured.
+import compiled
+import forest
+
+
+def status():
+    values = {}
+    with open("/proc/self/status", encoding="utf-8") as fp:
+        for line in fp:
+            key, _, rest = line.partition(":")
+            if key in ("RssAnon", "RssFile"):
+                values[key] = int(rest.split()[0]) * 1024
+    return values
+
+
+before = status()
+payload = load_artifact(sys.argv[2])
+if payload.get("flat_forest") is not None:
+    encoder = payload["compiled_encoder"]
+    payload["flat_forest"].predict_proba(np.zeros((1, encoder.n_outputs), dtype=np.float32))
+after = status()
+print(json.dumps({key: after[key] - before[key] for key in after}))
+"""
+
+
+def is_mmap_artifact(path: Path | str) -> bool:
+    return str(path).endswith(MMAP_SUFFIX)
+
+
+def mmap_artifact_path(model_path: Path | str) -> Path:
+    path = Path(model_path)
+    return path.with_name(path.name[: -len(".joblib")] + MMAP_SUFFIX)
+
+
+def compact_artifact_path(model_path: Path | str) -> Path:
+    path = Path(model_path)
+    return path.with_name(path.name[: -len(".joblib")] + COMPACT_SUFFIX)
+
+
+def default_permissions(path: Path | str) -> None:
+    """Give a ``mkstemp`` file (always 0600) the mode a plain ``open`` would have created it with."""
+    os.chmod(path, 0o666 & ~_UMASK)
+
+
+def dump_atomic(value: Any, path: Path | str, compress: int = 0) -> Path:
+    """``joblib.dump`` to a temporary file next to ``path``, then rename it into place.
+
+    Readers see either the previous file or the complete new one, never a
+    partial write, and processes that memory-mapped the previous file keep
+    their (unlinked) copy.
+    """
+    path = Path(path)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        joblib.dump(value, tmp_name, compress=compress)
+        default_permissions(tmp_name)
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+    return path
+
+
+def load_artifact(path: Path | str) -> Dict[str, Any]:
+    """Load a model payload, memory-mapping the arrays of serving artifacts.
+
+    Serving artifacts are written uncompressed, so ``mmap_mode="r"`` maps the
+    tree, leaf, scaler and encoder arrays straight from the file and every
+    worker process shares the same page-cache copy.
+    """
+    if is_mmap_artifact(path):
+        return joblib.load(path, mmap_mode="r")
+    return joblib.load(path)
+
+
+def build_serving_payload(model_payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Array-only copy of ``model_payload`` or ``None`` if it cannot be served without sklearn."""
+    if model_payload.get("compiled_encoder") is None or model_payload.get("flat_forest") is None:
+        return None
+    serving_payload = {key: model_payload[key] for key in SERVING_KEYS if key in model_payload}
+    serving_payload["inference_engine"] = "flat"
+    return serving_payload
+
+
+def write_mmap_artifact(model_payload: Dict[str, Any], model_path: Path | str) -> Optional[Path]:
+    serving_payload = build_serving_payload(model_payload)
+    if serving_payload is None:
+        logger.warning("Skipping memory-mapped export for %s: no compiled encoder or flat forest", model_path)
+        return None
+
+    serving_payload["flat_forest"].precompute_node_deltas()
+    output_path = mmap_artifact_path(model_path)
+    dump_atomic(serving_payload, output_path)
+    return output_path
+
+
+def write_compact_artifact(
+    model_payload: Dict[str, Any],
+    flat_forest: Any,
+    model_path: Path | str,
+    details: Dict[str, Any],
+    compress: int = 0,
+) -> Optional[Path]:
+    """Serving artifact of ``model_payload`` that scores with ``flat_forest`` instead.
+
+    ``details`` (how the forest was reduced, its macro-F1) is stored under
+    ``compact``. ``compress`` is a joblib zlib level; compressed artifacts are
+    smaller on disk but are decompressed into memory on load.
+    """
+    serving_payload = build_serving_payload(model_payload)
+    if serving_payload is None:
+        logger.warning("Skipping compact export for %s: no compiled encoder or flat forest", model_path)
+        return None
+
+    if not compress:
+        # Compressed artifacts are inflated into private memory anyway; lazy deltas cost nothing until used.
+        flat_forest.precompute_node_deltas()
+    serving_payload["flat_forest"] = flat_forest
+    serving_payload["compact"] = details
+    output_path = compact_artifact_path(model_path)
+    dump_atomic(serving_payload, output_path, compress=compress)
+    return output_path
+
+
+def measure_load_seconds(path: Path | str, repeats: int = 3) -> float:
+    """Fastest of ``repeats`` loads of ``path``; the first load also warms the page cache."""
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        load_artifact(path)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def measure_resident_memory(path: Path | str) -> Optional[Dict[str, int]]:
+    """Private (``RssAnon``) and file-backed (``RssFile``) bytes added by loading ``path``.
+
+    Runs in a fresh interpreter so the numbers are not skewed by what the
+    caller already has loaded. Returns ``None`` where ``/proc`` is unavailable.
+    """
+    if not Path("/proc/self/status").exists():
+        return None
+
+    completed = subprocess.run(
+        [sys.executable, "-c", _MEMORY_PROBE, str(BASE_DIR), str(path)],
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if completed.returncode != 0:
+        logger.warning("Memory probe failed for %s: %s", path, completed.stderr.strip())
+        return None
+    return json.loads(completed.stdout.strip().splitlines()[-1])
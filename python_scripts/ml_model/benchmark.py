@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+
+BASE_DIR = Path(__file__).resolve().parent
+DATASET_PATH = BASE_DIR.parent / "dataset.csv"
+BASELINE_PATH = BASE_DIR / "benchmark_baseline.json"
+DEFAULT_TOLERANCE = 0.25
+
+logger = logging.getLogger(__name__)
+
+# Metric name suffixes and whether a larger value is better.
+_DIRECTIONS = {"_ms": False, "_seconds": False, "_mib": False, "_per_sec": True}
+# Changes smaller than these are timer or allocator noise, whatever the ratio.
+_NOISE_FLOORS = {"_ms": 0.25, "_seconds": 0.05, "_mib": 8.0}
+
+
+def _peak_rss_mib() -> float:
+    # ru_maxrss is reported in KiB on Linux and in bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    values = np.asarray(samples) * 1000
+    return {
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "p99_ms": float(np.percentile(values, 99)),
+    }
+
+
+def _timed_calls(fn: Callable[[], Any], iterations: int) -> List[float]:
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def _scaled_dataset(scale: int) -> pd.DataFrame:
+    """``dataset.csv`` repeated ``scale`` times, as a stand-in for larger exports."""
+    from preprocess import RAW_DTYPES
+
+    raw_df = pd.read_csv(DATASET_PATH, dtype=RAW_DTYPES)
+    return pd.concat([raw_df] * scale, ignore_index=True)
+
+
+def _payloads(count: int) -> List[Dict[str, Any]]:
+    """``count`` normalized feature dicts derived from the dataset rows."""
+    from preprocess import CANONICAL_TARGET_COLUMN, transform_dataset
+
+    raw_df = _scaled_dataset(1)
+    if len(raw_df) < count:
+        raw_df = pd.concat([raw_df] * -(-count // len(raw_df)), ignore_index=True)
+    processed = transform_dataset(raw_df.head(count))
+    return processed.drop(columns=[CANONICAL_TARGET_COLUMN]).to_dict("records")
+
+
+def bench_predict_cold(options: Dict[str, Any]) -> Dict[str, float]:
+    """First ``predict()`` in a fresh process: model load plus one inference."""
+    from predict import DEFAULT_MODEL_PATH, predict
+
+    payload = _payloads(1)[0]
+    started = time.perf_counter()
+    predict(payload, model_path=DEFAULT_MODEL_PATH)
+    return {"first_call_ms": (time.perf_counter() - started) * 1000}
+
+
+def bench_predict_warm(options: Dict[str, Any]) -> Dict[str, float]:
+    from predict import DEFAULT_MODEL_PATH, predict
+
+    payloads = _payloads(options["iterations"])
+    predict(payloads[0], model_path=DEFAULT_MODEL_PATH)
+    cycle = iter(payloads)
+    samples = _timed_calls(lambda: predict(next(cycle), model_path=DEFAULT_MODEL_PATH), len(payloads))
+    return {**_percentiles(samples), "calls_per_sec": len(samples) / sum(samples)}
+
+
+def bench_single_vs_batch(options: Dict[str, Any]) -> Dict[str, float]:
+    from predict import DEFAULT_MODEL_PATH, predict, predict_batch
+
+    payloads = _payloads(options["batch_size"])
+    predict(payloads[0], model_path=DEFAULT_MODEL_PATH)
+
+    started = time.perf_counter()
+    for payload in payloads:
+        predict(payload, model_path=DEFAULT_MODEL_PATH)
+    single_seconds = time.perf_counter() - started
+
+    batch_samples = _timed_calls(lambda: predict_batch(payloads, model_path=DEFAULT_MODEL_PATH), 3)
+    batch_seconds = min(batch_samples)
+    return {
+        "single_rows_per_sec": len(payloads) / single_seconds,
+        "batch_rows_per_sec": len(payloads) / batch_seconds,
+        "batch_ms": batch_seconds * 1000,
+    }
+
+
+def bench_transform_dataset(options: Dict[str, Any]) -> Dict[str, float]:
+    from preprocess import transform_dataset
+
+    raw_df = _scaled_dataset(options["scale"])
+    samples = _timed_calls(lambda: transform_dataset(raw_df), 3)
+    return {"rows": float(len(raw_df)), "best_ms": min(samples) * 1000, "rows_per_sec": len(raw_df) / min(samples)}
+
+
+def bench_normalize_input(options: Dict[str, Any]) -> Dict[str, float]:
+    from features import normalize_input
+
+    payloads = _payloads(options["iterations"])
+    started = time.perf_counter()
+    for payload in payloads:
+        normalize_input(payload)
+    elapsed = time.perf_counter() - started
+    return {"calls_per_sec": len(payloads) / elapsed}
+
+
+def bench_training(options: Dict[str, Any]) -> Dict[str, float]:
+    """``train_and_save_models`` stage times, exporting into a temporary directory."""
+    import train_model
+
+    with tempfile.TemporaryDirectory() as tmp:
+        models_dir = Path(tmp)
+        train_model.MODELS_DIR = models_dir
+        train_model.METRICS_PATH = models_dir / "model_metrics.json"
+        train_model.LOG_PATH = models_dir / "training.log"
+        train_model.CACHE_DIR = models_dir / "cache"
+        train_model.train_and_save_models(use_cache=False)
+        with train_model.METRICS_PATH.open("r", encoding="utf-8") as fp:
+            metrics = json.load(fp)
+
+    results = {f"{stage}_seconds": seconds for stage, seconds in metrics["run"]["stage_timings"].items()}
+    for name, values in metrics.items():
+        if name != "run":
+            results.update({f"{name}_{stage}_seconds": seconds for stage, seconds in values["timings"].items()})
+    return results
+
+
+BENCHMARKS: Dict[str, Callable[[Dict[str, Any]], Dict[str, float]]] = {
+    "predict_cold": bench_predict_cold,
+    "predict_warm": bench_predict_warm,
+    "single_vs_batch": bench_single_vs_batch,
+    "transform_dataset": bench_transform_dataset,
+    "normalize_input": bench_normalize_input,
+    "training": bench_training,
+}
+
+
+def _run_in_process(name: str, options: Dict[str, Any]) -> Dict[str, float]:
+    logging.disable(logging.INFO)
+    os.chdir(BASE_DIR)
+    results = BENCHMARKS[name](options)
+    results["peak_rss_mib"] = _peak_rss_mib()
+    return results
+
+
+def run_benchmarks(names: List[str], options: Dict[str, Any], repeats: int = 3) -> Dict[str, Any]:
+    """Run each benchmark ``repeats`` times and report the per-metric median.
+
+    Every run happens in its own spawned process so cold starts and peak
+    memory are isolated; the median damps the noise of shared machines.
+    """
+    context = multiprocessing.get_context("spawn")
+    results: Dict[str, Dict[str, float]] = {}
+    for name in names:
+        logger.info("Running benchmark %s (%s runs)", name, repeats)
+        runs = []
+        for _ in range(repeats):
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                runs.append(pool.submit(_run_in_process, name, options).result())
+        results[name] = {metric: float(np.median([run[metric] for run in runs])) for metric in runs[0]}
+
+    import sklearn
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "sklearn": sklearn.__version__,
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "options": options,
+            "repeats": repeats,
+        },
+        "results": results,
+    }
+
+
+def _direction(metric: str) -> bool | None:
+    for suffix, higher_is_better in _DIRECTIONS.items():
+        if metric.endswith(suffix):
+            return higher_is_better
+    return None
+
+
+def compare_to_baseline(
+    report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = DEFAULT_TOLERANCE
+) -> List[str]:
+    """Metrics that are worse than ``baseline`` by more than ``tolerance`` (a fraction)."""
+    regressions = []
+    for name, metrics in report["results"].items():
+        expected = baseline.get("results", {}).get(name, {})
+        for metric, value in metrics.items():
+            higher_is_better = _direction(metric)
+            reference = expected.get(metric)
+            if higher_is_better is None or not reference:
+                continue
+            floor = next((floor for suffix, floor in _NOISE_FLOORS.items() if metric.endswith(suffix)), 0.0)
+            if abs(value - reference) < floor:
+                continue
+            change = (value - reference) / reference
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(f"{name}.{metric}: {value:.4g} vs baseline {reference:.4g} ({change:+.1%})")
+    return regressions
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the prediction and training hot paths")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), default=None)
+    parser.add_argument("--skip-training", action="store_true", help="Leave out the (slow) training benchmark")
+    parser.add_argument("--iterations", type=int, default=500, help="Calls for the latency benchmarks")
+    parser.add_argument("--batch-size", type=int, default=2000, help="Rows for single vs batch throughput")
+    parser.add_argument("--scale", type=int, default=10, help="Copies of dataset.csv for transform_dataset")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per benchmark; the median is reported")
+    parser.add_argument("--output", type=Path, default=None, help="Write the JSON report here")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed relative regression")
+    parser.add_argument("--update-baseline", action="store_true", help="Overwrite the baseline with this run")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    names = args.only or [name for name in BENCHMARKS if not (args.skip_training and name == "training")]
+    options = {"iterations": args.iterations, "batch_size": args.batch_size, "scale": args.scale}
+    report = run_benchmarks(names, options, repeats=args.repeats)
+
+    rendered = json.dumps(report, indent=2)
+    if args.output is not None:
+        args.output.write_text(rendered + "\n", encoding="utf-8")
+    print(rendered)
+
+    if args.update_baseline:
+        args.baseline.write_text(rendered + "\n", encoding="utf-8")
+        logger.info("Baseline written to %s", args.baseline)
+    elif args.baseline.exists():
+        with args.baseline.open("r", encoding="utf-8") as fp:
+            baseline = json.load(fp)
+        differing = [
+            key
+            for key in ("python", "numpy", "pandas", "sklearn", "machine", "cpu_count")
+            if baseline.get("meta", {}).get(key) != report["meta"][key]
+        ]
+        if differing:
+            logger.warning("Baseline was recorded with a different %s; comparisons may be skewed", ", ".join(differing))
+        regressions = compare_to_baseline(report, baseline, args.tolerance)
+        if regressions:
+            logger.error("Performance regressions beyond %.0f%%:\n  %s", args.tolerance * 100, "\n  ".join(regressions))
+            sys.exit(1)
+        logger.info("No regressions beyond %.0f%% against %s", args.tolerance * 100, args.baseline)
@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import logging
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import FunctionTransformer, OneHotEncoder, StandardScaler
+
+from features import FEATURES, get_feature_names
+from forest import FlatForest, FlatForestError, check_forest_parity
+
+
+logger = logging.getLogger(__name__)
+
+
+class EncoderCompileError(ValueError):
+    """Raised when a fitted preprocessor uses a step the compiler cannot reproduce."""
+
+
+def _single_step(transformer: Any) -> Any:
+    if isinstance(transformer, Pipeline):
+        if len(transformer.steps) != 1:
+            raise EncoderCompileError("Only single-step transformer pipelines can be compiled")
+        return transformer.steps[0][1]
+    return transformer
+
+
+def _is_passthrough(transformer: Any) -> bool:
+    if transformer == "passthrough":
+        return True
+    return isinstance(transformer, FunctionTransformer) and transformer.func is None
+
+
+class CompiledEncoder:
+    """Array-only replacement for the fitted ``_build_preprocessor()`` output.
+
+    Scaler statistics, one-hot index tables and the output column layout are
+    read once from the fitted ``ColumnTransformer``; a normalized feature dict
+    is then encoded straight into a float32 row, the dtype the tree models
+    evaluate in, without building a DataFrame.
+    """
+
+    def __init__(
+        self,
+        numeric_features: List[str],
+        numeric_offset: int,
+        means: np.ndarray,
+        scales: np.ndarray,
+        categorical_features: List[Tuple[str, int, Dict[str, int]]],
+        passthrough_features: List[Tuple[str, int]],
+        output_names: List[str],
+        base_features: List[str],
+    ) -> None:
+        self.numeric_features = numeric_features
+        self.numeric_offset = numeric_offset
+        self.means = means
+        self.scales = scales
+        self.categorical_features = categorical_features
+        self.passthrough_features = passthrough_features
+        self.output_names = output_names
+        self.base_features = base_features
+        self._template = np.zeros((1, len(output_names)), dtype=np.float32)
+
+    @property
+    def n_outputs(self) -> int:
+        return len(self.output_names)
+
+    @classmethod
+    def from_preprocessor(cls, preprocessor: ColumnTransformer) -> "CompiledEncoder":
+        numeric_features: List[str] = []
+        numeric_offset = 0
+        means = np.zeros(0)
+        scales = np.ones(0)
+        categorical_features: List[Tuple[str, int, Dict[str, int]]] = []
+        passthrough_features: List[Tuple[str, int]] = []
+        output_names: List[str] = []
+        base_features: List[str] = []
+
+        for name, transformer, columns in preprocessor.transformers_:
+            if transformer == "drop" or len(columns) == 0:
+                continue
+            columns = list(columns)
+            step = _single_step(transformer)
+
+            if isinstance(step, StandardScaler):
+                if numeric_features:
+                    raise EncoderCompileError("Only one scaled numeric block can be compiled")
+                numeric_features = columns
+                numeric_offset = len(output_names)
+                means = np.asarray(step.mean_, dtype=np.float64) if step.with_mean else np.zeros(len(columns))
+                scales = np.asarray(step.scale_, dtype=np.float64) if step.with_std else np.ones(len(columns))
+                output_names.extend(f"{name}__{column}" for column in columns)
+                base_features.extend(columns)
+            elif isinstance(step, OneHotEncoder):
+                if step.drop is not None or getattr(step, "infrequent_categories_", None) is not None:
+                    raise EncoderCompileError("One-hot encoders with drop or infrequent categories are not supported")
+                for column, categories in zip(columns, step.categories_):
+                    offset = len(output_names)
+                    index = {str(category): position for position, category in enumerate(categories)}
+                    categorical_features.append((column, offset, index))
+                    output_names.extend(f"{name}__{column}_{category}" for category in categories)
+                    base_features.extend([column] * len(categories))
+            elif _is_passthrough(step):
+                for column in columns:
+                    passthrough_features.append((column, len(output_names)))
+                    output_names.append(f"{name}__{column}")
+                    base_features.append(column)
+            else:
+                raise EncoderCompileError(f"Cannot compile transformer '{name}' ({type(step).__name__})")
+
+        return cls(
+            numeric_features,
+            numeric_offset,
+            means,
+            scales,
+            categorical_features,
+            passthrough_features,
+            output_names,
+            base_features,
+        )
+
+    def transform_record(self, normalized: Dict[str, Any]) -> np.ndarray:
+        """Encode one ``ensure_feature_order`` dict into a ``(1, n_outputs)`` float32 row."""
+        row = self._template.copy()
+        out = row[0]
+
+        if self.numeric_features:
+            values = np.fromiter(
+                (normalized[name] for name in self.numeric_features),
+                dtype=np.float64,
+                count=len(self.numeric_features),
+            )
+            out[self.numeric_offset : self.numeric_offset + len(values)] = (values - self.means) / self.scales
+
+        for name, offset, index in self.categorical_features:
+            position = index.get(normalized[name])
+            if position is not None:
+                out[offset + position] = 1.0
+
+        for name, offset in self.passthrough_features:
+            out[offset] = float(normalized[name])
+
+        return row
+
+    def transform_frame(self, frame: pd.DataFrame) -> np.ndarray:
+        """Encode a ``normalize_frame`` result into an ``(n_rows, n_outputs)`` float32 matrix."""
+        encoded = np.zeros((len(frame), self.n_outputs), dtype=np.float32)
+        rows = np.arange(len(frame))
+
+        if self.numeric_features:
+            values = frame[self.numeric_features].to_numpy(dtype=np.float64)
+            end = self.numeric_offset + len(self.numeric_features)
+            encoded[:, self.numeric_offset : end] = (values - self.means) / self.scales
+
+        for name, offset, index in self.categorical_features:
+            codes = pd.Categorical(frame[name].astype(str), categories=list(index)).codes
+            known = codes >= 0
+            encoded[rows[known], offset + codes[known]] = 1.0
+
+        for name, offset in self.passthrough_features:
+            encoded[:, offset] = frame[name].to_numpy(dtype=np.float64)
+
+        return encoded
+
+
+def _parity_frame() -> pd.DataFrame:
+    """Schema-derived rows covering defaults, bounds and every known category."""
+    base = {feature.name: feature.normalize(feature.default) for feature in FEATURES}
+    rows = [base]
+    for feature in FEATURES:
+        if feature.type == "numeric":
+            for bound in (feature.minimum, feature.maximum):
+                if bound is not None:
+                    rows.append({**base, feature.name: feature.normalize(bound)})
+        elif feature.type == "binary":
+            rows.append({**base, feature.name: not base[feature.name]})
+        elif feature.type == "categorical":
+            for category in (*feature.categories, "unseen_category"):
+                rows.append({**base, feature.name: feature.normalize(category)})
+    return pd.DataFrame(rows, columns=get_feature_names())
+
+
+def check_encoder_parity(
+    preprocessor: ColumnTransformer,
+    encoder: CompiledEncoder,
+    frame: pd.DataFrame | None = None,
+    atol: float = 1e-6,
+) -> None:
+    """Raise ``AssertionError`` if ``encoder`` disagrees with the sklearn preprocessor."""
+    if frame is None:
+        frame = _parity_frame()
+
+    expected = np.asarray(preprocessor.transform(frame), dtype=np.float32)
+    actual = encoder.transform_frame(frame)
+    np.testing.assert_allclose(actual, expected, atol=atol, rtol=0)
+
+    for position, record in enumerate(frame.to_dict("records")):
+        np.testing.assert_allclose(encoder.transform_record(record)[0], expected[position], atol=atol, rtol=0)
+
+
+def compile_payload(model_payload: Dict[str, Any], parity_frame: pd.DataFrame | None = None) -> Dict[str, Any]:
+    """Attach a parity-checked ``compiled_encoder`` and ``flat_forest`` to a model payload.
+
+    Parts already present in the payload are kept as they are. If compiling
+    a part or its parity check fails it is stored as ``None`` and predictions
+    use the sklearn path for that stage.
+    """
+    if "model" not in model_payload:
+        return model_payload
+
+    if parity_frame is None:
+        parity_frame = _parity_frame()
+    preprocessor = model_payload["model"].named_steps["preprocessor"]
+    classifier = model_payload["model"].named_steps["classifier"]
+
+    if "compiled_encoder" not in model_payload:
+        try:
+            encoder = CompiledEncoder.from_preprocessor(preprocessor)
+            check_encoder_parity(preprocessor, encoder, parity_frame)
+        except (EncoderCompileError, AssertionError) as exc:
+            logger.warning("Falling back to the sklearn preprocessor: %s", exc)
+            encoder = None
+        model_payload["compiled_encoder"] = encoder
+
+    if "flat_forest" not in model_payload:
+        try:
+            forest = FlatForest.from_estimator(classifier)
+            check_forest_parity(classifier, forest, preprocessor.transform(parity_frame))
+        except (FlatForestError, AssertionError) as exc:
+            logger.info("Flat inference engine unavailable: %s", exc)
+            forest = None
+        model_payload["flat_forest"] = forest
+
+    return model_payload
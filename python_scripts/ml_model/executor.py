@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Tuple
+
+
+EXECUTOR_KINDS = ("thread", "process")
+
+
+class ExecutorSaturatedError(RuntimeError):
+    """Raised when the inference queue is full and a request must be shed."""
+
+
+def _timed_call(fn: Callable[..., Any], args: Tuple[Any, ...], kwargs: dict) -> Tuple[float, Any]:
+    # time.monotonic() is system-wide on Linux, so the start time is comparable
+    # with the submit time recorded in the parent when running in a process pool.
+    started_at = time.monotonic()
+    return started_at, fn(*args, **kwargs)
+
+
+class InferenceExecutor:
+    """Runs blocking inference off the event loop with bounded admission.
+
+    At most ``max_workers + max_queue`` calls may be in flight; further
+    submissions fail fast with :class:`ExecutorSaturatedError` so the service
+    can answer 503 instead of letting latency grow without bound.
+    """
+
+    def __init__(self, kind: str = "thread", max_workers: int | None = None, max_queue: int | None = None):
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f"Executor kind must be one of {', '.join(EXECUTOR_KINDS)}")
+
+        self.kind = kind
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue = self.max_workers * 4 if max_queue is None else max_queue
+        self._pool: Executor | None = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    @classmethod
+    def from_env(cls) -> "InferenceExecutor":
+        workers = os.environ.get("INFERENCE_WORKERS")
+        max_queue = os.environ.get("INFERENCE_MAX_QUEUE")
+        return cls(
+            kind=os.environ.get("INFERENCE_EXECUTOR", "thread"),
+            max_workers=int(workers) if workers else None,
+            max_queue=int(max_queue) if max_queue else None,
+        )
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            if self.kind == "process":
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+        return self._pool
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Tuple[Any, float]:
+        """Run ``fn`` in the pool and return ``(result, queue_wait_seconds)``."""
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                raise ExecutorSaturatedError(
+                    f"Inference queue is full ({self._in_flight} requests in flight)"
+                )
+            self._in_flight += 1
+
+        try:
+            loop = asyncio.get_running_loop()
+            submitted_at = time.monotonic()
+            started_at, result = await loop.run_in_executor(self._get_pool(), _timed_call, fn, args, kwargs)
+            return result, max(0.0, started_at - submitted_at)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -1,8 +1,14 @@
+import hashlib
 import json
+import math
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Dict, Iterable, List, Tuple
 
+import numpy as np
+import pandas as pd
+from pandas.api.types import infer_dtype, is_bool_dtype, is_float_dtype, is_numeric_dtype
+
 
 BASE_DIR = Path(__file__).resolve().parent
 SCHEMA_PATH = BASE_DIR / "feature_schema.json"
@@ -25,10 +31,59 @@ def _load_schema() -> Dict[str, Any]:
     return data
 
 
+def schema_fingerprint(schema: Dict[str, Any]) -> str:
+    """Stable content hash of a feature schema, independent of key order and whitespace."""
+    canonical = json.dumps(schema, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
 SCHEMA = _load_schema()
+SCHEMA_FINGERPRINT = schema_fingerprint(SCHEMA)
 FEATURE_DEFINITIONS: List[Dict[str, Any]] = SCHEMA["features"]
 TARGET_SCHEMA: Dict[str, Any] = SCHEMA.get("target", {"name": "target"})
 
+TRUE_STRINGS = frozenset({"true", "1", "yes", "y"})
+FALSE_STRINGS = frozenset({"false", "0", "no", "n"})
+
+
+def round_values(values: np.ndarray, decimals: int) -> np.ndarray:
+    """Vectorized ``round()`` that agrees with Python's correctly rounded result.
+
+    ``np.round`` rounds the scaled float, so a product that lands exactly on
+    .5 may disagree with ``round()``; only those elements fall back to Python.
+    """
+    scale = 10.0 ** decimals
+    scaled = values * scale
+    rounded = np.rint(scaled) / scale
+    # inf and NaN pass through unchanged; only finite values can be ties.
+    ties = np.isfinite(scaled)
+    ties[ties] = np.abs(scaled[ties] - np.trunc(scaled[ties])) == 0.5
+    if ties.any():
+        rounded[ties] = [round(float(value), decimals) for value in values[ties]]
+    return rounded
+
+
+def as_text(values: pd.Series) -> pd.Series:
+    """``values.astype(str)``, writing integral floats as ints.
+
+    Integer columns with missing cells are read as float64, where ``7`` would
+    otherwise become ``"7.0"`` instead of the ``"7"`` that ``str(7)`` gives.
+    """
+    if not is_float_dtype(values):
+        return values.astype(str)
+    numbers = values.to_numpy(dtype=np.float64)
+    integral = np.isfinite(numbers) & (numbers == np.trunc(numbers)) & (np.abs(numbers) < 2**53)
+    text = values.astype(object)
+    text[integral] = numbers[integral].astype(np.int64)
+    return text.astype(str)
+
+
+def _missing_mask(values: pd.Series) -> np.ndarray:
+    missing = values.isna().to_numpy(copy=True)
+    if not is_numeric_dtype(values) and not is_bool_dtype(values):
+        missing |= values.astype(str).str.strip().eq("").to_numpy()
+    return missing
+
 
 @dataclass(frozen=True)
 class Feature:
@@ -59,6 +114,8 @@ class Feature:
                 value = float(raw)
             except (TypeError, ValueError):
                 value = float(self.default or 0)
+            if math.isnan(value):  # a missing cell of a frame row; infinities clip to the bounds
+                value = float(self.default or 0)
 
             if self.minimum is not None:
                 value = max(self.minimum, value)
@@ -70,13 +127,15 @@ class Feature:
         if self.type == "binary":
             if isinstance(raw, str):
                 lowered = raw.strip().lower()
-                if lowered in {"true", "1", "yes", "y"}:
+                if lowered in TRUE_STRINGS:
                     return True
-                if lowered in {"false", "0", "no", "n"}:
+                if lowered in FALSE_STRINGS:
                     return False
             return bool(raw)
 
         if self.type == "categorical":
+            if isinstance(raw, float) and raw.is_integer() and abs(raw) < 2**53:
+                raw = int(raw)  # 7.0 -> "7", as as_text writes it
             value = str(raw).strip().lower()
             if self.categories and value not in self.categories:
                 return str(self.default)
@@ -85,8 +144,53 @@ class Feature:
         # Fallback: return as-is
         return raw
 
+    def normalize_series(self, values: pd.Series) -> pd.Series:
+        """Apply :meth:`normalize` to a whole column.
+
+        Missing cells (None, NaN or blank strings) take the default, the same
+        as an absent key in :func:`normalize_input`. Infinite numbers are
+        clipped to the feature's bounds, or kept where it has none.
+        """
+        missing = _missing_mask(values)
+
+        if self.type == "numeric":
+            if is_numeric_dtype(values) or is_bool_dtype(values):
+                numeric = values.to_numpy(dtype=np.float64, copy=True)
+            else:
+                numeric = pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64, copy=True)
+            numeric[missing | np.isnan(numeric)] = float(self.default or 0)
+            if self.minimum is not None:
+                numeric = np.maximum(self.minimum, numeric)
+            if self.maximum is not None:
+                numeric = np.minimum(self.maximum, numeric)
+            return pd.Series(round_values(numeric, 4), index=values.index)
+
+        if self.type == "binary":
+            kind = infer_dtype(values, skipna=True)
+            if is_bool_dtype(values) or kind == "boolean":
+                flags = values.fillna(False).to_numpy(dtype=bool, copy=True)
+            elif is_numeric_dtype(values):
+                flags = values.to_numpy(dtype=np.float64) != 0
+            elif kind == "string":
+                text = values.astype(str).str.strip().str.lower()
+                flags = ~text.isin(FALSE_STRINGS).to_numpy()
+            else:
+                flags = values.map(self.normalize).to_numpy(dtype=bool, copy=True)
+            flags[missing] = self.normalize(self.default)
+            return pd.Series(flags, index=values.index)
+
+        if self.type == "categorical":
+            text = as_text(values).str.strip().str.lower()
+            invalid = missing | text.eq("").to_numpy()
+            if self.categories:
+                invalid |= ~text.isin(self.categories).to_numpy()
+            return text.where(~invalid, str(self.default))
+
+        return values
+
 
 FEATURES: Tuple[Feature, ...] = tuple(Feature.from_dict(item) for item in FEATURE_DEFINITIONS)
+FEATURE_NAMES = frozenset(feature.name for feature in FEATURES)
 FEATURE_NAME_INDEX: Dict[str, Feature] = {feature.name: feature for feature in FEATURES}
 
 
@@ -120,6 +224,22 @@ def ensure_feature_order(data: Dict[str, Any]) -> Dict[str, Any]:
     return {feature.name: normalized[feature.name] for feature in FEATURES}
 
 
+def normalize_frame(frame: pd.DataFrame) -> pd.DataFrame:
+    """Vectorized :func:`ensure_feature_order` over every row of ``frame``.
+
+    Columns are returned in schema order; absent columns take the feature
+    default and columns outside the schema are dropped.
+    """
+    columns: Dict[str, pd.Series] = {}
+    for feature in FEATURES:
+        if feature.name in frame:
+            values = frame[feature.name]
+        else:
+            values = pd.Series(None, index=frame.index, dtype=object)
+        columns[feature.name] = feature.normalize_series(values)
+    return pd.DataFrame(columns, index=frame.index)
+
+
 def serialize_feature_schema(output_path: Path | str) -> None:
     path = Path(output_path)
     path.parent.mkdir(parents=True, exist_ok=True)
@@ -178,13 +298,62 @@ def validate_feature_payload(payload: Dict[str, Any]) -> Tuple[bool, List[str]]:
     return len(errors) == 0, errors
 
 
+def validate_frame(frame: pd.DataFrame) -> pd.DataFrame:
+    """Column-wise screen for :func:`validate_feature_payload`.
+
+    Returns a boolean frame with one column per feature that is ``True``
+    where the cell may produce an error; ``mask.any(axis=1)`` gives the rows
+    to check. A frame cannot tell an absent key from ``None`` or NaN, so
+    every missing cell is flagged, including ``None`` binaries and NaN
+    numbers that the payload check accepts. The flags are a superset of the
+    errors: whether a flagged row is invalid is up to
+    :func:`validate_feature_payload`.
+    """
+    errors: Dict[str, np.ndarray] = {}
+
+    for feature in FEATURES:
+        if feature.name not in frame:
+            errors[feature.name] = np.ones(len(frame), dtype=bool)
+            continue
+
+        values = frame[feature.name]
+        invalid = values.isna().to_numpy(copy=True)
+
+        if feature.type == "numeric":
+            numeric = pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64)
+            invalid |= np.isnan(numeric)
+            if feature.minimum is not None:
+                invalid |= numeric < feature.minimum
+            if feature.maximum is not None:
+                invalid |= numeric > feature.maximum
+
+        if feature.type == "categorical" and feature.categories:
+            text = values.astype(str).str.strip().str.lower()
+            invalid |= ~text.isin(feature.categories).to_numpy()
+
+        errors[feature.name] = invalid
+
+    return pd.DataFrame(errors, index=frame.index)
+
+
+def base_feature_name(transformed_name: str) -> str:
+    """Schema feature behind a preprocessor output: ``num__age`` -> ``age``, ``cat__gender_male`` -> ``gender``."""
+    prefix, separator, column = transformed_name.partition("__")
+    column = column if separator else prefix
+    if column in FEATURE_NAMES:
+        return column
+    # One-hot outputs are named ``<feature>_<category>``; the longest matching feature wins.
+    matches = [name for name in FEATURE_NAMES if column.startswith(f"{name}_")]
+    return max(matches, key=len) if matches else column
+
+
 def aggregate_feature_importances(
     transformed_feature_names: Iterable[str], importances: Iterable[float]
 ) -> List[Tuple[str, float]]:
     importance_map: Dict[str, float] = {}
 
     for name, importance in zip(transformed_feature_names, importances):
-        base_name = name.split("__", maxsplit=1)[0]
+        base_name = base_feature_name(name)
         importance_map[base_name] = importance_map.get(base_name, 0.0) + float(importance)
 
     sorted_items = sorted(importance_map.items(), key=lambda item: item[1], reverse=True)
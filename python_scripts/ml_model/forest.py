@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+from functools import cached_property
+from typing import Any, Iterator, List, Tuple
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.tree import DecisionTreeClassifier
+
+
+class FlatForestError(ValueError):
+    """Raised when an estimator cannot be flattened."""
+
+
+class FlatForest:
+    """All trees of a fitted tree classifier packed into contiguous arrays.
+
+    Node ``i`` splits on ``feature[i]`` at ``threshold[i]`` and continues to
+    ``children_left[i]``/``children_right[i]`` (global node indices, ``-1`` at
+    leaves). ``value[i]`` holds the class distribution of node ``i``,
+    normalized the way ``DecisionTreeClassifier.predict_proba`` does, so the
+    forest probability is the mean of the leaf values reached in each tree.
+    """
+
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        children_left: np.ndarray,
+        children_right: np.ndarray,
+        value: np.ndarray,
+        roots: np.ndarray,
+        max_depth: int,
+        n_features: int,
+    ) -> None:
+        self.feature = feature
+        self.threshold = threshold
+        self.children_left = children_left
+        self.children_right = children_right
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.n_features = n_features
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    @property
+    def n_classes(self) -> int:
+        return self.value.shape[1]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(
+            array.nbytes
+            for array in (
+                self.feature,
+                self.threshold,
+                self.children_left,
+                self.children_right,
+                self.value,
+                self.roots,
+            )
+        )
+
+    @classmethod
+    def from_estimator(cls, estimator: Any, n_trees: int | None = None) -> "FlatForest":
+        """Flatten ``estimator``; ``n_trees`` keeps only the first trees of a forest.
+
+        A seeded forest draws its trees in order, so its first ``n_trees``
+        trees are the forest that ``n_estimators=n_trees`` would have fitted.
+        """
+        if isinstance(estimator, RandomForestClassifier):
+            trees = [tree.tree_ for tree in estimator.estimators_[:n_trees]]
+        elif isinstance(estimator, DecisionTreeClassifier):
+            trees = [estimator.tree_]
+        else:
+            raise FlatForestError(f"Cannot flatten {type(estimator).__name__}")
+
+        if trees[0].n_outputs != 1:
+            raise FlatForestError("Only single-output classifiers can be flattened")
+
+        features: List[np.ndarray] = []
+        thresholds: List[np.ndarray] = []
+        lefts: List[np.ndarray] = []
+        rights: List[np.ndarray] = []
+        values: List[np.ndarray] = []
+        roots: List[int] = []
+        offset = 0
+
+        for tree in trees:
+            is_leaf = tree.children_left < 0
+            roots.append(offset)
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            lefts.append(np.where(is_leaf, -1, tree.children_left + offset))
+            rights.append(np.where(is_leaf, -1, tree.children_right + offset))
+
+            value = np.asarray(tree.value[:, 0, :], dtype=np.float64)
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(value / normalizer)
+            offset += tree.node_count
+
+        return cls(
+            feature=np.concatenate(features).astype(np.int32),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            children_left=np.concatenate(lefts).astype(np.int32),
+            children_right=np.concatenate(rights).astype(np.int32),
+            value=np.concatenate(values),
+            roots=np.asarray(roots, dtype=np.int32),
+            max_depth=max(tree.max_depth for tree in trees),
+            n_features=trees[0].n_features,
+        )
+
+    def to_float32(self) -> "FlatForest":
+        """Copy with float32 thresholds and node values, halving their size.
+
+        Inputs are float32, so a threshold rounded toward -inf to the nearest
+        float32 sends every input down the same branch as the float64 one;
+        only the leaf values lose precision.
+        """
+        threshold = self.threshold.astype(np.float32)
+        above = threshold.astype(np.float64) > self.threshold
+        threshold[above] = np.nextafter(threshold[above], np.float32(-np.inf))
+        return FlatForest(
+            feature=self.feature,
+            threshold=threshold,
+            children_left=self.children_left,
+            children_right=self.children_right,
+            value=self.value.astype(np.float32),
+            roots=self.roots,
+            max_depth=self.max_depth,
+            n_features=self.n_features,
+        )
+
+    def _check_input(self, X: np.ndarray) -> np.ndarray:
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected input with {self.n_features} features, got shape {X.shape}")
+        return X
+
+    def _descend(self, X: np.ndarray, nodes: np.ndarray) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Move ``nodes`` (one per sample and tree, sample-major) down one level at a time.
+
+        Yields the moving ``(pair, parent, child)`` indices of every level;
+        when the generator is exhausted every node is a leaf.
+        """
+        flat_X = X.ravel()
+        row_offsets = np.repeat(np.arange(X.shape[0], dtype=np.int64) * self.n_features, self.n_trees)
+        active = np.flatnonzero(self.children_left[nodes] >= 0)
+
+        while active.size:
+            current = nodes[active]
+            go_left = flat_X[row_offsets[active] + self.feature[current]] <= self.threshold[current]
+            following = np.where(go_left, self.children_left[current], self.children_right[current])
+            nodes[active] = following
+            yield active, current, following
+            active = active[self.children_left[following] >= 0]
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """Leaf index reached in every tree, shape ``(n_samples, n_trees)``.
+
+        Trees are walked level by level for all (sample, tree) pairs at once;
+        pairs that reach a leaf drop out of the active set, so the work is
+        proportional to the path lengths actually taken.
+        """
+        X = self._check_input(X)
+        nodes = np.tile(self.roots, X.shape[0])
+        for _ in self._descend(X, nodes):
+            pass
+        return nodes.reshape(X.shape[0], self.n_trees)
+
+    @cached_property
+    def node_deltas(self) -> np.ndarray:
+        """Change in class values from each node's parent to the node, shape ``(n_classes, n_nodes)``.
+
+        Class-major so each class is a contiguous row to gather from; zero at roots.
+        """
+        internal = np.flatnonzero(self.children_left >= 0)
+        left = self.children_left[internal]
+        right = self.children_right[internal]
+        deltas = np.zeros((self.n_classes, self.n_nodes), dtype=self.value.dtype)
+        for class_index, class_deltas in enumerate(deltas):
+            class_values = np.ascontiguousarray(self.value[:, class_index])
+            parent_values = class_values[internal]
+            class_deltas[left] = class_values[left] - parent_values
+            class_deltas[right] = class_values[right] - parent_values
+        return deltas
+
+    def precompute_node_deltas(self) -> np.ndarray:
+        """Compute :attr:`node_deltas` now so they are pickled with the forest.
+
+        Serving artifacts are exported this way, so the deltas are
+        memory-mapped with the other arrays rather than built in private
+        memory on the first explanation.
+        """
+        return self.node_deltas
+
+    def contributions(self, X: np.ndarray, chunk_size: int = 512) -> Tuple[np.ndarray, np.ndarray]:
+        """Saabas decomposition of :meth:`predict_proba` over the input columns.
+
+        Each split a sample passes moves its class distribution from the
+        parent's values to the child's, and that change is credited to the
+        split feature. Returns ``(bias, contributions)``: the mean root
+        distribution, shape ``(n_classes,)``, and the per-column changes
+        averaged over trees, shape ``(n_samples, n_features, n_classes)``, so
+        ``bias + contributions.sum(axis=1)`` equals ``predict_proba(X)``.
+        """
+        X = self._check_input(X)
+        deltas = self.node_deltas
+        contributions = np.zeros((X.shape[0], self.n_features, self.n_classes), dtype=np.float64)
+        for start in range(0, X.shape[0], chunk_size):
+            chunk = X[start : start + chunk_size]
+            size = chunk.shape[0] * self.n_features
+            totals = np.zeros((size, self.n_classes), dtype=np.float64)
+            nodes = np.tile(self.roots, chunk.shape[0])
+            for pairs, current, following in self._descend(chunk, nodes):
+                cells = (pairs // self.n_trees) * self.n_features + self.feature[current]
+                for class_index in range(self.n_classes):
+                    totals[:, class_index] += np.bincount(
+                        cells, weights=deltas[class_index][following], minlength=size
+                    )
+            contributions[start : start + chunk.shape[0]] = totals.reshape(chunk.shape[0], self.n_features, -1)
+        bias = np.asarray(self.value[self.roots], dtype=np.float64).mean(axis=0)
+        return bias, contributions / self.n_trees
+
+    def predict_proba(self, X: np.ndarray, chunk_size: int = 2048) -> np.ndarray:
+        X = np.asarray(X)
+        probabilities = np.empty((X.shape[0], self.n_classes), dtype=np.float64)
+        for start in range(0, X.shape[0], chunk_size):
+            leaves = self.apply(X[start : start + chunk_size])
+            probabilities[start : start + len(leaves)] = self.value[leaves].sum(axis=1, dtype=np.float64) / self.n_trees
+        return probabilities
+
+
+def check_forest_parity(estimator: Any, forest: FlatForest, X: np.ndarray, atol: float = 1e-9) -> None:
+    """Raise ``AssertionError`` if ``forest`` disagrees with ``estimator.predict_proba``."""
+    expected = estimator.predict_proba(np.asarray(X, dtype=np.float32))
+    np.testing.assert_allclose(forest.predict_proba(X), expected, atol=atol, rtol=0)
@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from artifacts import default_permissions
+from registry import ModelRegistry, content_hash
+
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+DEFAULT_POLL_SECONDS = 2.0
+# Headline metrics copied into the manifest; the full report stays in model_metrics.json.
+_MANIFEST_METRICS = ("accuracy", "macro_precision", "macro_recall", "macro_f1")
+
+
+def _variant(path: Path) -> tuple[str, str]:
+    """``random_forest.compact.joblib`` -> ``("random_forest", "compact")``."""
+    stem = path.name[: -len(".joblib")]
+    model, _, variant = stem.partition(".")
+    return model, variant or "full"
+
+
+def build_manifest(
+    models_dir: Path,
+    metrics: Dict[str, Any],
+    previous: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Index every ``*.joblib`` in ``models_dir`` with its content hash, size, metrics and export time.
+
+    Hashes from ``previous`` are reused for files whose size and mtime are
+    unchanged, so rewriting the manifest does not re-read unchanged models.
+    """
+    known = {entry["name"]: entry for entry in (previous or {}).get("models", [])}
+    entries: List[Dict[str, Any]] = []
+    for path in sorted(models_dir.glob("*.joblib")):
+        stat = path.stat()
+        model, variant = _variant(path)
+        previous_entry = known.get(path.name)
+        if previous_entry is not None and (previous_entry["size_bytes"], previous_entry["mtime_ns"]) == (
+            stat.st_size,
+            stat.st_mtime_ns,
+        ):
+            digest = previous_entry["hash"]
+        else:
+            digest = content_hash(path)
+
+        model_metrics = metrics.get(model, {})
+        if variant == "compact":
+            # Only macro-F1 is measured for the pruned forest; the other metrics belong to the full model.
+            model_metrics = model_metrics.get("export_variants", {}).get("compact", {})
+        entries.append(
+            {
+                "name": path.name,
+                "model": model,
+                "variant": variant,
+                "hash": digest,
+                "size_bytes": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "exported_at": datetime.fromtimestamp(stat.st_mtime, timezone.utc).isoformat(),
+                "metrics": {key: model_metrics[key] for key in _MANIFEST_METRICS if key in model_metrics},
+            }
+        )
+
+    return {
+        "version": MANIFEST_VERSION,
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "models": entries,
+    }
+
+
+def read_manifest(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        with path.open("r", encoding="utf-8") as fp:
+            return json.load(fp)
+    except FileNotFoundError:
+        return None
+
+
+def write_manifest(models_dir: Path, metrics: Dict[str, Any]) -> Path:
+    """Rebuild ``manifest.json`` in ``models_dir`` and rename it into place atomically."""
+    path = models_dir / MANIFEST_NAME
+    manifest = build_manifest(models_dir, metrics, previous=read_manifest(path))
+    fd, tmp_name = tempfile.mkstemp(dir=models_dir, prefix=f".{MANIFEST_NAME}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fp:
+            json.dump(manifest, fp, indent=2)
+        default_permissions(tmp_name)
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+    logger.info("Wrote manifest of %s models to %s", len(manifest["models"]), path)
+    return path
+
+
+class ModelIndex:
+    """In-memory view of ``manifest.json`` that keeps a registry in step with it.
+
+    :meth:`refresh` re-reads the manifest when its mtime changes. Models whose
+    hash changed and that are resident in the registry (or listed in
+    ``preload``) are loaded and swapped in on the calling thread, which is the
+    watcher thread when :meth:`start` is used, so requests keep being served by
+    the previous version until the new one is ready. Without a manifest the
+    index falls back to scanning the directory, again only when it changes.
+    """
+
+    def __init__(
+        self,
+        models_dir: Path,
+        registry: ModelRegistry,
+        preload: Sequence[str] = (),
+        poll_seconds: float = DEFAULT_POLL_SECONDS,
+    ) -> None:
+        self.models_dir = Path(models_dir)
+        self.registry = registry
+        self.preload = tuple(preload)
+        self.poll_seconds = poll_seconds
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._source_mtime_ns: Optional[int] = None
+        self._generated_at: Optional[str] = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls, models_dir: Path, registry: ModelRegistry, default_preload: Sequence[str] = ()) -> "ModelIndex":
+        preload = os.environ.get("MODEL_PRELOAD")
+        return cls(
+            models_dir,
+            registry,
+            preload=[name for name in preload.split(",") if name] if preload is not None else default_preload,
+            poll_seconds=float(os.environ.get("MODEL_MANIFEST_POLL_SECONDS", DEFAULT_POLL_SECONDS)),
+        )
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.models_dir / MANIFEST_NAME
+
+    def models(self) -> List[Dict[str, Any]]:
+        self._ensure_current()
+        with self._lock:
+            return list(self._entries.values())
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        self._ensure_current()
+        with self._lock:
+            return self._entries.get(name)
+
+    def _ensure_current(self) -> None:
+        # The watcher keeps the index current; without it, readers pay for a stat.
+        if self._thread is None or self._source_mtime_ns is None:
+            self.refresh()
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "source": "manifest" if self.manifest_path.exists() else "directory",
+                "generated_at": self._generated_at,
+                "watching": self._thread is not None and self._thread.is_alive(),
+                "poll_seconds": self.poll_seconds,
+            }
+
+    def refresh(self) -> bool:
+        """Reload the index if its source changed; returns whether it did."""
+        with self._refresh_lock:
+            source = self.manifest_path if self.manifest_path.exists() else self.models_dir
+            try:
+                mtime_ns = source.stat().st_mtime_ns
+            except FileNotFoundError:
+                return False
+            if mtime_ns == self._source_mtime_ns:
+                return False
+
+            if source == self.manifest_path:
+                manifest = read_manifest(source) or {"models": []}
+                entries = {entry["name"]: entry for entry in manifest["models"]}
+                generated_at = manifest.get("generated_at")
+            else:
+                entries = self._scan_directory()
+                generated_at = None
+
+            with self._lock:
+                previous = self._entries
+                self._entries = entries
+                self._generated_at = generated_at
+                self._source_mtime_ns = mtime_ns
+
+            self.registry.track_manifest(
+                {self.models_dir / name: entry["hash"] for name, entry in entries.items() if entry["hash"] is not None}
+            )
+            self._load_changed(previous, entries)
+            return True
+
+    def _scan_directory(self) -> Dict[str, Dict[str, Any]]:
+        entries = {}
+        for path in sorted(self.models_dir.glob("*.joblib")):
+            stat = path.stat()
+            model, variant = _variant(path)
+            entries[path.name] = {
+                "name": path.name,
+                "model": model,
+                "variant": variant,
+                "hash": None,
+                "size_bytes": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "exported_at": datetime.fromtimestamp(stat.st_mtime, timezone.utc).isoformat(),
+                "metrics": {},
+            }
+        return entries
+
+    def _load_changed(self, previous: Dict[str, Dict[str, Any]], entries: Dict[str, Dict[str, Any]]) -> None:
+        for name, entry in entries.items():
+            path = self.models_dir / name
+            unchanged = name in previous and previous[name]["hash"] == entry["hash"] and entry["hash"] is not None
+            if not (self.registry.is_resident(path) or name in self.preload):
+                continue
+            if unchanged and self.registry.is_resident(path):
+                continue
+            try:
+                self.registry.swap(path, fingerprint=entry["hash"])
+            except Exception:  # a bad export must not take the watcher down
+                logger.exception("Background load of %s failed; keeping the previous version", name)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="model-index", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_seconds + 1)
+            self._thread = None
+
+    def _watch(self) -> None:
+        while not self._stop.is_set():
+            started = time.perf_counter()
+            try:
+                if self.refresh():
+                    logger.info("Model index refreshed in %.3fs", time.perf_counter() - started)
+            except Exception:
+                logger.exception("Model index refresh failed")
+            self._stop.wait(self.poll_seconds)
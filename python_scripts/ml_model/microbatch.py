@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from executor import ExecutorSaturatedError, InferenceExecutor
+from predict import predict, predict_records, run_with_timings
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW_SECONDS = 0.002
+DEFAULT_MAX_BATCH_SIZE = 32
+
+# (result, stage durations, executor queue wait, time spent waiting for the batch, batch size)
+BatchedResult = Tuple[Dict[str, Any], Dict[str, float], float, float, int]
+
+
+@dataclass
+class _Pending:
+    records: List[Dict[str, Any]] = field(default_factory=list)
+    waiters: List[asyncio.Future] = field(default_factory=list)
+    arrivals: List[float] = field(default_factory=list)
+    timer: Optional[asyncio.TimerHandle] = None
+
+
+@dataclass
+class _Group:
+    options: Dict[str, Any]
+    running: int = 0
+    pending: Optional[_Pending] = None
+
+
+class MicroBatcher:
+    """Coalesces concurrent single-record predictions for the same model into one call.
+
+    Requests are grouped by ``key`` (model and the options that shape the
+    result). While fewer than ``max_concurrency`` batches of a group are
+    running, a request is dispatched at once, so an idle service adds no
+    latency. Once they are all busy, requests collect until a running batch
+    finishes, ``window_seconds`` pass or ``max_batch_size`` records are
+    waiting, and are then scored with one :func:`predict.predict_records`
+    call. Batch sizes therefore follow the load.
+
+    A failing batch is re-run one record at a time so each request gets its
+    own error, as if it had not been batched.
+    """
+
+    def __init__(
+        self,
+        executor: InferenceExecutor,
+        window_seconds: float = DEFAULT_WINDOW_SECONDS,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        max_concurrency: Optional[int] = None,
+        on_batch: Optional[Callable[[Hashable, int, List[float]], None]] = None,
+    ) -> None:
+        self.executor = executor
+        self.window_seconds = window_seconds
+        self.max_batch_size = max_batch_size
+        self.max_concurrency = max_concurrency or executor.max_workers
+        self._on_batch = on_batch
+        self._groups: Dict[Hashable, _Group] = {}
+
+    @classmethod
+    def from_env(
+        cls,
+        executor: InferenceExecutor,
+        on_batch: Optional[Callable[[Hashable, int, List[float]], None]] = None,
+    ) -> "MicroBatcher":
+        return cls(
+            executor,
+            window_seconds=float(os.environ.get("MICROBATCH_WINDOW_MS", DEFAULT_WINDOW_SECONDS * 1000)) / 1000,
+            max_batch_size=int(os.environ.get("MICROBATCH_MAX_SIZE", DEFAULT_MAX_BATCH_SIZE)),
+            on_batch=on_batch,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_batch_size > 1
+
+    async def submit(self, key: Hashable, record: Dict[str, Any], **options: Any) -> BatchedResult:
+        """Score ``record`` with ``predict(record, **options)``, possibly alongside other requests.
+
+        ``options`` must be the same for every request submitted under ``key``.
+        """
+        loop = asyncio.get_running_loop()
+        group = self._groups.get(key)
+        if group is None:
+            group = self._groups[key] = _Group(options)
+        if group.pending is None:
+            group.pending = _Pending()
+
+        pending = group.pending
+        waiter = loop.create_future()
+        pending.records.append(record)
+        pending.waiters.append(waiter)
+        pending.arrivals.append(time.monotonic())
+
+        if group.running < self.max_concurrency or len(pending.records) >= self.max_batch_size:
+            self._dispatch(key)
+        elif pending.timer is None:
+            pending.timer = loop.call_later(self.window_seconds, self._dispatch, key)
+        return await waiter
+
+    def _dispatch(self, key: Hashable) -> None:
+        group = self._groups.get(key)
+        if group is None or group.pending is None:
+            return
+        pending, group.pending = group.pending, None
+        if pending.timer is not None:
+            pending.timer.cancel()
+        group.running += 1
+        asyncio.get_running_loop().create_task(self._run(key, group, pending))
+
+    async def _run(self, key: Hashable, group: _Group, pending: _Pending) -> None:
+        dispatched = time.monotonic()
+        waits = [dispatched - arrival for arrival in pending.arrivals]
+        size = len(pending.records)
+        try:
+            if self._on_batch is not None:
+                self._on_batch(key, size, waits)
+            try:
+                results, durations, queue_wait = await self._score(pending.records, group.options)
+            except (ExecutorSaturatedError, asyncio.CancelledError):
+                raise
+            except Exception:
+                if size == 1:
+                    raise
+                logger.warning("Batch of %s predictions failed; scoring them one by one", size, exc_info=True)
+                await self._run_individually(group, pending, waits)
+                return
+            for waiter, result, wait in zip(pending.waiters, results, waits):
+                if not waiter.done():
+                    waiter.set_result((result, durations, queue_wait, wait, size))
+        except BaseException as exc:
+            for waiter in pending.waiters:
+                if not waiter.done():
+                    waiter.set_exception(exc)
+            if not isinstance(exc, Exception):
+                raise
+        finally:
+            group.running -= 1
+            if group.pending is not None:
+                # Whatever queued behind this batch goes now instead of waiting out the window.
+                self._dispatch(key)
+            elif group.running == 0:
+                self._groups.pop(key, None)
+
+    async def _score(
+        self, records: List[Dict[str, Any]], options: Dict[str, Any]
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, float], float]:
+        if len(records) == 1:
+            (result, durations), queue_wait = await self.executor.run(run_with_timings, predict, records[0], **options)
+            return [result], durations, queue_wait
+        (results, durations), queue_wait = await self.executor.run(
+            run_with_timings, predict_records, records, **options
+        )
+        return results, durations, queue_wait
+
+    async def _run_individually(self, group: _Group, pending: _Pending, waits: List[float]) -> None:
+        async def score_one(record: Dict[str, Any], waiter: asyncio.Future, wait: float) -> None:
+            try:
+                results, durations, queue_wait = await self._score([record], group.options)
+            except Exception as exc:
+                if not waiter.done():
+                    waiter.set_exception(exc)
+            else:
+                if not waiter.done():
+                    waiter.set_result((results[0], durations, queue_wait, wait, 1))
+
+        await asyncio.gather(*(score_one(*args) for args in zip(pending.records, pending.waiters, waits)))
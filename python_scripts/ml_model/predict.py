@@ -1,76 +1,442 @@
 from __future__ import annotations
 
 import json
+import os
+import sys
+from itertools import islice
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple
 
-import joblib
+import numpy as np
 import pandas as pd
 
-from features import SCHEMA, ensure_feature_order
+from artifacts import load_artifact
+from compiled import compile_payload
+from features import (
+    SCHEMA,
+    SCHEMA_FINGERPRINT,
+    base_feature_name,
+    ensure_feature_order,
+    normalize_frame,
+    validate_feature_payload,
+    validate_frame,
+)
+from metrics import StageTimer, observe_model_load
+from registry import DEFAULT_MAX_BYTES, ModelNotFoundError, ModelRegistry
 
 
 BASE_DIR = Path(__file__).resolve().parent
 DEFAULT_MODEL_PATH = BASE_DIR / "models" / "random_forest.joblib"
 
+INFERENCE_ENGINES = ("sklearn", "flat")
+FLAT_ENGINE_MAX_ROWS = int(os.environ.get("FLAT_ENGINE_MAX_ROWS", 256))
+DEFAULT_STREAM_BATCH_SIZE = 512
 
-class ModelNotFoundError(FileNotFoundError):
-    pass
 
+def _load_payload(model_path: Path) -> Dict[str, Any]:
+    model_payload = compile_payload(load_artifact(model_path))
+    # Response parts that only depend on the model are built once per load.
+    model_payload["top_importances"] = _top_importances(model_payload.get("feature_importances", {}))
+    model_payload["class_labels"] = [str(label) for label in model_payload["label_encoder"].classes_]
+    model_payload["contribution_groups"] = _contribution_groups(model_payload)
+    return model_payload
 
-def _load_model(model_path: Path) -> Dict[str, Any]:
-    if not model_path.exists():
-        raise ModelNotFoundError(f"Model not found at {model_path}")
-    return joblib.load(model_path)
 
+def _contribution_groups(model_payload: Dict[str, Any]) -> Optional[Tuple[List[str], np.ndarray]]:
+    """Base feature names and the 0/1 matrix that sums encoded columns into them.
 
-def predict(input_data: Dict[str, Any], model_path: Path | str = DEFAULT_MODEL_PATH) -> Dict[str, Any]:
-    model_path = Path(model_path)
-    model_payload = _load_model(model_path)
+    ``None`` when the model has no flat forest to explain.
+    """
+    # The forest's node deltas are not touched here: serving artifacts carry
+    # them memory-mapped, and other payloads build them on the first explanation.
+    if model_payload.get("flat_forest") is None:
+        return None
 
-    pipeline = model_payload["model"]
-    label_encoder = model_payload["label_encoder"]
-    feature_names = model_payload["feature_names"]
-    feature_importances = model_payload.get("feature_importances", {})
+    encoder = model_payload.get("compiled_encoder")
+    if encoder is not None:
+        column_features = list(encoder.base_features)
+    else:
+        preprocessor = model_payload["model"].named_steps["preprocessor"]
+        column_features = [base_feature_name(name) for name in preprocessor.get_feature_names_out()]
+    names = list(dict.fromkeys(column_features))
+    groups = np.zeros((len(column_features), len(names)), dtype=np.float64)
+    groups[np.arange(len(column_features)), [names.index(name) for name in column_features]] = 1.0
+    return names, groups
 
-    normalized = ensure_feature_order(input_data)
-    input_df = pd.DataFrame([normalized], columns=feature_names)
 
-    predictions = pipeline.predict(input_df)
-    probabilities = pipeline.predict_proba(input_df)[0]
+MODEL_REGISTRY = ModelRegistry(
+    max_bytes=int(os.environ.get("MODEL_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+    loader=_load_payload,
+    on_load=observe_model_load,
+)
 
-    predicted_index = int(predictions[0])
-    predicted_label = label_encoder.inverse_transform([predicted_index])[0]
-    probability = float(probabilities[predicted_index])
 
-    formatted_importances = [
+def _load_model(model_path: Path) -> Dict[str, Any]:
+    return MODEL_REGISTRY.get(model_path)
+
+
+def _top_importances(feature_importances: Dict[str, float]) -> List[Dict[str, Any]]:
+    return [
         {"feature": name, "importance": float(value)}
         for name, value in sorted(feature_importances.items(), key=lambda item: item[1], reverse=True)[:5]
     ]
 
+
+def _model_metadata(model_path: Path, model_payload: Dict[str, Any], compact: bool = False) -> Dict[str, Any]:
+    """Model details echoed in responses; ``compact`` replaces the full schema with its fingerprint."""
+    metadata: Dict[str, Any] = {"model_path": str(model_path.name)}
+    if compact:
+        metadata["feature_schema_hash"] = SCHEMA_FINGERPRINT
+    else:
+        metadata["feature_schema_version"] = SCHEMA
+    metadata["available_classes"] = list(model_payload["class_labels"])
+    return metadata
+
+
+def _resolve_engine(model_payload: Dict[str, Any], engine: Optional[str]) -> str:
+    engine = engine or model_payload.get("inference_engine", "sklearn")
+    if engine not in INFERENCE_ENGINES:
+        raise ValueError(f"Unknown inference engine '{engine}'; expected one of {', '.join(INFERENCE_ENGINES)}")
+    if engine == "flat" and model_payload.get("flat_forest") is None:
+        raise ValueError("This model does not support the flat inference engine")
+    if engine == "sklearn" and "model" not in model_payload:
+        raise ValueError("This model artifact only supports the flat inference engine")
+    return engine
+
+
+def _encode_frame(model_payload: Dict[str, Any], input_df: pd.DataFrame) -> np.ndarray:
+    encoder = model_payload.get("compiled_encoder")
+    if encoder is not None:
+        return encoder.transform_frame(input_df)
+    return model_payload["model"].named_steps["preprocessor"].transform(input_df)
+
+
+def _encode_records(model_payload: Dict[str, Any], records: Sequence[Dict[str, Any]]) -> np.ndarray:
+    """Encode ``ensure_feature_order`` dicts; cheaper than a frame for the handful of rows of a request."""
+    encoder = model_payload.get("compiled_encoder")
+    if encoder is not None:
+        if len(records) == 1:
+            return encoder.transform_record(records[0])
+        return np.vstack([encoder.transform_record(record) for record in records])
+    return _encode_frame(model_payload, pd.DataFrame(list(records), columns=model_payload["feature_names"]))
+
+
+def _classify(model_payload: Dict[str, Any], encoded: np.ndarray, engine: str) -> np.ndarray:
+    # Above FLAT_ENGINE_MAX_ROWS sklearn's compiled per-tree loop beats the
+    # level-by-level NumPy traversal, so large batches stay on sklearn when the
+    # payload still carries the pipeline (memory-mapped artifacts do not).
+    if engine == "flat" and (len(encoded) <= FLAT_ENGINE_MAX_ROWS or "model" not in model_payload):
+        return model_payload["flat_forest"].predict_proba(encoded)
+    return model_payload["model"].named_steps["classifier"].predict_proba(encoded)
+
+
+def _format_scores(class_labels: List[str], probabilities: np.ndarray) -> List[Dict[str, Any]]:
+    predicted_indices = probabilities.argmax(axis=1)
+    return [
+        {
+            "prediction": class_labels[predicted_index],
+            "confidence": float(row[predicted_index]),
+            "probabilities": {label: float(row[idx]) for idx, label in enumerate(class_labels)},
+        }
+        for row, predicted_index in zip(probabilities.tolist(), predicted_indices.tolist())
+    ]
+
+
+def _explain(model_payload: Dict[str, Any], encoded: np.ndarray, probabilities: np.ndarray) -> List[Dict[str, Any]]:
+    """Per-row contributions of each base feature to the predicted class probability.
+
+    ``bias`` (the training class frequency at the tree roots) plus every
+    ``contribution`` equals the predicted class probability.
+    """
+    if model_payload.get("contribution_groups") is None:
+        raise ValueError("This model does not support per-prediction explanations")
+    names, groups = model_payload["contribution_groups"]
+    bias, contributions = model_payload["flat_forest"].contributions(encoded)
+
+    rows = np.arange(len(encoded))
+    predicted = probabilities.argmax(axis=1)
+    by_feature = contributions[rows, :, predicted] @ groups
+    order = np.argsort(-np.abs(by_feature), axis=1, kind="stable")
+    return [
+        {
+            "class": model_payload["class_labels"][class_index],
+            "bias": float(bias[class_index]),
+            "contributions": [
+                {"feature": names[position], "contribution": float(values[position])} for position in ranking
+            ],
+        }
+        for class_index, values, ranking in zip(predicted.tolist(), by_feature, order)
+    ]
+
+
+def predict(
+    input_data: Dict[str, Any],
+    model_path: Path | str = DEFAULT_MODEL_PATH,
+    engine: Optional[str] = None,
+    timer: Optional[StageTimer] = None,
+    compact: bool = False,
+    explain: bool = False,
+) -> Dict[str, Any]:
+    """Score one payload.
+
+    With ``explain`` the result also carries an ``explanation``: the
+    contribution of every base feature to the predicted class probability,
+    decomposed along the forest's decision paths.
+    """
+    timer = timer if timer is not None else StageTimer()
+    model_path = Path(model_path)
+    with timer.stage("load"):
+        model_payload = _load_model(model_path)
+        engine = _resolve_engine(model_payload, engine)
+
+    with timer.stage("normalize"):
+        normalized = ensure_feature_order(input_data)
+    with timer.stage("encode"):
+        encoded = _encode_records(model_payload, [normalized])
+    with timer.stage("classify"):
+        probabilities = _classify(model_payload, encoded, engine)
+
+    with timer.stage("format"):
+        result = _format_scores(model_payload["class_labels"], probabilities)[0]
+        result["feature_importance"] = model_payload["top_importances"]
+        result["model_metadata"] = _model_metadata(model_path, model_payload, compact)
+    if explain:
+        with timer.stage("explain"):
+            result["explanation"] = _explain(model_payload, encoded, probabilities)[0]
+    return result
+
+
+def predict_batch(
+    items: Sequence[Any],
+    model_path: Path | str = DEFAULT_MODEL_PATH,
+    strict: bool = False,
+    engine: Optional[str] = None,
+    timer: Optional[StageTimer] = None,
+    compact: bool = False,
+    explain: bool = False,
+) -> Dict[str, Any]:
+    """Score many payloads with one ``predict_proba`` call.
+
+    Payloads are normalized column-wise with ``normalize_frame``. Results are
+    returned in input order. Items that are not objects, or that
+    fail ``validate_feature_payload`` when ``strict`` is set, are reported
+    with their errors instead of a prediction; they do not abort the batch.
+    Importances and model metadata are shared by every item, so they are
+    returned once rather than per result; ``explain`` adds a per-item
+    ``explanation`` as in :func:`predict`.
+    """
+    timer = timer if timer is not None else StageTimer()
+    model_path = Path(model_path)
+    with timer.stage("load"):
+        model_payload = _load_model(model_path)
+        engine = _resolve_engine(model_payload, engine)
+
+    results: List[Dict[str, Any]] = [{"index": index} for index in range(len(items))]
+    candidate_indices: List[int] = []
+
+    with timer.stage("frame"):
+        for index, item in enumerate(items):
+            if isinstance(item, dict):
+                candidate_indices.append(index)
+            else:
+                results[index]["errors"] = ["Item must be an object of feature values"]
+
+        raw_df = pd.DataFrame.from_records(
+            [items[index] for index in candidate_indices],
+            columns=model_payload["feature_names"],
+        )
+    valid_rows = np.ones(len(raw_df), dtype=bool)
+
+    if strict and len(raw_df):
+        with timer.stage("validate"):
+            # validate_frame only narrows down the rows to check; the payload
+            # check decides, so a row is dropped exactly when it has errors.
+            for position in np.flatnonzero(validate_frame(raw_df).to_numpy().any(axis=1)):
+                index = candidate_indices[position]
+                valid, errors = validate_feature_payload(items[index])
+                if not valid:
+                    valid_rows[position] = False
+                    results[index]["errors"] = errors
+
+    with timer.stage("normalize"):
+        input_df = normalize_frame(raw_df[valid_rows])
+    if len(input_df):
+        valid_indices = [index for index, valid in zip(candidate_indices, valid_rows) if valid]
+        with timer.stage("encode"):
+            encoded = _encode_frame(model_payload, input_df)
+        with timer.stage("classify"):
+            probabilities = _classify(model_payload, encoded, engine)
+        with timer.stage("format"):
+            scores = _format_scores(model_payload["class_labels"], probabilities)
+            for index, scored in zip(valid_indices, scores):
+                results[index].update(scored)
+        if explain:
+            with timer.stage("explain"):
+                for index, explanation in zip(valid_indices, _explain(model_payload, encoded, probabilities)):
+                    results[index]["explanation"] = explanation
+
     return {
-        "prediction": predicted_label,
-        "confidence": probability,
-        "probabilities": {
-            str(label): float(probabilities[idx])
-            for idx, label in enumerate(label_encoder.classes_)
-        },
-        "feature_importance": formatted_importances,
-        "model_metadata": {
-            "model_path": str(model_path.name),
-            "feature_schema_version": SCHEMA,
-            "available_classes": label_encoder.classes_.tolist(),
-        },
+        "results": results,
+        "feature_importance": model_payload["top_importances"],
+        "model_metadata": _model_metadata(model_path, model_payload, compact),
     }
 
 
+def predict_records(
+    records: Sequence[Dict[str, Any]],
+    model_path: Path | str = DEFAULT_MODEL_PATH,
+    engine: Optional[str] = None,
+    timer: Optional[StageTimer] = None,
+    compact: bool = False,
+    explain: bool = False,
+) -> List[Dict[str, Any]]:
+    """Score independent single-record requests together; one :func:`predict` result each.
+
+    Used by the service's micro-batcher. Records are normalized and encoded
+    one by one exactly as in :func:`predict`, which costs microseconds, and
+    classified with a single ``predict_proba`` call, which is where batching
+    pays off. ``normalize_frame`` is skipped on purpose: its fixed cost
+    dominates at micro-batch sizes.
+    """
+    timer = timer if timer is not None else StageTimer()
+    model_path = Path(model_path)
+    with timer.stage("load"):
+        model_payload = _load_model(model_path)
+        engine = _resolve_engine(model_payload, engine)
+
+    with timer.stage("normalize"):
+        normalized = [ensure_feature_order(record) for record in records]
+    with timer.stage("encode"):
+        encoded = _encode_records(model_payload, normalized)
+    with timer.stage("classify"):
+        probabilities = _classify(model_payload, encoded, engine)
+
+    with timer.stage("format"):
+        results = _format_scores(model_payload["class_labels"], probabilities)
+        metadata = _model_metadata(model_path, model_payload, compact)
+        for result in results:
+            result["feature_importance"] = model_payload["top_importances"]
+            result["model_metadata"] = metadata
+    if explain:
+        with timer.stage("explain"):
+            for result, explanation in zip(results, _explain(model_payload, encoded, probabilities)):
+                result["explanation"] = explanation
+    return results
+
+
+def run_with_timings(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Tuple[Any, Dict[str, float]]:
+    """Call ``predict``/``predict_batch`` and return ``(result, stage durations)``.
+
+    Module-level so it can be sent to a process pool; the durations travel
+    back with the result rather than through a shared ``StageTimer``.
+    """
+    timer = StageTimer()
+    return fn(*args, timer=timer, **kwargs), timer.durations
+
+
+def _parse_json_lines(lines: Iterable[str]) -> Iterator[Tuple[int, Any, Optional[str]]]:
+    """Yield ``(line_number, payload, error)`` for every non-blank line."""
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line), None
+        except json.JSONDecodeError as exc:
+            yield line_number, None, f"Invalid JSON: {exc.msg}"
+
+
+def stream_predictions(
+    lines: Iterable[str],
+    output: TextIO,
+    model_path: Path | str = DEFAULT_MODEL_PATH,
+    batch_size: int = DEFAULT_STREAM_BATCH_SIZE,
+    strict: bool = False,
+    engine: Optional[str] = None,
+    id_field: Optional[str] = None,
+    explain: bool = False,
+) -> Dict[str, int]:
+    """Score newline-delimited JSON payloads, writing one JSON result per input line.
+
+    The model is loaded once and records are scored ``batch_size`` at a time
+    with :func:`predict_batch`. Each output line carries the input ``line``
+    number, plus the value of ``id_field`` when the payload has one. Lines
+    that are not valid JSON objects, or fail validation under ``strict``, get
+    an ``errors`` record instead of aborting the stream. Importances and model
+    metadata are shared by every record and are not repeated per line.
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+
+    _load_model(Path(model_path))
+    counts = {"scored": 0, "errors": 0}
+    parsed = _parse_json_lines(lines)
+
+    while True:
+        chunk = list(islice(parsed, batch_size))
+        if not chunk:
+            break
+
+        valid = [(line_number, payload) for line_number, payload, error in chunk if error is None]
+        scored = iter(
+            predict_batch(
+                [payload for _, payload in valid], model_path, strict=strict, engine=engine, explain=explain
+            )["results"]
+        )
+        for line_number, payload, error in chunk:
+            record: Dict[str, Any] = {"line": line_number}
+            if id_field is not None and isinstance(payload, dict) and id_field in payload:
+                record[id_field] = payload[id_field]
+            if error is not None:
+                record["errors"] = [error]
+            else:
+                result = next(scored)
+                result.pop("index")
+                record.update(result)
+            counts["errors" if "errors" in record else "scored"] += 1
+            output.write(json.dumps(record) + "\n")
+        output.flush()
+
+    return counts
+
+
 if __name__ == "__main__":
-    import sys
+    import argparse
 
-    if len(sys.argv) < 2:
-        raise SystemExit("Usage: python predict.py '{\"age\": 20, ...}'")
+    parser = argparse.ArgumentParser(description="Score student feature payloads")
+    parser.add_argument("payload", nargs="?", help="A single JSON feature payload")
+    parser.add_argument(
+        "--jsonl",
+        metavar="PATH",
+        help="Score newline-delimited JSON payloads from PATH ('-' for stdin), one result per line",
+    )
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH, help="Model file to score with")
+    parser.add_argument("--engine", choices=INFERENCE_ENGINES, default=None)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_STREAM_BATCH_SIZE, help="Records per batch for --jsonl")
+    parser.add_argument("--strict", action="store_true", help="Reject payloads that fail schema validation")
+    parser.add_argument("--id-field", default=None, help="Payload key copied into each --jsonl result")
+    parser.add_argument("--compact", action="store_true", help="Report the schema hash instead of the full schema")
+    parser.add_argument("--explain", action="store_true", help="Add per-feature contributions to each prediction")
+    args = parser.parse_args()
 
-    input_json = sys.argv[1]
-    input_payload = json.loads(input_json)
-    result = predict(input_payload)
-    print(json.dumps(result, indent=2))
+    if args.jsonl is not None:
+        source = sys.stdin if args.jsonl == "-" else open(args.jsonl, "r", encoding="utf-8")
+        with source:
+            counts = stream_predictions(
+                source,
+                sys.stdout,
+                model_path=args.model,
+                batch_size=args.batch_size,
+                strict=args.strict,
+                engine=args.engine,
+                id_field=args.id_field,
+                explain=args.explain,
+            )
+        print(f"Scored {counts['scored']} records, {counts['errors']} errors", file=sys.stderr)
+    elif args.payload is not None:
+        input_payload = json.loads(args.payload)
+        result = predict(
+            input_payload, model_path=args.model, engine=args.engine, compact=args.compact, explain=args.explain
+        )
+        print(json.dumps(result, indent=2))
+    else:
+        parser.error("Pass a JSON payload or --jsonl PATH")
@@ -1,13 +1,20 @@
 from __future__ import annotations
 
 import logging
+import os
+import time
 from pathlib import Path
-from typing import Dict, Tuple
+from typing import Dict, Iterator, Tuple
 
 import numpy as np
 import pandas as pd
 
-from features import ensure_feature_order, serialize_feature_schema
+from features import (
+    ensure_feature_order,
+    normalize_frame,
+    round_values,
+    serialize_feature_schema,
+)
 
 
 BASE_DIR = Path(__file__).resolve().parent
@@ -17,6 +24,12 @@ DEFAULT_OUTPUT_PATH = BASE_DIR.parent / "processed_data.csv"
 TARGET_COLUMN = "Target"
 CANONICAL_TARGET_COLUMN = "target"
 
+DEFAULT_CHUNK_SIZE = 50_000
+
+# Course codes are read as text so that every chunk of a streamed read sees the
+# same values, whatever dtype pandas would infer for that chunk alone.
+RAW_DTYPES = {"Course": str}
+
 logger = logging.getLogger(__name__)
 
 
@@ -197,7 +210,19 @@ def _map_target(raw_target: str) -> str:
     return "safe"
 
 
-def transform_dataset(raw_df: pd.DataFrame) -> pd.DataFrame:
+_TARGET_MAPPING = {"dropout": "dropout", "enrolled": "at_risk", "graduate": "safe"}
+
+
+def known_targets(raw_df: pd.DataFrame) -> np.ndarray:
+    """Mask of the rows whose ``Target`` is one of the outcomes the dataset defines.
+
+    :func:`transform_dataset` maps any other value, a typo included, to ``"safe"``.
+    """
+    target = raw_df[TARGET_COLUMN].astype(str).str.strip().str.lower()
+    return target.isin(_TARGET_MAPPING).to_numpy()
+
+
+def _transform_rows(raw_df: pd.DataFrame) -> pd.DataFrame:
     feature_records = []
 
     for _, row in raw_df.iterrows():
@@ -238,8 +263,134 @@ def transform_dataset(raw_df: pd.DataFrame) -> pd.DataFrame:
     return processed_df
 
 
+def _column(raw_df: pd.DataFrame, name: str) -> np.ndarray:
+    return pd.to_numeric(raw_df[name], errors="coerce").to_numpy(dtype=np.float64)
+
+
+def _sem_sum(raw_df: pd.DataFrame, measure: str) -> np.ndarray:
+    return _column(raw_df, f"Curricular units 1st sem ({measure})") + _column(
+        raw_df, f"Curricular units 2nd sem ({measure})"
+    )
+
+
+def _transform_columns(raw_df: pd.DataFrame) -> pd.DataFrame:
+    age = _column(raw_df, "Age at enrollment")
+    gender = np.trunc(_column(raw_df, "Gender"))
+    mother_qualification = np.trunc(_column(raw_df, "Mother's qualification"))
+    scholarship = _column(raw_df, "Scholarship holder")
+    tuition = _column(raw_df, "Tuition fees up to date")
+    daytime = _column(raw_df, "Daytime/evening attendance")
+    debtor = _column(raw_df, "Debtor")
+    displaced = _column(raw_df, "Displaced")
+    international = _column(raw_df, "International")
+
+    grade_first = _column(raw_df, "Curricular units 1st sem (grade)")
+    grade_second = _column(raw_df, "Curricular units 2nd sem (grade)")
+    enrolled_first = _column(raw_df, "Curricular units 1st sem (enrolled)")
+    enrolled_second = _column(raw_df, "Curricular units 2nd sem (enrolled)")
+    enrolled = enrolled_first + enrolled_second
+    evaluations = _sem_sum(raw_df, "evaluations")
+    approved = _sem_sum(raw_df, "approved")
+
+    grades = np.column_stack([grade_first, grade_second])
+    grades[grades == 0] = np.nan
+    graded = ~np.isnan(grades)
+    grade_count = graded.sum(axis=1)
+    grade_mean = np.divide(
+        np.where(graded, grades, 0).sum(axis=1),
+        grade_count,
+        out=np.zeros_like(grade_first),
+        where=grade_count > 0,
+    )
+    gpa = np.where(grade_count > 0, round_values(np.clip(grade_mean / 5.0, 0, 4), 3), 2.5)
+
+    attendance = np.divide(
+        evaluations * 100, enrolled, out=np.full_like(enrolled, 75.0), where=enrolled != 0
+    )
+    attendance = np.where(enrolled == 0, 75.0, np.clip(attendance, 0, 100))
+
+    # str(nan) is "nan" in the row helpers; newer pandas keep NaN through astype(str).
+    course = raw_df["Course"].astype(str).fillna("nan").str.strip()
+    course = ("course_" + course.str.lower()).where(course != "", "course_unknown")
+
+    target = raw_df[TARGET_COLUMN].astype(str).str.strip().str.lower()
+
+    frame = pd.DataFrame(
+        {
+            "age": np.clip(age, 16, 65),
+            "gender": np.select([np.isnan(gender), gender == 1], ["other", "male"], "female"),
+            "gpa": gpa,
+            "attendance_rate": attendance,
+            "previous_failures": np.clip(_sem_sum(raw_df, "without evaluations") + enrolled - approved, 0, 30),
+            "study_hours_per_week": round_values(np.clip(evaluations * 1.5, 0, 80), 2),
+            # NaN is truthy in the row helpers, so "not equal to zero" mirrors them.
+            "internet_access": (tuition == 1) | (scholarship != 0),
+            "extracurricular_involvement": daytime == 1,
+            "part_time_job": debtor == 1,
+            "financial_aid": scholarship == 1,
+            "family_income": np.select([scholarship == 1, tuition == 1], [15000.0, 32000.0], 22000.0),
+            "parental_education_level": np.select(
+                [
+                    np.isnan(mother_qualification),
+                    mother_qualification <= 1,
+                    mother_qualification <= 3,
+                    mother_qualification <= 5,
+                    mother_qualification <= 8,
+                    mother_qualification <= 12,
+                ],
+                ["other", "no_education", "primary", "secondary", "bachelors", "masters"],
+                "phd",
+            ),
+            "course_of_study": course.to_numpy(dtype=object),
+            "semester": np.where(enrolled_second > enrolled_first, 2.0, 1.0),
+            "living_situation": np.select(
+                [displaced > 0, international > 0], ["hostel", "rented_accommodation"], "with_family"
+            ),
+            "distance_from_home": np.select([international == 1, displaced == 1], [500.0, 75.0], 15.0),
+            "mental_health_score": np.clip(6.0 - 1.5 * (debtor > 0) + 0.5 * (tuition == 1), 0, 10),
+            "mode_of_transport": np.where(daytime == 1, "bus", "other"),
+            "grades_average": np.clip((grade_first + grade_second) / 2 * 5, 0, 100),
+            "grades_count": np.clip(enrolled, 0, 40),
+        },
+        index=raw_df.index,
+    )
+
+    # A NaN derivation (from a missing raw cell) takes the feature default here
+    # and in Feature.normalize alike, so the engines agree without a fill.
+    processed_df = normalize_frame(frame)
+    processed_df[CANONICAL_TARGET_COLUMN] = target.map(_TARGET_MAPPING).fillna("safe").to_numpy(dtype=object)
+    return processed_df.reset_index(drop=True)
+
+
+TRANSFORM_ENGINES = {
+    "rows": _transform_rows,
+    "vectorized": _transform_columns,
+}
+
+
+def transform_dataset(raw_df: pd.DataFrame, engine: str = "vectorized") -> pd.DataFrame:
+    """Map raw dataset columns into the feature schema.
+
+    ``engine="vectorized"`` derives every feature with column arithmetic;
+    ``engine="rows"`` is the original per-row implementation, kept as the
+    reference for :func:`check_engine_parity`.
+    """
+    if engine not in TRANSFORM_ENGINES:
+        raise ValueError(f"Unknown transform engine '{engine}'; expected one of {', '.join(TRANSFORM_ENGINES)}")
+    return TRANSFORM_ENGINES[engine](raw_df)
+
+
+def check_engine_parity(raw_df: pd.DataFrame, rtol: float = 1e-9) -> None:
+    """Raise ``AssertionError`` if the engines disagree on ``raw_df``."""
+    expected = transform_dataset(raw_df, engine="rows")
+    actual = transform_dataset(raw_df, engine="vectorized")
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False, rtol=rtol)
+
+
 def preprocess_data(
-    input_path: str | Path = DEFAULT_INPUT_PATH, output_path: str | Path = DEFAULT_OUTPUT_PATH
+    input_path: str | Path = DEFAULT_INPUT_PATH,
+    output_path: str | Path = DEFAULT_OUTPUT_PATH,
+    engine: str = "vectorized",
 ) -> pd.DataFrame:
     input_path = Path(input_path)
     output_path = Path(output_path)
@@ -248,10 +399,10 @@ def preprocess_data(
         raise FileNotFoundError(f"Dataset not found at {input_path}")
 
     logger.info("Loading dataset from %s", input_path)
-    raw_df = pd.read_csv(input_path)
+    raw_df = pd.read_csv(input_path, dtype=RAW_DTYPES)
 
-    logger.info("Transforming dataset into feature space")
-    processed_df = transform_dataset(raw_df)
+    logger.info("Transforming dataset into feature space (engine=%s)", engine)
+    processed_df = transform_dataset(raw_df, engine=engine)
 
     logger.info("Writing processed dataset to %s", output_path)
     output_path.parent.mkdir(parents=True, exist_ok=True)
@@ -264,6 +415,138 @@ def preprocess_data(
     return processed_df
 
 
+def iter_raw_chunks(input_path: str | Path, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """Yield the raw dataset in frames of at most ``chunk_size`` rows."""
+    with pd.read_csv(input_path, dtype=RAW_DTYPES, chunksize=chunk_size) as reader:
+        yield from reader
+
+
+def chunk_size_for_budget(
+    input_path: str | Path,
+    max_bytes: int,
+    engine: str = "vectorized",
+    sample_rows: int = 1000,
+) -> int:
+    """Rows per chunk that keep one chunk's working set within ``max_bytes``.
+
+    The per-row cost is measured on the first ``sample_rows`` rows (raw frame
+    plus transformed frame) and tripled to cover the intermediate column
+    arrays and the CSV text produced while writing.
+    """
+    sample = pd.read_csv(input_path, dtype=RAW_DTYPES, nrows=sample_rows)
+    if sample.empty:
+        return DEFAULT_CHUNK_SIZE
+    transformed = transform_dataset(sample, engine=engine)
+    per_row = (sample.memory_usage(deep=True).sum() + transformed.memory_usage(deep=True).sum()) / len(sample)
+    return max(1, int(max_bytes // (per_row * 3)))
+
+
+def stream_preprocess(
+    input_path: str | Path = DEFAULT_INPUT_PATH,
+    output_path: str | Path = DEFAULT_OUTPUT_PATH,
+    chunk_size: int | None = None,
+    max_memory_bytes: int | None = None,
+    engine: str = "vectorized",
+) -> Dict[str, float]:
+    """Transform ``input_path`` chunk by chunk, appending each chunk to ``output_path``.
+
+    Only one chunk is held in memory at a time, so peak memory is set by
+    ``chunk_size`` (or derived from ``max_memory_bytes``) rather than by the
+    size of the dataset. Every feature is derived from its own row, so the
+    output is byte-identical to :func:`preprocess_data`. The file is written
+    next to ``output_path`` and moved into place once complete.
+    """
+    input_path = Path(input_path)
+    output_path = Path(output_path)
+
+    if not input_path.exists():
+        raise FileNotFoundError(f"Dataset not found at {input_path}")
+
+    if chunk_size is None:
+        if max_memory_bytes is not None:
+            chunk_size = chunk_size_for_budget(input_path, max_memory_bytes, engine=engine)
+        else:
+            chunk_size = DEFAULT_CHUNK_SIZE
+
+    total_bytes = input_path.stat().st_size
+    logger.info(
+        "Streaming %s (%.1f MiB) in chunks of %s rows (engine=%s)",
+        input_path,
+        total_bytes / (1024 * 1024),
+        chunk_size,
+        engine,
+    )
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    partial_path = output_path.with_name(output_path.name + ".partial")
+    started = time.perf_counter()
+    rows = 0
+    chunks = 0
+
+    try:
+        with partial_path.open("w", encoding="utf-8", newline="") as fp:
+            for raw_chunk in iter_raw_chunks(input_path, chunk_size):
+                processed_chunk = transform_dataset(raw_chunk, engine=engine)
+                processed_chunk.to_csv(fp, index=False, header=chunks == 0)
+                rows += len(processed_chunk)
+                chunks += 1
+
+                elapsed = time.perf_counter() - started
+                logger.info(
+                    "Processed chunk %s: %s rows total, %.0f rows/s",
+                    chunks,
+                    rows,
+                    rows / elapsed if elapsed else float("inf"),
+                )
+        os.replace(partial_path, output_path)
+    except BaseException:
+        partial_path.unlink(missing_ok=True)
+        raise
+
+    serialize_feature_schema(output_path.parent / "feature_schema_snapshot.json")
+
+    elapsed = time.perf_counter() - started
+    logger.info("Wrote %s rows in %s chunks to %s in %.2fs", rows, chunks, output_path, elapsed)
+    return {"rows": rows, "chunks": chunks, "chunk_size": chunk_size, "seconds": elapsed}
+
+
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Transform the raw dataset into the feature schema")
+    parser.add_argument("--input", default=DEFAULT_INPUT_PATH, help="Raw dataset CSV")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_PATH, help="Processed dataset CSV")
+    parser.add_argument("--engine", choices=sorted(TRANSFORM_ENGINES), default="vectorized")
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Transform the dataset in chunks instead of loading it into memory",
+    )
+    parser.add_argument("--chunk-size", type=int, default=None, help="Rows per chunk for --stream")
+    parser.add_argument(
+        "--max-memory-mb",
+        type=float,
+        default=None,
+        help="Derive the --stream chunk size from a working-set budget in MiB",
+    )
+    parser.add_argument(
+        "--check-parity",
+        action="store_true",
+        help="Compare the vectorized engine against the per-row engine instead of writing output",
+    )
+    args = parser.parse_args()
+
     logging.basicConfig(level=logging.INFO)
-    preprocess_data()
+    if args.check_parity:
+        check_engine_parity(pd.read_csv(args.input, dtype=RAW_DTYPES))
+        logger.info("Vectorized and per-row engines agree on %s", args.input)
+    elif args.stream:
+        stream_preprocess(
+            args.input,
+            args.output,
+            chunk_size=args.chunk_size,
+            max_memory_bytes=int(args.max_memory_mb * 1024 * 1024) if args.max_memory_mb else None,
+            engine=args.engine,
+        )
+    else:
+        preprocess_data(args.input, args.output, engine=args.engine)
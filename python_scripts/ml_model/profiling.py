@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+import cProfile
+import functools
+import io
+import logging
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent
+DEFAULT_PROFILE_DIR = BASE_DIR / "profiles"
+PROFILE_MODES = ("deterministic", "sampling")
+DEFAULT_MAX_PROFILES = 50
+DEFAULT_INTERVAL_SECONDS = 0.001
+SUMMARY_TOP_N = 25
+
+_UNSAFE_LABEL = re.compile(r"[^A-Za-z0-9_-]+")
+# Only one cProfile profiler can be active per process (Python 3.12+ raises
+# otherwise), so concurrent deterministic profiles fall back to sampling.
+_DETERMINISTIC_LOCK = threading.Lock()
+
+
+def _frame_name(code: Any) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class _StackSampler(threading.Thread):
+    """Records the stack of one thread every ``interval`` seconds as folded stacks."""
+
+    def __init__(self, thread_id: int, interval: float) -> None:
+        super().__init__(name="profile-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter[Tuple[str, ...]] = Counter()
+        self._stop = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[tuple(reversed(stack))] += 1
+
+    def stop(self) -> None:
+        self._stop.set()
+        self.join()
+
+
+def _sampling_summary(stacks: Counter[Tuple[str, ...]], top_n: int) -> str:
+    total = sum(stacks.values())
+    own: Counter[str] = Counter()
+    inclusive: Counter[str] = Counter()
+    for stack, count in stacks.items():
+        own[stack[-1]] += count
+        for name in set(stack):
+            inclusive[name] += count
+
+    lines = [f"{total} samples", "", f"{'self %':>8} {'total %':>8}  function"]
+    for name, count in own.most_common(top_n):
+        lines.append(f"{100 * count / total:8.1f} {100 * inclusive[name] / total:8.1f}  {name}")
+    return "\n".join(lines) + "\n"
+
+
+def _deterministic_summary(profile: cProfile.Profile, top_n: int) -> str:
+    buffer = io.StringIO()
+    stats = pstats.Stats(profile, stream=buffer).strip_dirs()
+    stats.sort_stats(pstats.SortKey.TIME).print_stats(top_n)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top_n)
+    return buffer.getvalue()
+
+
+class Profiler:
+    """Opt-in profiling of prediction calls and training runs.
+
+    ``sample_rate`` is the fraction of calls profiled (0 disables profiling;
+    callers may still force a run, e.g. from the service's admin flag). A
+    profile is written under ``profile_dir`` as ``<stamp>-<label>``:
+
+    * ``deterministic``: ``.prof`` (``pstats``/snakeviz/flameprof) from
+      ``cProfile``, which sees every Python and C call;
+    * ``sampling``: ``.folded`` collapsed stacks (flamegraph.pl, speedscope)
+      taken every ``interval`` seconds from a helper thread; cheaper, suited to
+      long training runs.
+
+    Both write a ``.txt`` summary of the hottest functions. Only the newest
+    ``max_profiles`` profiles are kept. Only the calling thread is profiled,
+    so worker processes of a parallel training run are not covered.
+
+    A deterministic profile requested while another one is running in the
+    process is taken in sampling mode instead. Profiling never fails the
+    profiled call: a profile that cannot be written is logged and skipped.
+
+    When disabled, :meth:`should_profile` is one comparison and no profiler is
+    installed.
+    """
+
+    def __init__(
+        self,
+        sample_rate: float = 0.0,
+        profile_dir: Path | str = DEFAULT_PROFILE_DIR,
+        mode: str = "deterministic",
+        max_profiles: int = DEFAULT_MAX_PROFILES,
+        interval: float = DEFAULT_INTERVAL_SECONDS,
+        token: Optional[str] = None,
+    ) -> None:
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Profile mode must be one of {', '.join(PROFILE_MODES)}")
+        self.sample_rate = sample_rate
+        self.profile_dir = Path(profile_dir)
+        self.mode = mode
+        self.max_profiles = max_profiles
+        self.interval = interval
+        self.token = token
+
+    @classmethod
+    def from_env(cls) -> "Profiler":
+        return cls(
+            sample_rate=float(os.environ.get("PROFILE_SAMPLE_RATE", 0.0)),
+            profile_dir=os.environ.get("PROFILE_DIR") or DEFAULT_PROFILE_DIR,
+            mode=os.environ.get("PROFILE_MODE", "deterministic"),
+            max_profiles=int(os.environ.get("PROFILE_MAX_FILES", DEFAULT_MAX_PROFILES)),
+            interval=float(os.environ.get("PROFILE_INTERVAL_MS", DEFAULT_INTERVAL_SECONDS * 1000)) / 1000,
+            token=os.environ.get("PROFILE_TOKEN") or None,
+        )
+
+    def should_profile(self) -> bool:
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def authorized(self, token: Optional[str]) -> bool:
+        """Whether ``token`` may force a profile; always false when no ``PROFILE_TOKEN`` is set."""
+        return self.token is not None and token is not None and token == self.token
+
+    @contextmanager
+    def profile(self, label: str, mode: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Profile the body; on exit the yielded dict gets the ``mode`` used and the profile ``name``.
+
+        ``name`` is the file name without suffix, or ``None`` if the profile
+        could not be written.
+        """
+        mode = mode or self.mode
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Profile mode must be one of {', '.join(PROFILE_MODES)}")
+        profiler = self._start_deterministic() if mode == "deterministic" else None
+        info: Dict[str, Any] = {"mode": "deterministic" if profiler is not None else "sampling", "name": None}
+        started = time.perf_counter()
+        if profiler is not None:
+            try:
+                yield info
+            finally:
+                profiler.disable()
+                _DETERMINISTIC_LOCK.release()
+                info["name"] = self._write(label, info["mode"], time.perf_counter() - started, profiler=profiler)
+        else:
+            sampler = _StackSampler(threading.get_ident(), self.interval)
+            sampler.start()
+            try:
+                yield info
+            finally:
+                sampler.stop()
+                info["name"] = self._write(label, info["mode"], time.perf_counter() - started, stacks=sampler.stacks)
+
+    @staticmethod
+    def _start_deterministic() -> Optional[cProfile.Profile]:
+        """An enabled ``cProfile`` profiler holding the process-wide lock, or ``None`` if one is already active."""
+        if not _DETERMINISTIC_LOCK.acquire(blocking=False):
+            logger.info("A deterministic profile is already running; sampling instead")
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as exc:  # another profiling tool (e.g. a debugger) owns the hook
+            _DETERMINISTIC_LOCK.release()
+            logger.info("Cannot start cProfile (%s); sampling instead", exc)
+            return None
+        return profiler
+
+    def call(self, label: str, mode: Optional[str], fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Tuple[Any, Optional[str]]:
+        """``fn(*args, **kwargs)`` under :meth:`profile`; returns ``(result, profile name or None)``.
+
+        The profiler only holds its settings, so this bound method can be sent
+        to a process pool like ``predict.run_with_timings``.
+        """
+        with self.profile(label, mode) as info:
+            result = fn(*args, **kwargs)
+        return result, info["name"]
+
+    def _write(
+        self,
+        label: str,
+        mode: str,
+        seconds: float,
+        profiler: Optional[cProfile.Profile] = None,
+        stacks: Optional[Counter[Tuple[str, ...]]] = None,
+    ) -> Optional[str]:
+        try:
+            return self._dump(label, mode, seconds, profiler, stacks)
+        except Exception:
+            logger.exception("Could not write %s profile of %s", mode, label)
+            return None
+
+    def _dump(
+        self,
+        label: str,
+        mode: str,
+        seconds: float,
+        profiler: Optional[cProfile.Profile],
+        stacks: Optional[Counter[Tuple[str, ...]]],
+    ) -> str:
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        now = time.time()
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.localtime(now)) + f"{int(now % 1 * 1e6):06d}"
+        # No dots in the name, so Path.stem recovers it from every file of the profile.
+        name = f"{stamp}-{_UNSAFE_LABEL.sub('_', label)}-{os.getpid()}"
+        path = self.profile_dir / name
+
+        header = f"{label}: {seconds * 1000:.3f}ms, {mode} profile\n\n"
+        if profiler is not None:
+            profiler.dump_stats(f"{path}.prof")
+            summary = _deterministic_summary(profiler, SUMMARY_TOP_N)
+        else:
+            with open(f"{path}.folded", "w", encoding="utf-8") as fp:
+                for stack, count in stacks.items():
+                    fp.write(f"{';'.join(stack)} {count}\n")
+            summary = _sampling_summary(stacks, SUMMARY_TOP_N) if stacks else "no samples\n"
+        Path(f"{path}.txt").write_text(header + summary, encoding="utf-8")
+        logger.info("Wrote %s profile of %s to %s", mode, label, path)
+
+        self._rotate()
+        return name
+
+    def _rotate(self) -> None:
+        profiles: Dict[str, List[Path]] = {}
+        for file in self.profile_dir.iterdir():
+            if file.suffix in (".prof", ".folded", ".txt"):
+                profiles.setdefault(file.stem, []).append(file)
+        # Stems start with a timestamp, so they sort oldest first.
+        for stem in sorted(profiles)[: max(0, len(profiles) - self.max_profiles)]:
+            for file in profiles[stem]:
+                file.unlink(missing_ok=True)
+
+
+PROFILER = Profiler.from_env()
+
+
+def profiled(label: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Profile a sampled fraction of calls, or every call made with ``profile=<mode>``."""
+
+    def decorate(fn: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, profile: Optional[str] = None, **kwargs: Any) -> Any:
+            if profile is None and not PROFILER.should_profile():
+                return fn(*args, **kwargs)
+            with PROFILER.profile(label, profile):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
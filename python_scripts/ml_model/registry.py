@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import joblib
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+_DIGEST_CHUNK_SIZE = 1024 * 1024
+
+
+class ModelNotFoundError(FileNotFoundError):
+    pass
+
+
+def content_hash(path: Path | str) -> str:
+    """blake2b digest of a file's bytes, read in chunks."""
+    digest = hashlib.blake2b(digest_size=16)
+    with Path(path).open("rb") as fp:
+        for chunk in iter(lambda: fp.read(_DIGEST_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@dataclass
+class _Entry:
+    signature: Tuple[int, int]
+    payload: Dict[str, Any]
+    size_bytes: int
+    fingerprint: Optional[str] = None
+
+
+@dataclass
+class RegistryStats:
+    hits: int = 0
+    misses: int = 0
+    reloads: int = 0
+    evictions: int = 0
+    load_count: int = 0
+    load_seconds_total: float = 0.0
+    last_load_seconds: float = 0.0
+    load_seconds_by_model: Dict[str, float] = field(default_factory=dict)
+
+
+class ModelRegistry:
+    """Process-wide cache of loaded model payloads.
+
+    Entries are keyed by resolved path and validated against the file's
+    ``(mtime_ns, size)`` on every lookup, so a retrained model is picked up
+    without restarting the process. The on-disk size is used as the cost of
+    an entry and least-recently-used payloads are evicted once the total
+    exceeds ``max_bytes``. A single payload larger than the budget is still
+    kept, as the only resident entry.
+
+    With ``background_reload`` set, a resident payload whose manifest hash
+    (see :meth:`track_manifest`) changed keeps being served, and the new
+    version only goes live through :meth:`swap`, which loads it before
+    replacing the entry. Requests then never wait on an unpickle during a
+    rollout; the service sets this while its :class:`manifest.ModelIndex`
+    watcher is running, which it only does with the thread executor, since
+    process-pool workers never see the swaps. A file that changes without a
+    new manifest entry is still reloaded on lookup, as without the flag.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        loader: Callable[[Path], Dict[str, Any]] = joblib.load,
+        on_load: Optional[Callable[[str, float], None]] = None,
+        background_reload: bool = False,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.background_reload = background_reload
+        self._loader = loader
+        self._on_load = on_load
+        self._entries: "OrderedDict[Path, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: Dict[Path, threading.Lock] = {}
+        self._fingerprints: Dict[Path, Tuple[Tuple[int, int], str]] = {}
+        self._manifest_hashes: Dict[Path, str] = {}
+        self._stats = RegistryStats()
+
+    def get(self, model_path: Path | str) -> Dict[str, Any]:
+        path = Path(model_path).resolve()
+        signature = self._signature(path)
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and (entry.signature == signature or self._swap_pending(path, entry)):
+                self._entries.move_to_end(path)
+                self._stats.hits += 1
+                return entry.payload
+            load_lock = self._load_locks.setdefault(path, threading.Lock())
+
+        # Loads of the same file are serialized so concurrent misses unpickle once.
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(path)
+                if entry is not None and entry.signature == signature:
+                    self._entries.move_to_end(path)
+                    self._stats.hits += 1
+                    return entry.payload
+                self._stats.misses += 1
+                if entry is not None:
+                    self._stats.reloads += 1
+
+            return self._load(path, signature)
+
+    def swap(self, model_path: Path | str, fingerprint: Optional[str] = None) -> Dict[str, Any]:
+        """Load the current file and atomically replace the resident entry with it.
+
+        The previous payload keeps serving :meth:`get` until the new one is
+        fully loaded. ``fingerprint`` is the file's content hash when the
+        caller already knows it (from the manifest), so it is not re-read.
+        """
+        path = Path(model_path).resolve()
+        with self._lock:
+            load_lock = self._load_locks.setdefault(path, threading.Lock())
+        with load_lock:
+            signature = self._signature(path)
+            with self._lock:
+                entry = self._entries.get(path)
+                if entry is not None and entry.signature == signature:
+                    entry.fingerprint = entry.fingerprint or fingerprint
+                    return entry.payload
+                if entry is not None:
+                    self._stats.reloads += 1
+            return self._load(path, signature, fingerprint)
+
+    def track_manifest(self, hashes: Dict[Path, str]) -> None:
+        """Record the content hash the manifest lists for each model path, replacing the previous set."""
+        with self._lock:
+            self._manifest_hashes = {Path(path).resolve(): digest for path, digest in hashes.items()}
+
+    def is_resident(self, model_path: Path | str) -> bool:
+        path = Path(model_path).resolve()
+        with self._lock:
+            return path in self._entries
+
+    def fingerprint(self, model_path: Path | str) -> str:
+        """Content hash of the model file, recomputed only when its ``(mtime_ns, size)`` changes."""
+        path = Path(model_path).resolve()
+        known = self.cached_fingerprint(path)
+        if known is not None:
+            return known
+
+        signature = self._signature(path)
+        digest = content_hash(path)
+
+        with self._lock:
+            self._fingerprints[path] = (signature, digest)
+            entry = self._entries.get(path)
+            if entry is not None and entry.signature == signature:
+                entry.fingerprint = digest
+        return digest
+
+    def cached_fingerprint(self, model_path: Path | str) -> Optional[str]:
+        """Memoized :meth:`fingerprint` if the file is unchanged since it was hashed, else ``None``.
+
+        Under ``background_reload`` this is the hash of the resident payload,
+        which may lag the file on disk until :meth:`swap` runs.
+        """
+        path = Path(model_path).resolve()
+        with self._lock:
+            entry = self._entries.get(path)
+            if self.background_reload and entry is not None and entry.fingerprint is not None:
+                return entry.fingerprint
+        signature = self._signature(path)
+        with self._lock:
+            known = self._fingerprints.get(path)
+        if known is not None and known[0] == signature:
+            return known[1]
+        return None
+
+    def evict(self, model_path: Path | str) -> bool:
+        path = Path(model_path).resolve()
+        with self._lock:
+            return self._entries.pop(path, None) is not None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def resident_bytes(self) -> int:
+        with self._lock:
+            return sum(entry.size_bytes for entry in self._entries.values())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "hits": self._stats.hits,
+                "misses": self._stats.misses,
+                "reloads": self._stats.reloads,
+                "evictions": self._stats.evictions,
+                "load_count": self._stats.load_count,
+                "load_seconds_total": self._stats.load_seconds_total,
+                "last_load_seconds": self._stats.last_load_seconds,
+                "load_seconds_by_model": dict(self._stats.load_seconds_by_model),
+                "resident_models": [path.name for path in self._entries],
+                "resident_bytes": sum(entry.size_bytes for entry in self._entries.values()),
+                "max_bytes": self.max_bytes,
+            }
+
+    def _swap_pending(self, path: Path, entry: _Entry) -> bool:
+        # Only a new manifest hash means the watcher is about to swap the file in;
+        # any other change to a resident model is reloaded on the request path.
+        manifest_hash = self._manifest_hashes.get(path)
+        return self.background_reload and manifest_hash is not None and manifest_hash != entry.fingerprint
+
+    @staticmethod
+    def _signature(path: Path) -> Tuple[int, int]:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            raise ModelNotFoundError(f"Model not found at {path}") from None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self, path: Path, signature: Tuple[int, int], fingerprint: Optional[str] = None) -> Dict[str, Any]:
+        if fingerprint is None and self.background_reload:
+            # Resident payloads outlive file changes here, so their hash has to be pinned at load.
+            fingerprint = content_hash(path)
+        started = time.perf_counter()
+        payload = self._loader(path)
+        elapsed = time.perf_counter() - started
+        logger.info("Loaded model %s in %.3fs", path.name, elapsed)
+        if self._on_load is not None:
+            self._on_load(path.name, elapsed)
+
+        with self._lock:
+            self._stats.load_count += 1
+            self._stats.load_seconds_total += elapsed
+            self._stats.last_load_seconds = elapsed
+            self._stats.load_seconds_by_model[path.name] = elapsed
+            self._entries[path] = _Entry(signature, payload, signature[1], fingerprint)
+            self._entries.move_to_end(path)
+            if fingerprint is not None:
+                self._fingerprints[path] = (signature, fingerprint)
+            self._evict_over_budget()
+        return payload
+
+    def _evict_over_budget(self) -> None:
+        total = sum(entry.size_bytes for entry in self._entries.values())
+        while total > self.max_bytes and len(self._entries) > 1:
+            path, entry = self._entries.popitem(last=False)
+            total -= entry.size_bytes
+            self._stats.evictions += 1
+            logger.info("Evicted model %s from registry", path.name)
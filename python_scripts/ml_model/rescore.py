@@ -0,0 +1,401 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from contextlib import closing
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from artifacts import default_permissions
+from features import FEATURE_DEFINITIONS, normalize_frame
+from predict import DEFAULT_MODEL_PATH, _classify, _encode_frame, _load_model, _model_metadata, _resolve_engine
+from registry import content_hash
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_ROWS = 5000
+JOB_FILE = "rescore.json"
+# Columns of the ``predictions`` table, in migration order.
+PREDICTION_COLUMNS = (
+    "student_id",
+    "college_admin_id",
+    "prediction_result",
+    "confidence_score",
+    "feature_importance",
+    "model_metadata",
+    "model_version",
+    "input_data",
+    "predicted_at",
+    "created_at",
+    "updated_at",
+)
+
+# Mirrors of the grade tables in app/Services/StudentFeatureTransformer.php.
+_LETTER_GRADE_POINTS = {
+    "A+": 4.0, "A": 4.0, "A-": 3.7, "B+": 3.3, "B": 3.0, "B-": 2.7, "C+": 2.3,
+    "C": 2.0, "C-": 1.7, "D+": 1.3, "D": 1.0, "D-": 0.7, "E": 0.5, "F": 0.0,
+}
+_LETTER_GRADE_PERCENTAGES = {
+    "A+": 98, "A": 95, "A-": 92, "B+": 88, "B": 85, "B-": 82, "C+": 78,
+    "C": 75, "C-": 72, "D+": 68, "D": 65, "D-": 62, "E": 55, "F": 45,
+}
+_DEFAULTS = {definition["name"]: definition.get("default") for definition in FEATURE_DEFINITIONS}
+# (column, min, max) as clamped by StudentFeatureTransformer::numericValue.
+_NUMERIC_COLUMNS = (
+    ("attendance_rate", 0, 100),
+    ("previous_failures", 0, 30),
+    ("study_hours_per_week", 0, 80),
+    ("family_income", 0, None),
+    ("semester", 1, 12),
+    ("distance_from_home", 0, 2000),
+    ("mental_health_score", 0, 10),
+)
+_BOOLEAN_COLUMNS = ("internet_access", "extracurricular_involvement", "part_time_job", "financial_aid")
+_STRING_COLUMNS = ("gender", "parental_education_level", "living_situation", "mode_of_transport")
+_TRUE_STRINGS = frozenset({"1", "true", "on", "yes"})
+_UPPERCASE = re.compile(r"(.)(?=[A-Z])")
+_WHITESPACE = re.compile(r"\s+")
+
+_WORKER: Dict[str, Any] = {}
+
+
+def _snake(value: str) -> str:
+    """Laravel's ``Str::snake`` for the strings the transformer feeds it."""
+    if value.isalpha() and value.islower():
+        return value
+    value = _WHITESPACE.sub("", " ".join(word[:1].upper() + word[1:] for word in value.split(" ")))
+    return _UPPERCASE.sub(r"\1_", value).lower()
+
+
+def _normalize_string(value: Any) -> str:
+    return _snake("" if value is None else str(value).lower())
+
+
+def _normalize_course(value: Any) -> str:
+    if value is None or value == "":
+        return "course_unknown"
+    return "course_" + _snake(str(value).lower()).replace("__", "_")
+
+
+def _numeric(values: pd.Series, default: Any, low: Optional[float] = None, high: Optional[float] = None) -> pd.Series:
+    numeric = pd.to_numeric(values, errors="coerce").fillna(float(default if default is not None else 0))
+    return numeric.clip(lower=low, upper=high).round(4)
+
+
+def _boolean(values: pd.Series, default: Any) -> pd.Series:
+    def convert(value: Any) -> bool:
+        if value is None or (isinstance(value, float) and np.isnan(value)):
+            return bool(default)
+        return str(value).strip().lower() in _TRUE_STRINGS
+
+    return values.map(convert).astype(bool)
+
+
+def _grade_metrics(raw: Any) -> Tuple[Optional[float], Optional[float], int]:
+    """``(average points, average percentage, graded entries)`` of a ``grades`` JSON column value."""
+    try:
+        grades = json.loads(raw) if isinstance(raw, str) else raw
+    except json.JSONDecodeError:
+        grades = None
+    if not isinstance(grades, list):
+        return None, None, -1
+
+    points: List[float] = []
+    percentages: List[float] = []
+    count = 0
+    for entry in grades:
+        grade = entry.get("grade") if isinstance(entry, dict) else None
+        if grade is None:
+            continue
+        count += bool(grade)
+        if isinstance(grade, (int, float)) or str(grade).replace(".", "", 1).isdigit():
+            percentages.append(float(grade))
+            points.append(float(grade) / 25)
+            continue
+        normalized = str(grade).upper().strip()
+        if normalized in _LETTER_GRADE_POINTS:
+            points.append(_LETTER_GRADE_POINTS[normalized])
+        if normalized in _LETTER_GRADE_PERCENTAGES:
+            percentages.append(_LETTER_GRADE_PERCENTAGES[normalized])
+
+    return (
+        sum(points) / len(points) if points else None,
+        sum(percentages) / len(percentages) if percentages else None,
+        count,
+    )
+
+
+def student_features(students: pd.DataFrame) -> pd.DataFrame:
+    """Feature rows for ``students`` table rows, as ``StudentFeatureTransformer::transform`` builds them."""
+    metrics = [_grade_metrics(value) for value in students.get("grades", pd.Series(None, index=students.index))]
+    points = pd.Series([item[0] for item in metrics], index=students.index, dtype=float)
+    percentages = pd.Series([item[1] for item in metrics], index=students.index, dtype=float)
+    counts = pd.Series([item[2] for item in metrics], index=students.index, dtype=float)
+
+    def column(name: str) -> pd.Series:
+        return students[name] if name in students else pd.Series(None, index=students.index, dtype=object)
+
+    features = pd.DataFrame(index=students.index)
+    features["age"] = pd.to_numeric(column("age"), errors="coerce").fillna(_DEFAULTS["age"]).astype(int)
+    gpa = pd.to_numeric(column("gpa"), errors="coerce")
+    features["gpa"] = _numeric(gpa.fillna(points), 2.5, 0, 4)
+    for name, low, high in _NUMERIC_COLUMNS:
+        features[name] = _numeric(column(name), _DEFAULTS[name], low, high)
+    for name in _BOOLEAN_COLUMNS:
+        features[name] = _boolean(column(name), _DEFAULTS[name])
+    for name in _STRING_COLUMNS:
+        features[name] = column(name).where(column(name).notna(), _DEFAULTS[name]).map(_normalize_string)
+    features["course_of_study"] = column("course_of_study").map(
+        lambda value: _normalize_course(None if pd.isna(value) else value)
+    )
+    features["grades_average"] = _numeric(percentages, 75, 0, 100)
+    # No graded entries falls back to the schema default; a non-list column to the default or 0.
+    grade_default = float(_DEFAULTS["grades_count"] or 0)
+    features["grades_count"] = counts.where(counts > 0, grade_default)
+    return normalize_frame(features)
+
+
+def _read_csv(path: Path, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    yield from pd.read_csv(path, chunksize=chunk_rows, dtype={"grades": str, "course_of_study": str})
+
+
+def _read_sqlite(path: Path, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    # Keyset pagination keeps chunk boundaries stable across runs, which resuming relies on.
+    # The connection's own context manager only ends the transaction; closing() releases it.
+    with closing(sqlite3.connect(f"file:{path}?mode=ro", uri=True)) as connection:
+        last_id = -1
+        while True:
+            chunk = pd.read_sql_query(
+                "SELECT * FROM students WHERE id > ? ORDER BY id LIMIT ?", connection, params=(last_id, chunk_rows)
+            )
+            if chunk.empty:
+                return
+            yield chunk
+            last_id = int(chunk["id"].iloc[-1])
+
+
+def _source_signature(path: Path) -> Dict[str, Any]:
+    stat = path.stat()
+    return {"path": str(path.resolve()), "size_bytes": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _prepare_output(output_dir: Path, job: Dict[str, Any], restart: bool) -> Set[int]:
+    """Create or validate ``output_dir`` and return the chunk indices already written."""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    job_path = output_dir / JOB_FILE
+    parts = sorted(output_dir.glob("part-*.csv"))
+    if restart:
+        for part in parts:
+            part.unlink()
+        parts = []
+    elif job_path.exists():
+        with job_path.open("r", encoding="utf-8") as fp:
+            previous = json.load(fp)
+        changed = [key for key in ("source", "model_hash", "chunk_rows") if previous.get(key) != job[key]]
+        if changed and parts:
+            raise ValueError(
+                f"{output_dir} holds a job with a different {', '.join(changed)}; restart the job or use a new directory"
+            )
+        job["predicted_at"] = previous.get("predicted_at", job["predicted_at"])
+
+    with job_path.open("w", encoding="utf-8") as fp:
+        json.dump(job, fp, indent=2)
+    return {int(part.stem.split("-")[1]) for part in parts}
+
+
+def _init_worker(model_path: str, engine: Optional[str]) -> None:
+    logging.basicConfig(level=logging.WARNING)
+    model_payload = _load_model(Path(model_path))
+    _WORKER.update(
+        model_path=Path(model_path),
+        model_payload=model_payload,
+        engine=_resolve_engine(model_payload, engine),
+    )
+
+
+def score_chunk(index: int, students: pd.DataFrame, output_dir: str, predicted_at: str) -> Tuple[int, int, float]:
+    """Score one chunk in a pool worker and write it as ``part-<index>.csv``; returns ``(index, rows, seconds)``."""
+    started = time.perf_counter()
+    model_path: Path = _WORKER["model_path"]
+    model_payload = _WORKER["model_payload"]
+    class_labels = model_payload["class_labels"]
+
+    features = student_features(students)
+    probabilities = _classify(model_payload, _encode_frame(model_payload, features), _WORKER["engine"])
+    predicted = probabilities.argmax(axis=1)
+
+    metadata = _model_metadata(model_path, model_payload, compact=True)
+    rows = pd.DataFrame(
+        {
+            "student_id": students["id"].to_numpy(),
+            "college_admin_id": students["college_admin_id"].to_numpy() if "college_admin_id" in students else None,
+            "prediction_result": np.asarray(class_labels, dtype=object)[predicted],
+            "confidence_score": probabilities[np.arange(len(predicted)), predicted].round(4),
+            "feature_importance": json.dumps(model_payload["top_importances"]),
+            "model_metadata": [
+                json.dumps({**metadata, "probabilities": dict(zip(class_labels, row))})
+                for row in probabilities.tolist()
+            ],
+            "model_version": model_path.name.removesuffix(".joblib"),
+            "input_data": [json.dumps(record) for record in features.to_dict("records")],
+            "predicted_at": predicted_at,
+            "created_at": predicted_at,
+            "updated_at": predicted_at,
+        },
+        columns=PREDICTION_COLUMNS,
+    )
+
+    path = Path(output_dir) / f"part-{index:05d}.csv"
+    fd, tmp_name = tempfile.mkstemp(dir=output_dir, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as fp:
+            rows.to_csv(fp, index=False)
+        default_permissions(tmp_name)
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+    return index, len(rows), time.perf_counter() - started
+
+
+def rescore_students(
+    source: Path | str,
+    output_dir: Path | str,
+    model_path: Path | str = DEFAULT_MODEL_PATH,
+    engine: Optional[str] = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    max_workers: Optional[int] = None,
+    restart: bool = False,
+) -> Dict[str, Any]:
+    """Score every student in ``source`` and write ``predictions`` rows to ``output_dir``.
+
+    ``source`` is a CSV export of the ``students`` table or a SQLite
+    database with a ``students`` table (``.db``/``.sqlite``/``.sqlite3``).
+    Students are mapped to features as ``StudentFeatureTransformer`` does,
+    read ``chunk_rows`` at a time and scored across ``max_workers``
+    processes, each of which loads the model once. Every chunk becomes a
+    ``part-NNNNN.csv`` with the ``predictions`` columns (JSON columns
+    encoded, timestamps in UTC), ready for ``LOAD DATA``/``COPY``.
+
+    Parts are renamed into place when complete, so an interrupted job is
+    resumed by running it again with the same arguments: chunks whose part
+    exists are skipped. ``rescore.json`` records the job and its
+    throughput.
+    """
+    source = Path(source)
+    output_dir = Path(output_dir)
+    model_path = Path(model_path)
+    if chunk_rows < 1:
+        raise ValueError("chunk_rows must be at least 1")
+    is_sqlite = source.suffix in (".db", ".sqlite", ".sqlite3")
+    reader = _read_sqlite if is_sqlite else _read_csv
+
+    job = {
+        "source": _source_signature(source),
+        "model": model_path.name,
+        "model_hash": content_hash(model_path),
+        "chunk_rows": chunk_rows,
+        "predicted_at": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    done = _prepare_output(output_dir, job, restart)
+    if done:
+        logger.info("Resuming: %s chunks already written to %s", len(done), output_dir)
+
+    workers = max_workers or os.cpu_count() or 1
+    started = time.perf_counter()
+    counts = {"rows": 0, "chunks": 0, "skipped_chunks": 0}
+    pending: Set[Future] = set()
+
+    def collect(block: bool) -> None:
+        nonlocal pending
+        finished, pending = wait(pending, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+        for future in finished:
+            index, rows, seconds = future.result()
+            counts["rows"] += rows
+            counts["chunks"] += 1
+            elapsed = time.perf_counter() - started
+            logger.info(
+                "Chunk %s: %s rows in %.2fs; %s rows so far, %.0f rows/s",
+                index,
+                rows,
+                seconds,
+                counts["rows"],
+                counts["rows"] / elapsed,
+            )
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(str(model_path), engine)
+    ) as pool:
+        for index, students in enumerate(reader(source, chunk_rows)):
+            if index in done:
+                counts["skipped_chunks"] += 1
+                continue
+            # At most two chunks per worker are held in memory at once.
+            while len(pending) >= workers * 2:
+                collect(block=True)
+            pending.add(pool.submit(score_chunk, index, students, str(output_dir), job["predicted_at"]))
+        while pending:
+            collect(block=True)
+
+    elapsed = time.perf_counter() - started
+    summary = {
+        **counts,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(counts["rows"] / elapsed, 1) if elapsed else 0.0,
+        "workers": workers,
+    }
+    job["last_run"] = summary
+    with (output_dir / JOB_FILE).open("w", encoding="utf-8") as fp:
+        json.dump(job, fp, indent=2)
+    logger.info(
+        "Rescored %s students in %s chunks (%s skipped) in %.1fs: %.0f rows/s",
+        counts["rows"],
+        counts["chunks"],
+        counts["skipped_chunks"],
+        elapsed,
+        summary["rows_per_sec"],
+    )
+    return summary
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from predict import INFERENCE_ENGINES
+
+    parser = argparse.ArgumentParser(description="Rescore every student offline into predictions table rows")
+    parser.add_argument("source", type=Path, help="students CSV export, or SQLite database with a students table")
+    parser.add_argument("output_dir", type=Path, help="Directory for part-NNNNN.csv files and rescore.json")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH, help="Model file to score with")
+    parser.add_argument("--engine", choices=INFERENCE_ENGINES, default=None)
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="Students per chunk and part file")
+    parser.add_argument("--workers", type=int, default=None, help="Scoring processes (default: CPU count)")
+    parser.add_argument("--restart", action="store_true", help="Discard written parts instead of resuming")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    print(
+        json.dumps(
+            rescore_students(
+                args.source,
+                args.output_dir,
+                model_path=args.model,
+                engine=args.engine,
+                chunk_rows=args.chunk_rows,
+                max_workers=args.workers,
+                restart=args.restart,
+            ),
+            indent=2,
+        )
+    )
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 10000
+
+
+def feature_digest(normalized: Dict[str, Any]) -> str:
+    """Stable digest of an ``ensure_feature_order`` result."""
+    encoded = json.dumps(normalized, separators=(",", ":"), default=str).encode("utf-8")
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+@dataclass
+class _CachedResult:
+    result: Dict[str, Any]
+    stored_at: float
+
+
+@dataclass
+class PredictionCacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    invalidations: int = 0
+
+
+class PredictionCache:
+    """Bounded LRU cache of prediction results.
+
+    Entries are keyed by ``(model, fingerprint, variant, feature digest)``,
+    where the variant holds the request options that shape the result
+    (engine, compact metadata, explanations). The fingerprint is the model's
+    content hash, so a retrained model never serves a stale result. When a
+    model is seen with a new fingerprint, the entries of its previous version
+    are dropped at once rather than left to age out. ``ttl_seconds`` bounds
+    how long a result may be served; ``max_entries=0`` disables the cache.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl_seconds: Optional[float] = None) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[Hashable, ...], _CachedResult]" = OrderedDict()
+        self._fingerprints: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._stats = PredictionCacheStats()
+
+    @classmethod
+    def from_env(cls) -> "PredictionCache":
+        ttl = os.environ.get("PREDICTION_CACHE_TTL_SECONDS")
+        return cls(
+            max_entries=int(os.environ.get("PREDICTION_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+            ttl_seconds=float(ttl) if ttl else None,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get(self, model: str, fingerprint: str, variant: Hashable, digest: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+
+        key = (model, fingerprint, variant, digest)
+        with self._lock:
+            self._observe_fingerprint(model, fingerprint)
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry):
+                del self._entries[key]
+                self._stats.expirations += 1
+                entry = None
+            if entry is None:
+                self._stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats.hits += 1
+            return entry.result
+
+    def put(
+        self,
+        model: str,
+        fingerprint: str,
+        variant: Hashable,
+        digest: str,
+        result: Dict[str, Any],
+    ) -> None:
+        if not self.enabled:
+            return
+
+        key = (model, fingerprint, variant, digest)
+        with self._lock:
+            if self._fingerprints.setdefault(model, fingerprint) != fingerprint:
+                # The model changed while this result was being computed.
+                return
+            self._entries[key] = _CachedResult(result, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._fingerprints.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "hits": self._stats.hits,
+                "misses": self._stats.misses,
+                "evictions": self._stats.evictions,
+                "expirations": self._stats.expirations,
+                "invalidations": self._stats.invalidations,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+    def _expired(self, entry: _CachedResult) -> bool:
+        return self.ttl_seconds is not None and time.monotonic() - entry.stored_at > self.ttl_seconds
+
+    def _observe_fingerprint(self, model: str, fingerprint: str) -> None:
+        previous = self._fingerprints.get(model)
+        if previous == fingerprint:
+            return
+        self._fingerprints[model] = fingerprint
+        if previous is None:
+            return
+        stale = [key for key in self._entries if key[0] == model and key[1] != fingerprint]
+        for key in stale:
+            del self._entries[key]
+        self._stats.invalidations += len(stale)
+        logger.info("Model %s changed; dropped %s cached predictions", model, len(stale))
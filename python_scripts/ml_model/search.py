@@ -0,0 +1,306 @@
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.metrics import f1_score
+from sklearn.model_selection import ParameterGrid, StratifiedKFold, train_test_split
+
+from manifest import write_manifest
+from stage_cache import StageCache
+from artifacts import mmap_artifact_path
+from train_model import (
+    CACHE_DIR,
+    METRICS_PATH,
+    MODELS_DIR,
+    _build_models,
+    _build_pipeline,
+    _build_preprocessor,
+    _configure_logging,
+    _evaluate_model,
+    _export_model,
+    _json_default,
+    _prepare_split,
+    _refresh_compact_model,
+    _source,
+    _train_model,
+    aggregate_feature_importances,
+)
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FOLDS = 5
+DEFAULT_FACTOR = 3
+# Smallest training subsample a candidate is scored on, per class.
+MIN_ROWS_PER_CLASS = 30
+
+DEFAULT_GRIDS: Dict[str, Dict[str, List[Any]]] = {
+    "random_forest": {
+        "n_estimators": [100, 300],
+        "max_depth": [None, 12, 20],
+        "min_samples_split": [2, 10],
+        "max_features": ["sqrt", 0.5],
+    },
+    "decision_tree": {
+        "max_depth": [6, 8, 10, 12, 16, None],
+        "min_samples_split": [2, 10, 25, 50],
+        "criterion": ["gini", "entropy"],
+    },
+}
+
+Fold = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+# Encoded folds, installed once per worker by _init_worker.
+_FOLDS: List[Fold] = []
+
+
+def _encode_folds(X_train: pd.DataFrame, y_train: np.ndarray, n_folds: int) -> List[Fold]:
+    """Fit the preprocessor once per fold and keep the encoded train/validation arrays."""
+    folds: List[Fold] = []
+    splitter = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=42)
+    for train_index, val_index in splitter.split(X_train, y_train):
+        preprocessor = _build_preprocessor()
+        encoded_train = np.asarray(preprocessor.fit_transform(X_train.iloc[train_index]), dtype=np.float32)
+        encoded_val = np.asarray(preprocessor.transform(X_train.iloc[val_index]), dtype=np.float32)
+        folds.append((encoded_train, y_train[train_index], encoded_val, y_train[val_index]))
+    return folds
+
+
+def _init_worker(folds: List[Fold]) -> None:
+    global _FOLDS
+    _FOLDS = folds
+
+
+def _score_candidate(
+    estimator,
+    params: Dict[str, Any],
+    subsamples: List[np.ndarray],
+) -> Tuple[List[float], float]:
+    """Macro-F1 on every fold of a candidate fitted on ``subsamples`` of each training fold."""
+    started = time.perf_counter()
+    scores = []
+    for (X_fold, y_fold, X_val, y_val), rows in zip(_FOLDS, subsamples):
+        model = clone(estimator).set_params(**params)
+        model.fit(X_fold[rows], y_fold[rows])
+        scores.append(float(f1_score(y_val, model.predict(X_val), average="macro", zero_division=0)))
+    return scores, time.perf_counter() - started
+
+
+def _subsamples(folds: List[Fold], n_rows: int | None) -> List[np.ndarray]:
+    """Stratified row indices of each training fold; ``None`` keeps every row."""
+    indices = []
+    for _, y_fold, _, _ in folds:
+        if n_rows is None or n_rows >= len(y_fold):
+            indices.append(np.arange(len(y_fold)))
+        else:
+            rows, _ = train_test_split(
+                np.arange(len(y_fold)), train_size=n_rows, random_state=42, stratify=y_fold
+            )
+            indices.append(np.sort(rows))
+    return indices
+
+
+def _halving_schedule(n_candidates: int, n_rows: int, n_classes: int, factor: int) -> List[int]:
+    """Training rows per round; the last round always uses every row."""
+    n_rounds = 1 + int(math.log(max(n_candidates, 1)) / math.log(factor))
+    min_rows = MIN_ROWS_PER_CLASS * n_classes
+    n_rounds = max(1, min(n_rounds, 1 + int(math.log(max(n_rows / min_rows, 1)) / math.log(factor))))
+    return [min(n_rows, n_rows // factor ** (n_rounds - 1 - round_index)) for round_index in range(n_rounds)]
+
+
+def successive_halving(
+    estimator,
+    grid: Dict[str, List[Any]],
+    folds: List[Fold],
+    factor: int = DEFAULT_FACTOR,
+    pool: ProcessPoolExecutor | None = None,
+) -> Dict[str, Any]:
+    """Score every candidate on a small subsample and keep the best ``1/factor`` each round.
+
+    Rounds grow the training subsample by ``factor`` until the final round
+    fits the survivors on the full training folds. Candidates of a round are
+    scored in ``pool`` when one is given.
+    """
+    candidates = list(ParameterGrid(grid))
+    n_rows = min(len(fold[1]) for fold in folds)
+    n_classes = len(np.unique(folds[0][1]))
+    schedule = _halving_schedule(len(candidates), n_rows, n_classes, factor)
+    rounds = []
+
+    for round_index, round_rows in enumerate(schedule):
+        final_round = round_index == len(schedule) - 1
+        subsamples = _subsamples(folds, None if final_round else round_rows)
+        if pool is not None:
+            futures = [pool.submit(_score_candidate, estimator, params, subsamples) for params in candidates]
+            outcomes = [future.result() for future in futures]
+        else:
+            outcomes = [_score_candidate(estimator, params, subsamples) for params in candidates]
+
+        ranked = sorted(
+            zip(candidates, outcomes),
+            key=lambda item: float(np.mean(item[1][0])),
+            reverse=True,
+        )
+        rounds.append(
+            {
+                "rows": round_rows,
+                "candidates": len(candidates),
+                "best_cv_mean": float(np.mean(ranked[0][1][0])),
+                "fit_seconds": round(sum(outcome[1] for outcome in outcomes), 4),
+            }
+        )
+        logger.info(
+            "Round %s: %s candidates on %s rows, best macro-F1 %.4f",
+            round_index + 1,
+            len(candidates),
+            round_rows,
+            rounds[-1]["best_cv_mean"],
+        )
+
+        if final_round:
+            best_params, (best_scores, _) = ranked[0]
+            break
+        candidates = [params for params, _ in ranked[: max(1, math.ceil(len(ranked) / factor))]]
+
+    return {
+        "params": best_params,
+        "cv_scores": best_scores,
+        "cv_mean": float(np.mean(best_scores)),
+        "cv_std": float(np.std(best_scores)),
+        "rounds": rounds,
+    }
+
+
+def _update_metrics(name: str, metrics: Dict[str, Any]) -> None:
+    all_metrics: Dict[str, Any] = {}
+    if METRICS_PATH.exists():
+        with METRICS_PATH.open("r", encoding="utf-8") as fp:
+            all_metrics = json.load(fp)
+    all_metrics[name] = metrics
+    with METRICS_PATH.open("w", encoding="utf-8") as fp:
+        json.dump(all_metrics, fp, indent=2, default=_json_default)
+    write_manifest(METRICS_PATH.parent, all_metrics)
+
+
+def search_and_export(
+    model_names: List[str] | None = None,
+    grids: Dict[str, Dict[str, List[Any]]] | None = None,
+    n_folds: int = DEFAULT_FOLDS,
+    factor: int = DEFAULT_FACTOR,
+    max_workers: int | None = None,
+    use_cache: bool = True,
+) -> Dict[str, Dict[str, Any]]:
+    """Search hyperparameters for each model and export the winners.
+
+    The preprocessor is fitted once per fold and the encoded folds are cached
+    in ``models/cache``; candidates then only fit the classifier. The winner
+    is refitted on the full training split, evaluated on the held-out split
+    and exported with ``_export_model``, along with the memory-mapped and
+    compact variants the model already had; its CV scores and the search wall
+    time are stored under ``search`` in its metrics.
+    """
+    _configure_logging()
+    grids = grids or DEFAULT_GRIDS
+    cache = StageCache(CACHE_DIR, enabled=use_cache)
+    split_key, (X_train, X_test, y_train, y_test, label_encoder), _ = _prepare_split(cache, {})
+
+    folds_key = cache.key(
+        "folds",
+        {"data": split_key.digest, "folds": n_folds, "code": _source(_build_preprocessor, _encode_folds)},
+    )
+    folds, _ = cache.run(folds_key, lambda: _encode_folds(X_train, y_train, n_folds))
+
+    estimators = _build_models(n_jobs=1)
+    model_names = model_names or [name for name in estimators if name in grids]
+    workers = max_workers or os.cpu_count() or 1
+    results: Dict[str, Dict[str, Any]] = {}
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(folds,)) as pool:
+        for name in model_names:
+            if name not in grids:
+                raise ValueError(f"No search grid defined for model '{name}'")
+
+            started = time.perf_counter()
+            logger.info("Searching %s over %s candidates", name, len(ParameterGrid(grids[name])))
+            search = successive_halving(estimators[name], grids[name], folds, factor=factor, pool=pool)
+
+            estimator = clone(estimators[name]).set_params(**search["params"])
+            pipeline = _train_model(_build_pipeline(estimator), X_train, y_train)
+            search["wall_seconds"] = round(time.perf_counter() - started, 4)
+            logger.info(
+                "Best %s: %s (CV macro-F1 %.4f +/- %.4f) in %.1fs",
+                name,
+                search["params"],
+                search["cv_mean"],
+                search["cv_std"],
+                search["wall_seconds"],
+            )
+
+            metrics = _evaluate_model(pipeline, X_test, y_test, label_encoder)
+            metrics["search"] = search
+            classifier = pipeline.named_steps["classifier"]
+            feature_importances: Dict[str, float] = {}
+            if hasattr(classifier, "feature_importances_"):
+                feature_importances = dict(
+                    aggregate_feature_importances(
+                        pipeline.named_steps["preprocessor"].get_feature_names_out(),
+                        classifier.feature_importances_,
+                    )
+                )
+
+            # Serving variants already on disk are regenerated so none of them keeps the previous model.
+            _export_model(
+                name,
+                pipeline,
+                label_encoder,
+                feature_importances,
+                metrics,
+                parity_frame=X_test,
+                mmap_artifact=mmap_artifact_path(MODELS_DIR / f"{name}.joblib").exists(),
+            )
+            variants = _refresh_compact_model(
+                name, pipeline, label_encoder, feature_importances, metrics, X_train, y_train, X_test, y_test
+            )
+            if variants:
+                metrics["export_variants"] = variants
+            _update_metrics(name, metrics)
+            results[name] = metrics
+
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Search hyperparameters and export the best models")
+    parser.add_argument("--models", nargs="+", default=None, help="Models to search (default: all with a grid)")
+    parser.add_argument("--grid", type=Path, default=None, help="JSON file of {model: {param: [values]}}")
+    parser.add_argument("--folds", type=int, default=DEFAULT_FOLDS)
+    parser.add_argument("--factor", type=int, default=DEFAULT_FACTOR, help="Halving factor per round")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes scoring candidates")
+    parser.add_argument("--no-cache", action="store_true", help="Re-encode folds instead of using models/cache")
+    args = parser.parse_args()
+
+    grids = None
+    if args.grid is not None:
+        with args.grid.open("r", encoding="utf-8") as fp:
+            grids = json.load(fp)
+
+    search_and_export(
+        model_names=args.models,
+        grids=grids,
+        n_folds=args.folds,
+        factor=args.factor,
+        max_workers=args.workers,
+        use_cache=not args.no_cache,
+    )
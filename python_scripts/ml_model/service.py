@@ -1,28 +1,83 @@
 from __future__ import annotations
 
+import asyncio
+import json
 import logging
+import os
+import tempfile
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterator, Optional
 
-from fastapi import FastAPI, HTTPException
+try:  # optional: faster response serialization
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import FileResponse
+from starlette.routing import Match
 # Changed "validator" to "field_validator"
 from pydantic import BaseModel, Field, field_validator
 
-from features import SCHEMA, describe_features
-from predict import DEFAULT_MODEL_PATH, ModelNotFoundError, predict
+from arrow_scoring import (
+    ARROW_STREAM_MEDIA_TYPE,
+    ArrowUnavailableError,
+    require_pyarrow,
+    score_arrow_file,
+)
+from executor import ExecutorSaturatedError, InferenceExecutor
+from features import SCHEMA, SCHEMA_FINGERPRINT, describe_features, ensure_feature_order
+from manifest import ModelIndex
+from microbatch import MicroBatcher
+from metrics import CONTENT_TYPE, REGISTRY, CallbackCounter, Counter, Gauge, Histogram, StageTimer
+from predict import (
+    DEFAULT_MODEL_PATH,
+    INFERENCE_ENGINES,
+    MODEL_REGISTRY,
+    ModelNotFoundError,
+    predict,
+    predict_batch,
+    run_with_timings,
+)
+from profiling import PROFILE_MODES, PROFILER
+from result_cache import PredictionCache, feature_digest
 
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
 
+BATCH_MAX_ITEMS = int(os.environ.get("PREDICT_BATCH_MAX_ITEMS", 50000))
+COMPACT_RESPONSES = os.environ.get("COMPACT_RESPONSES", "0") == "1"
+ARROW_MAX_BYTES = int(os.environ.get("ARROW_MAX_BYTES", 2 * 1024**3))
+# Uploads and results are spooled here rather than held in memory; defaults to the system temp dir.
+ARROW_SPOOL_DIR = os.environ.get("ARROW_SPOOL_DIR") or None
+# Upload chunks are gathered to this size before each write to the spool file.
+_SPOOL_WRITE_BYTES = 1024 * 1024
+
+
 class PredictionRequest(BaseModel):
     data: Dict[str, Any] = Field(..., description="Student feature payload")
     model: Optional[str] = Field(
         default=DEFAULT_MODEL_PATH.name,
         description="Optional model file name within the models directory",
     )
+    engine: Optional[str] = Field(
+        default=None,
+        description="Inference engine override ('sklearn' or 'flat'); defaults to the model's setting",
+    )
+    compact: Optional[bool] = Field(
+        default=None,
+        description="Report the feature schema hash instead of the full schema; defaults to COMPACT_RESPONSES",
+    )
+    explain: bool = Field(
+        default=False,
+        description="Add per-feature contributions to the predicted class probability",
+    )
 
     # Changed decorator from @validator to @field_validator
     @field_validator("model")
@@ -31,6 +86,12 @@ class PredictionRequest(BaseModel):
             raise ValueError("Model name must not contain directory separators")
         return value
 
+    @field_validator("engine")
+    def validate_engine(cls, value: Optional[str]) -> Optional[str]:
+        if value is not None and value not in INFERENCE_ENGINES:
+            raise ValueError(f"Engine must be one of {', '.join(INFERENCE_ENGINES)}")
+        return value
+
 
 class PredictionResponse(BaseModel):
     prediction: str
@@ -38,9 +99,148 @@ class PredictionResponse(BaseModel):
     probabilities: Dict[str, float]
     feature_importance: list[Dict[str, Any]]
     model_metadata: Dict[str, Any]
+    explanation: Optional[Dict[str, Any]] = None
+
+
+class BatchPredictionRequest(BaseModel):
+    data: list[Any] = Field(..., description="Student feature payloads, scored in order")
+    model: Optional[str] = Field(
+        default=DEFAULT_MODEL_PATH.name,
+        description="Optional model file name within the models directory",
+    )
+    strict: bool = Field(
+        default=False,
+        description="Reject items that fail schema validation instead of applying defaults",
+    )
+    engine: Optional[str] = Field(
+        default=None,
+        description="Inference engine override ('sklearn' or 'flat'); defaults to the model's setting",
+    )
+    compact: Optional[bool] = Field(
+        default=None,
+        description="Report the feature schema hash instead of the full schema; defaults to COMPACT_RESPONSES",
+    )
+    explain: bool = Field(
+        default=False,
+        description="Add per-feature contributions to the predicted class probability",
+    )
+
+    @field_validator("model")
+    def validate_model_name(cls, value: str) -> str:
+        if value and "/" in value:
+            raise ValueError("Model name must not contain directory separators")
+        return value
+
+    @field_validator("engine")
+    def validate_engine(cls, value: Optional[str]) -> Optional[str]:
+        if value is not None and value not in INFERENCE_ENGINES:
+            raise ValueError(f"Engine must be one of {', '.join(INFERENCE_ENGINES)}")
+        return value
+
+    @field_validator("data")
+    def validate_batch_size(cls, value: list[Any]) -> list[Any]:
+        if len(value) > BATCH_MAX_ITEMS:
+            raise ValueError(f"Batch must not contain more than {BATCH_MAX_ITEMS} items")
+        return value
+
+
+class BatchPredictionItem(BaseModel):
+    index: int
+    prediction: Optional[str] = None
+    confidence: Optional[float] = None
+    probabilities: Optional[Dict[str, float]] = None
+    explanation: Optional[Dict[str, Any]] = None
+    errors: Optional[list[str]] = None
+
+
+class BatchPredictionResponse(BaseModel):
+    results: list[BatchPredictionItem]
+    feature_importance: list[Dict[str, Any]]
+    model_metadata: Dict[str, Any]
 
 
 MODELS_DIR = Path(DEFAULT_MODEL_PATH).parent
+INFERENCE_EXECUTOR = InferenceExecutor.from_env()
+PREDICTION_CACHE = PredictionCache.from_env()
+MODEL_INDEX = ModelIndex.from_env(MODELS_DIR, MODEL_REGISTRY, default_preload=(DEFAULT_MODEL_PATH.name,))
+# Swap retrained models in from the watcher thread instead of reloading them on the request path.
+HOT_RELOAD = os.environ.get("MODEL_HOT_RELOAD", "1") != "0"
+SERVER_TIMING = os.environ.get("SERVER_TIMING_HEADER", "1") != "0"
+
+HTTP_REQUESTS = REGISTRY.register(
+    Counter("http_requests_total", "HTTP requests by endpoint, method and status", ("endpoint", "method", "status"))
+)
+HTTP_REQUEST_SECONDS = REGISTRY.register(
+    Histogram("http_request_duration_seconds", "HTTP request latency", ("endpoint", "method"))
+)
+HTTP_IN_FLIGHT = REGISTRY.register(
+    Gauge("http_requests_in_flight", "HTTP requests currently being handled", ("endpoint",))
+)
+PREDICTIONS = REGISTRY.register(
+    Counter("predictions_total", "Prediction calls by endpoint, model and status", ("endpoint", "model", "status"))
+)
+PREDICTION_SECONDS = REGISTRY.register(
+    Histogram("prediction_duration_seconds", "Prediction latency including queueing", ("endpoint", "model"))
+)
+PREDICTION_STAGE_SECONDS = REGISTRY.register(
+    Histogram(
+        "prediction_stage_duration_seconds",
+        "Prediction latency per stage (cache, queue, load, normalize, encode, classify, ...)",
+        ("endpoint", "stage", "model"),
+    )
+)
+MICROBATCH_SIZE = REGISTRY.register(
+    Histogram(
+        "microbatch_size",
+        "Single /predict requests scored together per batch",
+        ("model",),
+        buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+    )
+)
+MICROBATCH_WAIT_SECONDS = REGISTRY.register(
+    Histogram("microbatch_wait_seconds", "Time a /predict request waited for its batch to be dispatched", ("model",))
+)
+REGISTRY.register(
+    Gauge(
+        "inference_executor_in_flight",
+        "Inference calls running or queued",
+        function=lambda: {(): INFERENCE_EXECUTOR.in_flight},
+    )
+)
+REGISTRY.register(
+    Gauge(
+        "inference_executor_capacity",
+        "Inference calls admitted before requests are shed",
+        function=lambda: {(): INFERENCE_EXECUTOR.capacity},
+    )
+)
+REGISTRY.register(
+    Gauge(
+        "model_registry_resident_bytes",
+        "On-disk size of the models held by the registry",
+        function=lambda: {(): MODEL_REGISTRY.resident_bytes()},
+    )
+)
+REGISTRY.register(
+    CallbackCounter(
+        "prediction_cache_events_total",
+        "Prediction cache lookups and removals by event",
+        ("event",),
+        function=lambda: {
+            (event,): PREDICTION_CACHE.stats()[event]
+            for event in ("hits", "misses", "evictions", "expirations", "invalidations")
+        },
+    )
+)
+
+
+def _observe_batch(key: tuple, size: int, waits: list[float]) -> None:
+    MICROBATCH_SIZE.observe(size, key[0])
+    for wait in waits:
+        MICROBATCH_WAIT_SECONDS.observe(wait, key[0])
+
+
+MICRO_BATCHER = MicroBatcher.from_env(INFERENCE_EXECUTOR, on_batch=_observe_batch)
 
 app = FastAPI(
     title="Dropout Prediction Service",
@@ -57,45 +257,393 @@ app.add_middleware(
 )
 
 
+def _endpoint_label(scope: Dict[str, Any]) -> str:
+    # Route templates rather than raw paths keep label cardinality bounded.
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+@app.middleware("http")
+async def record_http_metrics(request: Request, call_next):
+    endpoint = _endpoint_label(request.scope)
+    HTTP_IN_FLIGHT.inc(endpoint)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        HTTP_IN_FLIGHT.dec(endpoint)
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint, request.method)
+        HTTP_REQUESTS.inc(endpoint, request.method, str(status))
+
+
+@app.on_event("startup")
+def start_model_index() -> None:
+    # Only this process runs the watcher: process-pool workers would keep serving
+    # their stale resident payloads, so they stay on per-request mtime checks.
+    if not HOT_RELOAD or INFERENCE_EXECUTOR.kind != "thread":
+        return
+    MODEL_REGISTRY.background_reload = True
+    MODEL_INDEX.refresh()
+    MODEL_INDEX.start()
+
+
+@app.on_event("shutdown")
+def shutdown_executor() -> None:
+    MODEL_INDEX.stop()
+    INFERENCE_EXECUTOR.shutdown()
+
+
+def _saturated(exc: ExecutorSaturatedError) -> HTTPException:
+    logger.warning("Shedding request: %s", exc)
+    return HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": "1"})
+
+
+def _record_queue_wait(response: Response, queue_wait: float) -> None:
+    response.headers["X-Queue-Wait-Ms"] = f"{queue_wait * 1000:.3f}"
+    logger.debug("Inference queue wait %.3fms", queue_wait * 1000)
+
+
+@contextmanager
+def _track_prediction(endpoint: str, model: str, timer: StageTimer) -> Iterator[None]:
+    started = time.perf_counter()
+    status = "200"
+    try:
+        yield
+    except HTTPException as exc:
+        status = str(exc.status_code)
+        raise
+    finally:
+        # Unknown model names would otherwise become unbounded label values.
+        model = "unknown" if status == "404" else model
+        PREDICTIONS.inc(endpoint, model, status)
+        PREDICTION_SECONDS.observe(time.perf_counter() - started, endpoint, model)
+        for stage, seconds in timer.durations.items():
+            PREDICTION_STAGE_SECONDS.observe(seconds, endpoint, stage, model)
+
+
+def _dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _json_response(content: Any, response: Response) -> Response:
+    """Serialize an already well-formed result directly, skipping response model validation.
+
+    Headers set on the injected ``response`` (timings, cache status) are carried over.
+    """
+    headers = {name: value for name, value in response.headers.items() if name != "content-length"}
+    return Response(content=_dumps(content), media_type="application/json", headers=headers)
+
+
+def _compact(request: PredictionRequest | BatchPredictionRequest) -> bool:
+    return COMPACT_RESPONSES if request.compact is None else request.compact
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in (candidate.removeprefix("W/") for candidate in candidates)
+
+
+def _record_timings(response: Response, timer: StageTimer, durations: Dict[str, float], queue_wait: float) -> None:
+    timer.durations["queue"] = queue_wait
+    timer.durations.update(durations)
+    _record_queue_wait(response, queue_wait)
+    if SERVER_TIMING:
+        response.headers["Server-Timing"] = timer.server_timing()
+
+
+async def _prediction_cache_key(model_path: Path, request: PredictionRequest) -> Optional[tuple]:
+    if not PREDICTION_CACHE.enabled:
+        return None
+    fingerprint = MODEL_REGISTRY.cached_fingerprint(model_path)
+    if fingerprint is None:
+        # Hashing a model file is too slow for the event loop; it happens once per file version.
+        fingerprint = await asyncio.to_thread(MODEL_REGISTRY.fingerprint, model_path)
+    variant = (request.engine, _compact(request), request.explain)
+    return request.model, fingerprint, variant, feature_digest(ensure_feature_order(request.data))
+
+
 @app.get("/health", tags=["system"])
 async def health_check() -> Dict[str, str]:
     return {"status": "ok"}
 
 
+# The schema only changes with a deploy, so its body and ETag are built once.
+SCHEMA_BODY = _dumps({"features": describe_features(), "target": SCHEMA.get("target", {})})
+SCHEMA_ETAG = f'"{SCHEMA_FINGERPRINT}"'
+
+
 @app.get("/schema", tags=["system"])
-async def feature_schema() -> Dict[str, Any]:
-    return {"features": describe_features(), "target": SCHEMA.get("target", {})}
+async def feature_schema(request: Request) -> Response:
+    headers = {"ETag": SCHEMA_ETAG, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), SCHEMA_ETAG):
+        return Response(status_code=304, headers=headers)
+    return Response(content=SCHEMA_BODY, media_type="application/json", headers=headers)
+
+
+def _profile_mode(profile: Optional[str], token: Optional[str]) -> Optional[str]:
+    """Profiler mode forced by the admin ``profile`` query flag, or ``None``."""
+    if profile is None:
+        return None
+    if not PROFILER.authorized(token):
+        raise HTTPException(status_code=403, detail="Profiling requires a valid X-Profile-Token")
+    if profile in ("1", "true"):
+        return PROFILER.mode
+    if profile not in PROFILE_MODES:
+        raise HTTPException(status_code=400, detail=f"profile must be one of 1, {', '.join(PROFILE_MODES)}")
+    return profile
 
 
 @app.post("/predict", response_model=PredictionResponse, tags=["prediction"])
-async def make_prediction(request: PredictionRequest) -> PredictionResponse:
+async def make_prediction(
+    request: PredictionRequest,
+    response: Response,
+    profile: Optional[str] = Query(default=None, include_in_schema=False),
+    profile_token: Optional[str] = Header(default=None, alias="X-Profile-Token", include_in_schema=False),
+) -> Response:
+    model_path = MODELS_DIR / request.model
+    timer = StageTimer()
+    profile_mode = _profile_mode(profile, profile_token)
+    with _track_prediction("/predict", request.model, timer):
+        try:
+            with timer.stage("cache"):
+                cache_key = await _prediction_cache_key(model_path, request)
+                cached = PREDICTION_CACHE.get(*cache_key) if cache_key is not None and profile_mode is None else None
+            if cached is not None:
+                response.headers["X-Prediction-Cache"] = "hit"
+                if SERVER_TIMING:
+                    response.headers["Server-Timing"] = timer.server_timing()
+                return _json_response(cached, response)
+
+            options = {
+                "model_path": model_path,
+                "engine": request.engine,
+                "compact": _compact(request),
+                "explain": request.explain,
+            }
+            if profile_mode is None and PROFILER.should_profile():
+                profile_mode = PROFILER.mode
+            if profile_mode is not None:
+                # Profiled calls skip the micro-batcher so the profile covers this request alone.
+                ((result, durations), profile_name), queue_wait = await INFERENCE_EXECUTOR.run(
+                    PROFILER.call,
+                    f"predict-{model_path.stem}",
+                    profile_mode,
+                    run_with_timings,
+                    predict,
+                    request.data,
+                    **options,
+                )
+                if profile_name is not None:
+                    response.headers["X-Profile"] = profile_name
+            elif MICRO_BATCHER.enabled:
+                key = (request.model, request.engine, options["compact"], request.explain)
+                result, durations, queue_wait, batch_wait, batch_size = await MICRO_BATCHER.submit(
+                    key, request.data, **options
+                )
+                timer.durations["batch"] = batch_wait
+                response.headers["X-Batch-Size"] = str(batch_size)
+            else:
+                (result, durations), queue_wait = await INFERENCE_EXECUTOR.run(
+                    run_with_timings, predict, request.data, **options
+                )
+        except ExecutorSaturatedError as exc:
+            raise _saturated(exc)
+        except ModelNotFoundError as exc:
+            logger.error("Model not found: %s", exc)
+            raise HTTPException(status_code=404, detail=str(exc))
+        except ValueError as exc:
+            logger.exception("Invalid prediction payload")
+            raise HTTPException(status_code=400, detail=str(exc))
+        except Exception as exc:  # pragma: no cover
+            logger.exception("Unexpected prediction error")
+            raise HTTPException(status_code=500, detail="Prediction failed") from exc
+
+        if cache_key is not None:
+            PREDICTION_CACHE.put(*cache_key, result)
+            response.headers["X-Prediction-Cache"] = "miss"
+        _record_timings(response, timer, durations, queue_wait)
+        return _json_response(result, response)
+
+
+@app.post(
+    "/predict/batch",
+    response_model=BatchPredictionResponse,
+    response_model_exclude_none=True,
+    tags=["prediction"],
+)
+async def make_batch_prediction(
+    request: BatchPredictionRequest, response: Response
+) -> Response:
     model_path = MODELS_DIR / request.model
+    timer = StageTimer()
+    with _track_prediction("/predict/batch", request.model, timer):
+        try:
+            (result, durations), queue_wait = await INFERENCE_EXECUTOR.run(
+                run_with_timings,
+                predict_batch,
+                request.data,
+                model_path=model_path,
+                strict=request.strict,
+                engine=request.engine,
+                compact=_compact(request),
+                explain=request.explain,
+            )
+        except ExecutorSaturatedError as exc:
+            raise _saturated(exc)
+        except ModelNotFoundError as exc:
+            logger.error("Model not found: %s", exc)
+            raise HTTPException(status_code=404, detail=str(exc))
+        except ValueError as exc:
+            logger.exception("Invalid batch prediction payload")
+            raise HTTPException(status_code=400, detail=str(exc))
+        except Exception as exc:  # pragma: no cover
+            logger.exception("Unexpected batch prediction error")
+            raise HTTPException(status_code=500, detail="Batch prediction failed") from exc
+
+        _record_timings(response, timer, durations, queue_wait)
+        return _json_response(result, response)
+
+
+async def _spool_body(request: Request, path: str) -> int:
+    # File writes run in the threadpool so a slow disk never stalls the event loop.
+    size = 0
+    pending = bytearray()
+    fp = await run_in_threadpool(open, path, "wb")
     try:
-        result = predict(request.data, model_path=model_path)
-    except ModelNotFoundError as exc:
-        logger.error("Model not found: %s", exc)
-        raise HTTPException(status_code=404, detail=str(exc))
-    except ValueError as exc:
-        logger.exception("Invalid prediction payload")
-        raise HTTPException(status_code=400, detail=str(exc))
-    except Exception as exc:  # pragma: no cover
-        logger.exception("Unexpected prediction error")
-        raise HTTPException(status_code=500, detail="Prediction failed") from exc
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > ARROW_MAX_BYTES:
+                raise HTTPException(status_code=413, detail=f"Arrow body exceeds {ARROW_MAX_BYTES} bytes")
+            pending += chunk
+            if len(pending) >= _SPOOL_WRITE_BYTES:
+                await run_in_threadpool(fp.write, pending)
+                pending.clear()
+        if pending:
+            await run_in_threadpool(fp.write, pending)
+    finally:
+        await run_in_threadpool(fp.close)
+    return size
 
-    return PredictionResponse(**result)
+
+def _unlink(*paths: str) -> None:
+    for path in paths:
+        Path(path).unlink(missing_ok=True)
+
+
+@app.post(
+    "/predict/arrow",
+    tags=["prediction"],
+    response_class=FileResponse,
+    responses={200: {"content": {ARROW_STREAM_MEDIA_TYPE: {}}}},
+)
+async def make_arrow_prediction(
+    request: Request,
+    model: str = DEFAULT_MODEL_PATH.name,
+    engine: Optional[str] = None,
+    id_column: Optional[str] = None,
+) -> Response:
+    """Score an Arrow IPC stream or file body whose columns match ``/schema``.
+
+    The body is spooled to disk and scored record batch by record batch; the
+    response is an Arrow IPC stream of ``prediction``, ``confidence`` and
+    ``probability_<class>`` columns, row-aligned with the input.
+    """
+    if "/" in model:
+        raise HTTPException(status_code=422, detail="Model name must not contain directory separators")
+    if engine is not None and engine not in INFERENCE_ENGINES:
+        raise HTTPException(status_code=422, detail=f"Engine must be one of {', '.join(INFERENCE_ENGINES)}")
+    try:
+        require_pyarrow()
+    except ArrowUnavailableError as exc:
+        raise HTTPException(status_code=501, detail=str(exc))
+
+    timer = StageTimer()
+    input_fd, input_path = tempfile.mkstemp(suffix=".arrow", dir=ARROW_SPOOL_DIR)
+    output_fd, output_path = tempfile.mkstemp(suffix=".arrows", dir=ARROW_SPOOL_DIR)
+    os.close(input_fd)
+    os.close(output_fd)
+    counts = None
+    with _track_prediction("/predict/arrow", model, timer):
+        try:
+            with timer.stage("upload"):
+                await _spool_body(request, input_path)
+            (counts, durations), queue_wait = await INFERENCE_EXECUTOR.run(
+                run_with_timings,
+                score_arrow_file,
+                input_path,
+                output_path,
+                model_path=MODELS_DIR / model,
+                engine=engine,
+                id_column=id_column,
+            )
+        except ExecutorSaturatedError as exc:
+            raise _saturated(exc)
+        except ModelNotFoundError as exc:
+            logger.error("Model not found: %s", exc)
+            raise HTTPException(status_code=404, detail=str(exc))
+        except ValueError as exc:
+            logger.exception("Invalid Arrow prediction payload")
+            raise HTTPException(status_code=400, detail=str(exc))
+        except HTTPException:
+            raise
+        except Exception as exc:  # pragma: no cover
+            logger.exception("Unexpected Arrow prediction error")
+            raise HTTPException(status_code=500, detail="Arrow prediction failed") from exc
+        finally:
+            _unlink(input_path)
+            if counts is None:
+                _unlink(output_path)
+
+        response = FileResponse(
+            output_path,
+            media_type=ARROW_STREAM_MEDIA_TYPE,
+            background=BackgroundTask(_unlink, output_path),
+        )
+        response.headers["X-Rows-Scored"] = str(counts["rows"])
+        _record_timings(response, timer, durations, queue_wait)
+        return response
 
 
 @app.get("/models", tags=["system"])
 async def list_models() -> Dict[str, Any]:
     models = [
         {
-            "name": path.name,
-            "size_bytes": path.stat().st_size,
-            "modified_at": path.stat().st_mtime,
+            "name": entry["name"],
+            "size_bytes": entry["size_bytes"],
+            "modified_at": entry["mtime_ns"] / 1e9,
+            "variant": entry["variant"],
+            "hash": entry["hash"],
+            "exported_at": entry["exported_at"],
+            "metrics": entry["metrics"],
         }
-        for path in MODELS_DIR.glob("*.joblib")
+        for entry in MODEL_INDEX.models()
     ]
-    return {"models": models}
+    return {"models": models, "index": MODEL_INDEX.status()}
+
+
+@app.get("/models/cache", tags=["system"])
+async def model_cache_stats() -> Dict[str, Any]:
+    return MODEL_REGISTRY.stats()
+
+
+@app.get("/predictions/cache", tags=["system"])
+async def prediction_cache_stats() -> Dict[str, Any]:
+    return PREDICTION_CACHE.stats()
+
+
+@app.get("/metrics", tags=["system"])
+async def prometheus_metrics() -> Response:
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+import joblib
+
+from artifacts import default_permissions
+
+logger = logging.getLogger(__name__)
+
+_CHUNK_SIZE = 1024 * 1024
+DEFAULT_MAX_ENTRIES = 2
+_MISSING = object()
+
+
+def file_digest(path: Path | str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fp:
+        for chunk in iter(lambda: fp.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def code_version(paths: Iterable[Path | str]) -> str:
+    """Digest of the given source files, used as the code version of a stage."""
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(Path(path).name.encode("utf-8"))
+        digest.update(file_digest(path).encode("ascii"))
+    return digest.hexdigest()
+
+
+def _digest_value(value: Any) -> str:
+    if isinstance(value, Path):
+        return file_digest(value)
+    if isinstance(value, bytes):
+        return hashlib.sha256(value).hexdigest()
+    if not isinstance(value, str):
+        value = json.dumps(value, sort_keys=True, default=repr)
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+@dataclass(frozen=True)
+class StageKey:
+    label: str
+    digest: str
+    inputs: Dict[str, str]
+
+
+class StageCache:
+    """Content-addressed store for the outputs of training stages.
+
+    A stage is identified by a label (``"fit:random_forest"``) and keyed by
+    the digests of its named inputs: file contents, schema, hyperparameters,
+    code version or the key of an upstream stage. Outputs are stored as
+    uncompressed joblib files under ``root`` named after the key, so a stage
+    whose inputs are unchanged is loaded instead of recomputed. ``index.json``
+    remembers the input digests last seen per label, which lets a miss be
+    logged with the inputs that changed.
+
+    Only the ``max_entries`` most recently stored or loaded outputs of each
+    label are kept (``STAGE_CACHE_MAX_ENTRIES``, 0 keeps everything), so the
+    cache holds the current run and the one before it rather than every run
+    ever made. :meth:`clear` deletes the whole cache.
+    """
+
+    def __init__(self, root: Path | str, enabled: bool = True, max_entries: int | None = None) -> None:
+        self.root = Path(root)
+        self.enabled = enabled
+        if max_entries is None:
+            max_entries = int(os.environ.get("STAGE_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+        self.max_entries = max_entries
+
+    def key(self, label: str, inputs: Dict[str, Any]) -> StageKey:
+        digests = {name: _digest_value(value) for name, value in sorted(inputs.items())}
+        combined = hashlib.sha256(label.encode("utf-8"))
+        for name, digest in digests.items():
+            combined.update(f"{name}={digest};".encode("ascii"))
+        return StageKey(label, combined.hexdigest(), digests)
+
+    def _path(self, key: StageKey) -> Path:
+        # One directory per label (``fit/random_forest``), which is the unit of retention.
+        return self.root.joinpath(*key.label.split(":", 1)) / f"{key.digest}.joblib"
+
+    def load(self, key: StageKey) -> Any:
+        """Cached output for ``key`` or ``_MISSING``."""
+        if not self.enabled:
+            return _MISSING
+        path = self._path(key)
+        if not path.exists():
+            return _MISSING
+        try:
+            value = joblib.load(path)
+        except Exception as exc:  # a truncated or stale entry is recomputed
+            logger.warning("Discarding unreadable cache entry %s: %s", path, exc)
+            return _MISSING
+        # Retention keeps the most recently used entries, so a hit counts as a use.
+        os.utime(path)
+        return value
+
+    def store(self, key: StageKey, value: Any) -> None:
+        if not self.enabled:
+            return
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        os.close(fd)
+        try:
+            joblib.dump(value, tmp_name, compress=0)
+            default_permissions(tmp_name)
+            os.replace(tmp_name, path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+        self._remember(key)
+        self._prune(path.parent)
+
+    def _prune(self, directory: Path) -> None:
+        if self.max_entries <= 0:
+            return
+        entries = sorted(directory.glob("*.joblib"), key=lambda entry: entry.stat().st_mtime_ns, reverse=True)
+        for entry in entries[self.max_entries :]:
+            entry.unlink(missing_ok=True)
+            logger.info("Pruned stage cache entry %s", entry.relative_to(self.root))
+
+    def clear(self) -> None:
+        """Delete every cached output and the index."""
+        shutil.rmtree(self.root, ignore_errors=True)
+        logger.info("Cleared stage cache %s", self.root)
+
+    def run(
+        self,
+        key: StageKey,
+        compute: Callable[[], Any],
+        validate: Callable[[Any], bool] | None = None,
+    ) -> Tuple[Any, bool]:
+        """Return ``(output, cached)``, computing and storing the output on a miss.
+
+        ``validate`` may reject a cached output whose side effects (such as
+        exported files) no longer exist.
+        """
+        cached = self.load(key)
+        if cached is not _MISSING and (validate is None or validate(cached)):
+            logger.info("Skipping %s: inputs unchanged (key %s)", key.label, key.digest[:12])
+            return cached, True
+
+        logger.info("Running %s: %s", key.label, self._miss_reason(key, cached))
+        value = compute()
+        self.store(key, value)
+        return value, False
+
+    def _miss_reason(self, key: StageKey, cached: Any) -> str:
+        if not self.enabled:
+            return "stage cache disabled"
+        if cached is not _MISSING:
+            return "cached outputs are no longer valid"
+        previous = self._index().get(key.label)
+        if previous is None:
+            return "no cached output"
+        changed: List[str] = sorted(
+            name for name in set(previous) | set(key.inputs) if previous.get(name) != key.inputs.get(name)
+        )
+        if not changed:
+            return "cached output was removed"
+        return f"{', '.join(changed)} changed"
+
+    def _index(self) -> Dict[str, Dict[str, str]]:
+        path = self.root / "index.json"
+        try:
+            with path.open("r", encoding="utf-8") as fp:
+                return json.load(fp)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _remember(self, key: StageKey) -> None:
+        # Last writer wins; the index only drives log messages, not cache hits.
+        index = self._index()
+        index[key.label] = key.inputs
+        fd, tmp_name = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as fp:
+            json.dump(index, fp, indent=2, sort_keys=True)
+        default_permissions(tmp_name)
+        os.replace(tmp_name, self.root / "index.json")
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+import pyarrow as pa
+from fastapi.testclient import TestClient
+
+import service
+from predict import MODEL_REGISTRY
+from tests.toy_model import toy_records, train_toy_model
+
+
+def _arrow_stream(rows: int) -> bytes:
+    table = pa.Table.from_pandas(pd.DataFrame(toy_records(rows)), preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table, max_chunksize=64)
+    return sink.getvalue().to_pybytes()
+
+
+def _chunks(body: bytes, size: int = 4096):
+    for start in range(0, len(body), size):
+        yield body[start : start + size]
+
+
+class ArrowEndpointTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls._tmp = tempfile.TemporaryDirectory()
+        cls.model_path = train_toy_model(Path(cls._tmp.name) / "toy.joblib")
+        cls._models_dir = mock.patch.object(service, "MODELS_DIR", Path(cls._tmp.name))
+        cls._models_dir.start()
+        cls.client = TestClient(service.app)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls._models_dir.stop()
+        MODEL_REGISTRY.evict(cls.model_path)
+        cls._tmp.cleanup()
+
+    def post(self, body: bytes):
+        return self.client.post(
+            "/predict/arrow",
+            params={"model": self.model_path.name},
+            content=_chunks(body),
+            headers={"Content-Type": service.ARROW_STREAM_MEDIA_TYPE},
+        )
+
+    def test_streamed_upload_is_scored_row_aligned(self) -> None:
+        with mock.patch.object(service, "_SPOOL_WRITE_BYTES", 10000):
+            response = self.post(_arrow_stream(500))
+
+        self.assertEqual(response.status_code, 200, response.text)
+        self.assertEqual(response.headers["X-Rows-Scored"], "500")
+        self.assertEqual(pa.ipc.open_stream(response.content).read_all().num_rows, 500)
+
+    def test_oversized_upload_is_413(self) -> None:
+        body = _arrow_stream(500)
+        with mock.patch.object(service, "ARROW_MAX_BYTES", len(body) // 2):
+            response = self.post(body)
+
+        self.assertEqual(response.status_code, 413)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+import stat
+import tempfile
+import unittest
+from pathlib import Path
+
+from artifacts import dump_atomic
+from manifest import write_manifest
+
+
+class AtomicWritePermissionsTest(unittest.TestCase):
+    def test_exports_follow_the_umask(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            plain_path = Path(tmp) / "plain.json"
+            plain_path.write_text("{}", encoding="utf-8")
+            model_path = dump_atomic({"version": 1}, Path(tmp) / "toy.joblib")
+            manifest_path = write_manifest(Path(tmp), {})
+            modes = {stat.S_IMODE(path.stat().st_mode) for path in (plain_path, model_path, manifest_path)}
+
+        self.assertEqual(len(modes), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+import service
+from predict import MODEL_REGISTRY, predict
+from tests.toy_model import toy_records, train_toy_model
+
+
+class BatchEndpointTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls._tmp = tempfile.TemporaryDirectory()
+        cls.model_path = train_toy_model(Path(cls._tmp.name) / "toy.joblib")
+        cls._models_dir = mock.patch.object(service, "MODELS_DIR", Path(cls._tmp.name))
+        cls._models_dir.start()
+        cls.client = TestClient(service.app)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls._models_dir.stop()
+        MODEL_REGISTRY.evict(cls.model_path)
+        cls._tmp.cleanup()
+
+    def post(self, items: list, **options) -> dict:
+        response = self.client.post("/predict/batch", json={"data": items, "model": self.model_path.name, **options})
+        self.assertEqual(response.status_code, 200, response.text)
+        return response.json()
+
+    def test_items_match_single_predictions_in_order(self) -> None:
+        records = toy_records(5, seed=3)
+
+        body = self.post(records)
+
+        self.assertEqual([item["index"] for item in body["results"]], list(range(5)))
+        for record, item in zip(records, body["results"]):
+            expected = predict(record, model_path=self.model_path)
+            self.assertEqual(item["prediction"], expected["prediction"])
+            for label, probability in expected["probabilities"].items():
+                self.assertAlmostEqual(item["probabilities"][label], probability)
+
+    def test_invalid_item_fails_alone(self) -> None:
+        valid, out_of_range = toy_records(2)
+        out_of_range["attendance_rate"] = 140
+
+        results = self.post([valid, "not an object", out_of_range], strict=True)["results"]
+
+        self.assertIn("prediction", results[0])
+        self.assertEqual(results[1]["errors"], ["Item must be an object of feature values"])
+        self.assertEqual(results[2]["errors"], ["Feature 'attendance_rate' must be <= 100"])
+
+    def test_unknown_model_is_404(self) -> None:
+        response = self.client.post("/predict/batch", json={"data": toy_records(1), "model": "missing.joblib"})
+        self.assertEqual(response.status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
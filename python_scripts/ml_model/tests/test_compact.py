@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import unittest
+
+import numpy as np
+from sklearn.tree import DecisionTreeClassifier
+
+from train_model import _compact_candidates
+
+
+class CompactCandidatesTest(unittest.TestCase):
+    def test_pruned_trees_are_smaller(self) -> None:
+        rng = np.random.default_rng(0)
+        X = rng.normal(size=(300, 4)).astype(np.float32)
+        y = (X[:, 0] + rng.normal(scale=0.5, size=300) > 0).astype(int)
+        tree = DecisionTreeClassifier(random_state=0).fit(X, y)
+
+        candidates = list(_compact_candidates(tree, X, y))
+
+        self.assertTrue(candidates)
+        for params, forest in candidates:
+            self.assertGreater(params["ccp_alpha"], 0)
+            self.assertLess(forest.n_nodes, tree.tree_.node_count)
+
+    def test_single_leaf_tree_has_no_candidates(self) -> None:
+        X = np.zeros((10, 2), dtype=np.float32)
+        y = np.array([0, 1] * 5)
+        tree = DecisionTreeClassifier(random_state=0).fit(X, y)
+
+        self.assertEqual(list(_compact_candidates(tree, X, y)), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+import service
+from executor import ExecutorSaturatedError, InferenceExecutor
+
+
+class ExecutorAdmissionTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.executor = InferenceExecutor(kind="thread", max_workers=1, max_queue=1)
+        self.release = threading.Event()
+        self._blockers: list[threading.Thread] = []
+
+    def tearDown(self) -> None:
+        self.release.set()
+        for blocker in self._blockers:
+            blocker.join(timeout=5)
+        self.executor.shutdown()
+
+    def fill(self) -> None:
+        """Occupy every slot with a call that blocks until ``release`` is set."""
+        for _ in range(self.executor.capacity):
+            blocker = threading.Thread(target=asyncio.run, args=(self.executor.run(self.release.wait),))
+            blocker.start()
+            self._blockers.append(blocker)
+        deadline = time.monotonic() + 5
+        while self.executor.in_flight < self.executor.capacity and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.executor.in_flight, self.executor.capacity)
+
+    def test_rejects_work_when_the_queue_is_full(self) -> None:
+        self.fill()
+
+        with self.assertRaises(ExecutorSaturatedError):
+            asyncio.run(self.executor.run(time.sleep, 0))
+
+        self.release.set()
+        for blocker in self._blockers:
+            blocker.join(timeout=5)
+        result, _ = asyncio.run(self.executor.run(sum, [1, 2]))
+        self.assertEqual(result, 3)
+
+    def test_service_answers_503_when_saturated(self) -> None:
+        self.fill()
+
+        with mock.patch.object(service, "INFERENCE_EXECUTOR", self.executor):
+            response = TestClient(service.app).post("/predict/batch", json={"data": [{}]})
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["Retry-After"], "1")
+
+
+if __name__ == "__main__":
+    unittest.main()
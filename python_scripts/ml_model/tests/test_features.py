@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import math
+import unittest
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from features import ensure_feature_order, normalize_frame
+
+
+def _row_path(frame: pd.DataFrame, rows: list) -> pd.DataFrame:
+    return pd.DataFrame([ensure_feature_order(row) for row in rows], index=frame.index)
+
+
+class NormalizeFrameParityTest(unittest.TestCase):
+    def assert_parity(self, rows: list) -> None:
+        frame = pd.DataFrame(rows)
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", RuntimeWarning)
+            actual = normalize_frame(frame)
+        pd.testing.assert_frame_equal(actual, _row_path(frame, rows), check_dtype=False)
+
+    def test_nan_takes_the_default(self) -> None:
+        self.assert_parity([{"gpa": math.nan, "family_income": math.nan}, {"gpa": 3.2, "family_income": 100.0}])
+
+    def test_infinite_numbers_clip_to_the_bounds(self) -> None:
+        rows = [
+            {"gpa": math.inf, "family_income": math.inf},
+            {"gpa": -math.inf, "family_income": -math.inf},
+            {"gpa": 3.2, "family_income": 100.0},
+        ]
+        self.assert_parity(rows)
+        actual = normalize_frame(pd.DataFrame(rows))
+        self.assertEqual(actual["gpa"].tolist(), [4.0, 0.0, 3.2])
+        self.assertEqual(actual["family_income"].tolist(), [math.inf, 0.0, 100.0])
+
+    def test_numeric_course_with_missing_cells(self) -> None:
+        rows = [{"course_of_study": 7}, {"course_of_study": None}, {"course_of_study": 9254}]
+        frame = pd.DataFrame(rows)
+        self.assertEqual(frame["course_of_study"].dtype, np.float64)
+        self.assertEqual(normalize_frame(frame)["course_of_study"].tolist(), ["7", "course_unknown", "9254"])
+        self.assert_parity(rows)
+
+    def test_integral_float_course(self) -> None:
+        rows = [{"course_of_study": 7.0}, {"course_of_study": 9254.0}, {"course_of_study": 7.5}]
+        self.assertEqual(ensure_feature_order(rows[0])["course_of_study"], "7")
+        self.assertEqual(normalize_frame(pd.DataFrame(rows))["course_of_study"].tolist(), ["7", "9254", "7.5"])
+        self.assert_parity(rows)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import unittest
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.tree import DecisionTreeClassifier
+
+from forest import FlatForest, FlatForestError
+
+
+def _dataset(rows: int = 400, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(rows, 6)).astype(np.float32)
+    y = (X[:, 0] + X[:, 1] * X[:, 2] > 0).astype(int) + (X[:, 3] > 1).astype(int)
+    return X, y
+
+
+class FlatForestParityTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.X, self.y = _dataset()
+        self.X_new, _ = _dataset(rows=300, seed=1)
+
+    def test_forest_probabilities_match_sklearn(self) -> None:
+        estimator = RandomForestClassifier(n_estimators=12, max_depth=8, random_state=0).fit(self.X, self.y)
+        forest = FlatForest.from_estimator(estimator)
+
+        np.testing.assert_allclose(forest.predict_proba(self.X_new), estimator.predict_proba(self.X_new), atol=1e-12)
+        np.testing.assert_allclose(
+            forest.predict_proba(self.X_new, chunk_size=7), estimator.predict_proba(self.X_new), atol=1e-12
+        )
+
+    def test_float32_copy_matches_sklearn(self) -> None:
+        estimator = RandomForestClassifier(n_estimators=12, random_state=0).fit(self.X, self.y)
+        forest = FlatForest.from_estimator(estimator).to_float32()
+
+        np.testing.assert_allclose(forest.predict_proba(self.X_new), estimator.predict_proba(self.X_new), atol=1e-6)
+
+    def test_single_tree_matches_sklearn(self) -> None:
+        estimator = DecisionTreeClassifier(max_depth=5, random_state=0).fit(self.X, self.y)
+        forest = FlatForest.from_estimator(estimator)
+
+        np.testing.assert_allclose(forest.predict_proba(self.X_new), estimator.predict_proba(self.X_new), atol=1e-12)
+
+    def test_rejects_other_estimators(self) -> None:
+        with self.assertRaises(FlatForestError):
+            FlatForest.from_estimator(object())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import joblib
+
+import service
+from executor import InferenceExecutor
+from manifest import ModelIndex, write_manifest
+from predict import MODEL_REGISTRY
+from registry import ModelRegistry, content_hash
+
+
+def _resident_version(model_path: str) -> int:
+    return MODEL_REGISTRY.get(model_path)["version"]
+
+
+def _export(path: Path, version: int) -> None:
+    joblib.dump({"version": version, "padding": "x" * version}, path)
+    # Coarse filesystem clocks could otherwise give two exports the same mtime.
+    os.utime(path, ns=(version * 10**9, version * 10**9))
+
+
+class ProcessExecutorHotReloadTest(unittest.TestCase):
+    def test_process_workers_pick_up_manifest_swap(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            models_dir = Path(tmp)
+            model_path = models_dir / "toy.joblib"
+            joblib.dump({"version": 1}, model_path)
+            write_manifest(models_dir, {})
+
+            executor = InferenceExecutor(kind="process", max_workers=1)
+            index = ModelIndex(models_dir, MODEL_REGISTRY, preload=(model_path.name,))
+            with mock.patch.object(service, "INFERENCE_EXECUTOR", executor), mock.patch.object(
+                service, "MODEL_INDEX", index
+            ), mock.patch.object(MODEL_REGISTRY, "_loader", joblib.load), mock.patch.object(
+                MODEL_REGISTRY, "background_reload", False
+            ):
+                try:
+                    service.start_model_index()
+                    self.assertFalse(MODEL_REGISTRY.background_reload)
+                    first, _ = asyncio.run(executor.run(_resident_version, str(model_path)))
+
+                    joblib.dump({"version": 2, "retrained": True}, model_path)
+                    write_manifest(models_dir, {})
+                    index.refresh()
+                    second, _ = asyncio.run(executor.run(_resident_version, str(model_path)))
+                finally:
+                    index.stop()
+                    executor.shutdown()
+                    MODEL_REGISTRY.evict(model_path)
+
+        self.assertEqual((first, second), (1, 2))
+
+
+class BackgroundReloadTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.models_dir = Path(self._tmp.name)
+        self.model_path = self.models_dir / "toy.joblib"
+        self.registry = ModelRegistry(background_reload=True)
+        self.index = ModelIndex(self.models_dir, self.registry)
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def version(self) -> int:
+        return self.registry.get(self.model_path)["version"]
+
+    def test_change_outside_the_manifest_reloads_on_lookup(self) -> None:
+        _export(self.model_path, 1)
+        write_manifest(self.models_dir, {})
+        self.index.refresh()
+        self.assertEqual(self.version(), 1)
+
+        _export(self.model_path, 2)
+        self.assertEqual(self.version(), 2)
+
+    def test_change_without_a_manifest_reloads_on_lookup(self) -> None:
+        _export(self.model_path, 1)
+        self.index.refresh()
+        self.assertEqual(self.version(), 1)
+
+        _export(self.model_path, 2)
+        self.assertEqual(self.version(), 2)
+
+    def test_pending_manifest_swap_keeps_serving_the_resident_version(self) -> None:
+        _export(self.model_path, 1)
+        write_manifest(self.models_dir, {})
+        self.index.refresh()
+        self.assertEqual(self.version(), 1)
+
+        _export(self.model_path, 2)
+        self.registry.track_manifest({self.model_path: content_hash(self.model_path)})
+        self.assertEqual(self.version(), 1)
+
+        self.registry.swap(self.model_path)
+        self.assertEqual(self.version(), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
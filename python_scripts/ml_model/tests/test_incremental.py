@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+from preprocess import DEFAULT_INPUT_PATH, RAW_DTYPES
+from train_model import _load_labeled_rows
+
+
+class LabeledRowsTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self._tmp.name) / "new.csv"
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def load(self, targets: list) -> tuple:
+        raw = pd.read_csv(DEFAULT_INPUT_PATH, dtype=RAW_DTYPES, nrows=len(targets))
+        raw["Target"] = targets
+        raw.to_csv(self.path, index=False)
+        return _load_labeled_rows(self.path)
+
+    def test_unknown_outcomes_are_skipped(self) -> None:
+        with self.assertLogs("train_model", "WARNING") as logs:
+            features, labels = self.load(["Graduate", "Graduated", " enrolled ", None, "Dropout"])
+
+        self.assertEqual(labels.tolist(), ["safe", "at_risk", "dropout"])
+        self.assertEqual(len(features), 3)
+        self.assertIn("Skipping 2 of 5 rows", logs.output[0])
+
+    def test_no_known_outcome_is_an_error(self) -> None:
+        with self.assertLogs("train_model", "WARNING"), self.assertRaises(ValueError):
+            self.load(["Graduated", "unknown"])
+
+
+if __name__ == "__main__":
+    unittest.main()
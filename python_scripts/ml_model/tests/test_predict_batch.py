@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import math
+import tempfile
+import unittest
+from pathlib import Path
+
+from predict import MODEL_REGISTRY, predict_batch
+from tests.toy_model import toy_records, train_toy_model
+
+
+class StrictBatchValidationTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls._tmp = tempfile.TemporaryDirectory()
+        cls.model_path = train_toy_model(Path(cls._tmp.name) / "toy.joblib")
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        MODEL_REGISTRY.evict(cls.model_path)
+        cls._tmp.cleanup()
+
+    def score(self, items: list) -> list:
+        return predict_batch(items, model_path=self.model_path, strict=True)["results"]
+
+    def test_null_binary_and_nan_numeric_are_scored(self) -> None:
+        null_binary, nan_numeric = toy_records(2)
+        null_binary["internet_access"] = None
+        nan_numeric["family_income"] = math.nan
+
+        results = self.score([null_binary, nan_numeric])
+
+        for result in results:
+            self.assertNotIn("errors", result)
+            self.assertIn("prediction", result)
+
+    def test_rejected_rows_carry_their_errors(self) -> None:
+        valid, missing, out_of_range = toy_records(3)
+        del missing["gpa"]
+        out_of_range["attendance_rate"] = 140
+
+        results = self.score([valid, missing, out_of_range, "not an object"])
+
+        self.assertIn("prediction", results[0])
+        self.assertEqual(results[1]["errors"], ["Missing feature 'gpa'"])
+        self.assertEqual(results[2]["errors"], ["Feature 'attendance_rate' must be <= 100"])
+        self.assertEqual(results[3]["errors"], ["Item must be an object of feature values"])
+        self.assertTrue(all("prediction" not in result for result in results[1:]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import math
+import unittest
+import warnings
+
+import pandas as pd
+
+from features import FEATURE_NAME_INDEX
+from preprocess import DEFAULT_INPUT_PATH, RAW_DTYPES, check_engine_parity, transform_dataset
+
+
+def _raw_sample(rows: int) -> pd.DataFrame:
+    raw = pd.read_csv(DEFAULT_INPUT_PATH, dtype=RAW_DTYPES, nrows=rows)
+    numeric = raw.select_dtypes("number").columns
+    return raw.astype(dict.fromkeys(numeric, "float64"))
+
+
+class EngineParityTest(unittest.TestCase):
+    def assert_parity(self, raw: pd.DataFrame) -> None:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", RuntimeWarning)
+            check_engine_parity(raw)
+
+    def test_dataset_sample_with_bad_rows(self) -> None:
+        raw = pd.read_csv(DEFAULT_INPUT_PATH, dtype=RAW_DTYPES).sample(500, random_state=0)
+        bad = _raw_sample(6)
+        bad.loc[0, ["Age at enrollment", "Gender", "Displaced"]] = math.nan
+        bad.loc[1, "Course"] = None
+        bad.loc[1, "Target"] = None
+        bad.loc[2, ["Curricular units 1st sem (grade)", "Curricular units 2nd sem (approved)"]] = math.inf
+        bad.loc[3, "Curricular units 2nd sem (enrolled)"] = -math.inf
+        bad.loc[4, ["Age at enrollment", "Curricular units 1st sem (grade)"]] = [140.0, 35.0]
+        bad.loc[5, ["Age at enrollment", "Curricular units 2nd sem (evaluations)", "Gender"]] = [-3.0, -10.0, 7.0]
+        self.assert_parity(pd.concat([raw, bad], ignore_index=True))
+
+    def test_missing_and_infinite_cells(self) -> None:
+        raw = _raw_sample(4)
+        raw.loc[0, "Age at enrollment"] = math.nan
+        raw.loc[1, "Curricular units 1st sem (enrolled)"] = math.inf
+        raw.loc[2, "Curricular units 1st sem (evaluations)"] = -math.inf
+        raw.loc[3, "Curricular units 2nd sem (grade)"] = math.nan
+        self.assert_parity(raw)
+        self.assertEqual(transform_dataset(raw).loc[0, "age"], FEATURE_NAME_INDEX["age"].default)
+
+
+if __name__ == "__main__":
+    unittest.main()
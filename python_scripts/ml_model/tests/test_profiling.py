@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from profiling import Profiler
+
+
+class ConcurrentProfileTest(unittest.TestCase):
+    def test_overlapping_deterministic_profiles_fall_back_to_sampling(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            profiler = Profiler(profile_dir=tmp)
+            inside = threading.Barrier(2, timeout=5)
+
+            def profiled_call(value: int) -> tuple:
+                with profiler.profile("concurrent", "deterministic") as info:
+                    inside.wait()
+                    result = value * 2
+                return result, info["mode"], info["name"]
+
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                outcomes = list(pool.map(profiled_call, (1, 2)))
+
+        self.assertEqual([result for result, _, _ in outcomes], [2, 4])
+        self.assertEqual(sorted(mode for _, mode, _ in outcomes), ["deterministic", "sampling"])
+        self.assertTrue(all(name is not None for _, _, name in outcomes))
+
+    def test_unwritable_profile_does_not_fail_the_call(self) -> None:
+        with tempfile.NamedTemporaryFile() as not_a_directory:
+            profiler = Profiler(profile_dir=not_a_directory.name)
+            result, name = profiler.call("unwritable", "deterministic", sum, (1, 2, 3))
+
+        self.assertEqual((result, name), (6, None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import sqlite3
+import tempfile
+import unittest
+from contextlib import closing
+from pathlib import Path
+from unittest import mock
+
+import rescore
+
+
+class SqliteSourceTest(unittest.TestCase):
+    def test_reads_every_row_in_chunks_and_closes_the_connection(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "students.db"
+            with closing(sqlite3.connect(path)) as connection, connection:
+                connection.execute("CREATE TABLE students (id INTEGER PRIMARY KEY, gpa REAL)")
+                connection.executemany("INSERT INTO students VALUES (?, ?)", [(i, i / 10) for i in range(25)])
+
+            opened = []
+            connect = sqlite3.connect
+
+            def tracking_connect(*args, **kwargs):
+                opened.append(connect(*args, **kwargs))
+                return opened[-1]
+
+            with mock.patch.object(rescore.sqlite3, "connect", tracking_connect):
+                chunks = list(rescore._read_sqlite(path, chunk_rows=10))
+
+            self.assertEqual([len(chunk) for chunk in chunks], [10, 10, 5])
+            self.assertEqual([int(i) for chunk in chunks for i in chunk["id"]], list(range(25)))
+            with self.assertRaises(sqlite3.ProgrammingError):
+                opened[0].execute("SELECT 1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+import unittest
+
+from result_cache import PredictionCache, feature_digest
+
+
+class PredictionCacheTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.cache = PredictionCache(max_entries=10)
+        self.digest = feature_digest({"age": 20, "gpa": 3.1})
+
+    def test_new_fingerprint_drops_the_previous_version(self) -> None:
+        self.cache.put("rf.joblib", "v1", "sklearn", self.digest, {"prediction": "safe"})
+        self.cache.put("rf.joblib", "v1", "flat", self.digest, {"prediction": "safe"})
+        self.cache.put("lr.joblib", "v1", "sklearn", self.digest, {"prediction": "at_risk"})
+
+        self.assertIsNone(self.cache.get("rf.joblib", "v2", "sklearn", self.digest))
+
+        stats = self.cache.stats()
+        self.assertEqual(stats["invalidations"], 2)
+        self.assertEqual(stats["entries"], 1)
+        self.assertEqual(self.cache.get("lr.joblib", "v1", "sklearn", self.digest), {"prediction": "at_risk"})
+
+    def test_result_for_a_replaced_version_is_not_stored(self) -> None:
+        self.cache.get("rf.joblib", "v2", "sklearn", self.digest)
+        self.cache.put("rf.joblib", "v1", "sklearn", self.digest, {"prediction": "safe"})
+
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+    def test_least_recently_used_entries_are_evicted(self) -> None:
+        cache = PredictionCache(max_entries=2)
+        for index in range(3):
+            cache.put("rf.joblib", "v1", "sklearn", str(index), {"index": index})
+
+        self.assertIsNone(cache.get("rf.joblib", "v1", "sklearn", "0"))
+        self.assertEqual(cache.get("rf.joblib", "v1", "sklearn", "2"), {"index": 2})
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from stage_cache import StageCache
+
+
+class StageCacheRetentionTest(unittest.TestCase):
+    def test_keeps_the_most_recently_used_entries_per_label(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = StageCache(tmp, max_entries=2)
+            keys = [cache.key("fit:toy", {"params": index}) for index in range(3)]
+            other = cache.key("fit:other", {"params": 0})
+            cache.store(other, "other")
+            for index, key in enumerate(keys[:2]):
+                cache.store(key, index)
+                os.utime(cache._path(key), ns=(index, index))
+
+            self.assertEqual(cache.run(keys[0], lambda: None), (0, True))
+            cache.store(keys[2], 2)
+
+            self.assertEqual(cache.run(keys[1], lambda: "recomputed"), ("recomputed", False))
+            self.assertEqual(cache.run(keys[2], lambda: None), (2, True))
+            self.assertEqual(cache.run(other, lambda: None), ("other", True))
+            self.assertEqual(len(list((Path(tmp) / "fit" / "toy").glob("*.joblib"))), 2)
+
+            cache.clear()
+            self.assertFalse(Path(tmp).exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
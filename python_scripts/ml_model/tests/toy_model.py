@@ -0,0 +1,47 @@
+"""A small model trained on synthetic rows, for tests that need a real payload."""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import LabelEncoder
+
+from artifacts import dump_atomic
+from features import ensure_feature_order, normalize_frame
+from train_model import _build_pipeline, _model_payload, _train_model
+
+
+def toy_records(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = np.random.default_rng(seed)
+    return [
+        ensure_feature_order(
+            {
+                "age": int(rng.integers(17, 40)),
+                "gender": str(rng.choice(["male", "female", "other"])),
+                "gpa": float(rng.uniform(0, 4)),
+                "attendance_rate": float(rng.uniform(30, 100)),
+                "previous_failures": int(rng.integers(0, 5)),
+                "internet_access": bool(rng.integers(0, 2)),
+                "course_of_study": str(rng.choice(["course_1", "course_2", "course_3"])),
+                "semester": int(rng.integers(1, 9)),
+            }
+        )
+        for _ in range(count)
+    ]
+
+
+def train_toy_model(path: Path | str, estimator: Any = None, rows: int = 300) -> Path:
+    """Fit ``estimator`` (a small random forest by default) and export it to ``path``."""
+    frame = normalize_frame(pd.DataFrame(toy_records(rows)))
+    risk = frame["previous_failures"] - frame["gpa"] + (100 - frame["attendance_rate"]) / 25
+    labels = np.select([risk > 2, risk > 0], ["dropout", "at_risk"], "safe")
+    label_encoder = LabelEncoder().fit(labels)
+
+    estimator = estimator if estimator is not None else RandomForestClassifier(n_estimators=8, max_depth=6, random_state=0)
+    pipeline = _train_model(_build_pipeline(estimator), frame, label_encoder.transform(labels))
+    payload = _model_payload(pipeline, label_encoder, {}, {"macro_f1": 0.0}, parity_frame=frame.head(50))
+    return dump_atomic(payload, Path(path))
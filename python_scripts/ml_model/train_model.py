@@ -1,31 +1,66 @@
 from __future__ import annotations
 
+import inspect
 import json
 import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
 
-import joblib
 import numpy as np
 import pandas as pd
+import sklearn
+from sklearn.base import clone
 from sklearn.compose import ColumnTransformer
 from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import SGDClassifier
 from sklearn.metrics import accuracy_score, classification_report, f1_score, precision_score, recall_score
 from sklearn.model_selection import train_test_split
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import LabelEncoder, OneHotEncoder, StandardScaler
 from sklearn.tree import DecisionTreeClassifier
+from sklearn.utils.class_weight import compute_sample_weight
 
+from artifacts import (
+    compact_artifact_path,
+    dump_atomic,
+    load_artifact,
+    measure_load_seconds,
+    measure_resident_memory,
+    mmap_artifact_path,
+    write_compact_artifact,
+    write_mmap_artifact,
+)
+from compiled import compile_payload
 from features import (
     SCHEMA,
     aggregate_feature_importances,
+    base_feature_name,
     get_binary_feature_names,
     get_categorical_feature_names,
     get_feature_names,
     get_numeric_feature_names,
+    normalize_frame,
     serialize_feature_schema,
 )
-from preprocess import CANONICAL_TARGET_COLUMN, preprocess_data
+from forest import FlatForest
+from manifest import write_manifest
+from preprocess import (
+    CANONICAL_TARGET_COLUMN,
+    DEFAULT_INPUT_PATH,
+    RAW_DTYPES,
+    TARGET_COLUMN,
+    known_targets,
+    preprocess_data,
+    transform_dataset,
+)
+from profiling import PROFILE_MODES, profiled
+from registry import content_hash
+from stage_cache import StageCache, code_version
 
 
 BASE_DIR = Path(__file__).resolve().parent
@@ -33,18 +68,34 @@ MODELS_DIR = BASE_DIR / "models"
 PROCESSED_DATA_PATH = BASE_DIR.parent / "processed_data.csv"
 LOG_PATH = MODELS_DIR / "training.log"
 METRICS_PATH = MODELS_DIR / "model_metrics.json"
+CACHE_DIR = MODELS_DIR / "cache"
+
+# Modules whose source is part of the cache key of the preprocess and export stages.
+_PREPROCESS_MODULES = ("preprocess.py", "features.py", "feature_schema.json")
+_EXPORT_MODULES = ("compiled.py", "forest.py", "artifacts.py", "features.py")
+
+# Largest macro-F1 drop from the full model a compact export may take.
+DEFAULT_COMPACT_TOLERANCE = 0.01
+# Tree counts tried when compacting a forest, and pruning strengths tried for a single tree.
+_COMPACT_TREE_COUNTS = (10, 25, 50, 100, 150, 200)
+_COMPACT_CCP_STEPS = 12
+
+# Trees grown on new data per incremental forest update; as many of the oldest are retired.
+DEFAULT_UPDATE_TREES = 30
+# Fraction of the newly labeled rows held out to score incremental updates.
+DEFAULT_UPDATE_HOLDOUT = 0.2
 
 logger = logging.getLogger(__name__)
 
 
-def _configure_logging() -> None:
+def _configure_logging(mode: str = "w") -> None:
     MODELS_DIR.mkdir(parents=True, exist_ok=True)
     logging.basicConfig(
         level=logging.INFO,
         format="%(asctime)s [%(levelname)s] %(name)s - %(message)s",
         handlers=[
             logging.StreamHandler(),
-            logging.FileHandler(LOG_PATH, mode="w", encoding="utf-8"),
+            logging.FileHandler(LOG_PATH, mode=mode, encoding="utf-8"),
         ],
     )
 
@@ -117,26 +168,194 @@ def _evaluate_model(
     return metrics
 
 
+def _model_payload(
+    pipeline: Pipeline,
+    label_encoder,
+    feature_importances: Dict[str, float],
+    metrics: Dict[str, float],
+    parity_frame: pd.DataFrame | None = None,
+) -> Dict[str, Any]:
+    model_payload = compile_payload(
+        {
+            "model": pipeline,
+            "label_encoder": label_encoder,
+            "feature_names": get_feature_names(),
+            "feature_schema": SCHEMA,
+            "feature_importances": feature_importances,
+            "metrics": metrics,
+            "target_categories": label_encoder.classes_.tolist(),
+        },
+        parity_frame=parity_frame,
+    )
+    model_payload["inference_engine"] = "flat" if model_payload["flat_forest"] is not None else "sklearn"
+    return model_payload
+
+
 def _export_model(
     name: str,
     pipeline: Pipeline,
     label_encoder,
     feature_importances: Dict[str, float],
     metrics: Dict[str, float],
-) -> None:
-    model_payload = {
-        "model": pipeline,
-        "label_encoder": label_encoder,
-        "feature_names": get_feature_names(),
-        "feature_schema": SCHEMA,
-        "feature_importances": feature_importances,
-        "metrics": metrics,
-        "target_categories": label_encoder.classes_.tolist(),
-    }
+    parity_frame: pd.DataFrame | None = None,
+    mmap_artifact: bool = False,
+) -> List[Path]:
+    model_payload = _model_payload(pipeline, label_encoder, feature_importances, metrics, parity_frame)
 
     output_path = MODELS_DIR / f"{name}.joblib"
-    joblib.dump(model_payload, output_path)
+    dump_atomic(model_payload, output_path)
     logger.info("Saved %s model to %s", name, output_path)
+    written = [output_path]
+
+    if mmap_artifact:
+        mmap_path = write_mmap_artifact(model_payload, output_path)
+        if mmap_path is not None:
+            logger.info("Saved %s memory-mapped serving artifact to %s", name, mmap_path)
+            _log_memory_savings(name, output_path, mmap_path)
+            written.append(mmap_path)
+
+    return written
+
+
+def _compact_candidates(classifier, encoded_train: np.ndarray, y_train: np.ndarray) -> Iterator[Tuple[Dict[str, Any], FlatForest]]:
+    """Smaller flattened versions of ``classifier`` with the parameters that produced them.
+
+    Forests are cut to fewer trees; single trees are refitted with
+    cost-complexity pruning at quantiles of their pruning path.
+    """
+    if isinstance(classifier, RandomForestClassifier):
+        for n_trees in _COMPACT_TREE_COUNTS:
+            if n_trees < len(classifier.estimators_):
+                yield {"n_trees": n_trees}, FlatForest.from_estimator(classifier, n_trees=n_trees)
+    elif isinstance(classifier, DecisionTreeClassifier):
+        ccp_alphas = classifier.cost_complexity_pruning_path(encoded_train, y_train).ccp_alphas
+        if len(ccp_alphas) < 2:
+            # A tree that is already a single leaf has nothing to prune; the unpruned tree stays.
+            return
+        # The largest alpha prunes the tree to its root.
+        for alpha in np.unique(np.quantile(ccp_alphas[:-1], np.linspace(0, 1, _COMPACT_CCP_STEPS)))[1:]:
+            pruned = clone(classifier).set_params(ccp_alpha=float(alpha)).fit(encoded_train, y_train)
+            yield {"ccp_alpha": float(alpha)}, FlatForest.from_estimator(pruned)
+
+
+def _forest_summary(forest: FlatForest, encoded_test: np.ndarray, y_test: np.ndarray) -> Dict[str, Any]:
+    y_pred = forest.predict_proba(encoded_test).argmax(axis=1)
+    return {
+        "n_trees": forest.n_trees,
+        "n_nodes": forest.n_nodes,
+        "forest_bytes": forest.nbytes,
+        "macro_f1": float(f1_score(y_test, y_pred, average="macro", zero_division=0)),
+    }
+
+
+def _single_row_latency_ms(forest: FlatForest, encoded_rows: np.ndarray) -> float:
+    samples = []
+    for row in encoded_rows[:200]:
+        started = time.perf_counter()
+        forest.predict_proba(row[np.newaxis, :])
+        samples.append(time.perf_counter() - started)
+    return float(np.median(samples) * 1000)
+
+
+def _export_compact_model(
+    name: str,
+    pipeline: Pipeline,
+    label_encoder,
+    feature_importances: Dict[str, float],
+    metrics: Dict[str, Any],
+    X_train: pd.DataFrame,
+    y_train: np.ndarray,
+    X_test: pd.DataFrame,
+    y_test: np.ndarray,
+    tolerance: float = DEFAULT_COMPACT_TOLERANCE,
+    compress: int = 0,
+) -> Dict[str, Any]:
+    """Write ``<name>.compact.joblib`` and report the full and compact variants.
+
+    The compact forest is the smallest candidate of ``_compact_candidates``
+    whose held-out macro-F1 is within ``tolerance`` of the full model, stored
+    with float32 thresholds and leaf values. Because the candidate is picked
+    on the held-out split, its reported macro-F1 is the selection score, not
+    an independent estimate. Returns ``{"outputs": ..., "variants": ...}``
+    with size, load time, single-row latency and macro-F1 per variant, plus
+    every candidate that was scored.
+    """
+    model_payload = _model_payload(pipeline, label_encoder, feature_importances, metrics, X_test)
+    full_forest = model_payload["flat_forest"]
+    if full_forest is None:
+        logger.warning("Skipping compact export for %s: model cannot be flattened", name)
+        return {"outputs": {}, "variants": {}}
+
+    preprocessor = pipeline.named_steps["preprocessor"]
+    encoded_train = np.asarray(preprocessor.transform(X_train), dtype=np.float32)
+    encoded_test = np.asarray(preprocessor.transform(X_test), dtype=np.float32)
+    target_f1 = metrics["macro_f1"] - tolerance
+
+    chosen = full_forest.to_float32()
+    chosen_details = {"reduction": {}, **_forest_summary(chosen, encoded_test, y_test)}
+    candidates = [chosen_details]
+    for params, forest in _compact_candidates(pipeline.named_steps["classifier"], encoded_train, y_train):
+        forest = forest.to_float32()
+        details = {"reduction": params, **_forest_summary(forest, encoded_test, y_test)}
+        candidates.append(details)
+        if details["macro_f1"] >= target_f1 and forest.nbytes < chosen.nbytes:
+            chosen, chosen_details = forest, details
+    logger.info(
+        "Compact %s: %s (%s nodes, macro-F1 %.4f vs %.4f full)",
+        name,
+        chosen_details["reduction"] or "full size",
+        chosen.n_nodes,
+        chosen_details["macro_f1"],
+        metrics["macro_f1"],
+    )
+
+    full_path = MODELS_DIR / f"{name}.joblib"
+    compact_path = write_compact_artifact(
+        model_payload, chosen, full_path, {**chosen_details, "tolerance": tolerance, "compress": compress}, compress
+    )
+    if compact_path is None:
+        return {"outputs": {}, "variants": {}}
+    logger.info("Saved %s compact serving artifact to %s", name, compact_path)
+
+    variants = {}
+    for variant, path, forest, macro_f1 in (
+        ("full", full_path, full_forest, metrics["macro_f1"]),
+        ("compact", compact_path, chosen, chosen_details["macro_f1"]),
+    ):
+        variants[variant] = {
+            "path": path.name,
+            "size_bytes": path.stat().st_size,
+            "load_seconds": round(measure_load_seconds(path), 4),
+            "latency_p50_ms": round(_single_row_latency_ms(forest, encoded_test), 4),
+            "macro_f1": macro_f1,
+            "n_trees": forest.n_trees,
+            "n_nodes": forest.n_nodes,
+        }
+    variants["compact"].update(reduction=chosen_details["reduction"], tolerance=tolerance, compress=compress)
+    variants["candidates"] = candidates
+    return {
+        "outputs": {compact_path.name: (compact_path.stat().st_size, compact_path.stat().st_mtime_ns)},
+        "variants": variants,
+    }
+
+
+def _log_memory_savings(name: str, full_path: Path, mmap_path: Path) -> None:
+    full = measure_resident_memory(full_path)
+    mapped = measure_resident_memory(mmap_path)
+    if full is None or mapped is None:
+        logger.info("Resident memory for %s could not be measured on this platform", name)
+        return
+
+    mib = 1024 * 1024
+    logger.info(
+        "Resident memory for %s: full payload %.1f MiB private; memory-mapped %.1f MiB private "
+        "+ %.1f MiB shared page cache; saves %.1f MiB per additional worker",
+        name,
+        full["RssAnon"] / mib,
+        mapped["RssAnon"] / mib,
+        mapped["RssFile"] / mib,
+        (full["RssAnon"] - mapped["RssAnon"]) / mib,
+    )
 
 
 def _json_default(obj):
@@ -151,64 +370,706 @@ def _save_metrics(all_metrics: Dict[str, Dict[str, float]]) -> None:
     with METRICS_PATH.open("w", encoding="utf-8") as fp:
         json.dump(all_metrics, fp, indent=2, default=_json_default)
     logger.info("Wrote training metrics to %s", METRICS_PATH)
+    # Written last: the serving index treats a new manifest as "these exports are complete".
+    write_manifest(MODELS_DIR, all_metrics)
 
 
-def train_and_save_models() -> None:
-    _configure_logging()
+@contextmanager
+def _timed(timings: Dict[str, float], stage: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = round(time.perf_counter() - started, 4)
 
-    logger.info("Starting preprocessing pipeline")
-    processed_df = preprocess_data()
 
+def _build_models(n_jobs: int | None = None) -> Dict[str, Any]:
+    return {
+        "random_forest": RandomForestClassifier(
+            n_estimators=300, max_depth=None, min_samples_split=2, random_state=42, n_jobs=n_jobs
+        ),
+        "decision_tree": DecisionTreeClassifier(
+            max_depth=12, min_samples_split=25, random_state=42
+        ),
+    }
+
+
+def _split_dataset(processed_df: pd.DataFrame):
     X = processed_df.drop(columns=[CANONICAL_TARGET_COLUMN])
     y = processed_df[CANONICAL_TARGET_COLUMN].values
 
-    from sklearn.preprocessing import LabelEncoder
-
     label_encoder = LabelEncoder()
     y_encoded = label_encoder.fit_transform(y)
 
     X_train, X_test, y_train, y_test = train_test_split(
         X, y_encoded, test_size=0.2, random_state=42, stratify=y_encoded
     )
+    return X_train, X_test, y_train, y_test, label_encoder
 
-    models = {
-        "random_forest": RandomForestClassifier(
-            n_estimators=300, max_depth=None, min_samples_split=2, random_state=42
-        ),
-        "decision_tree": DecisionTreeClassifier(
-            max_depth=12, min_samples_split=25, random_state=42
-        ),
-    }
 
-    all_metrics: Dict[str, Dict[str, float]] = {}
+def _source(*functions) -> str:
+    return "\n".join(inspect.getsource(function) for function in functions)
 
-    serialize_feature_schema(MODELS_DIR / "feature_schema.json")
 
-    for name, estimator in models.items():
-        logger.info("Training %s model", name)
-        pipeline = _build_pipeline(estimator)
-        trained_pipeline = _train_model(pipeline, X_train, y_train)
+def _hyperparameters(estimator) -> Dict[str, Any]:
+    # n_jobs changes how a model is fitted, not the fitted model.
+    params = {key: value for key, value in estimator.get_params().items() if key != "n_jobs"}
+    return {"estimator": type(estimator).__name__, "params": params}
 
+
+def _outputs_intact(outputs: Dict[str, Tuple[int, int]]) -> bool:
+    for name, signature in outputs.items():
+        path = MODELS_DIR / name
+        if not path.exists():
+            return False
+        stat = path.stat()
+        if (stat.st_size, stat.st_mtime_ns) != tuple(signature):
+            return False
+    return True
+
+
+def _run_model(
+    name: str,
+    estimator,
+    split_key: str,
+    X_train: pd.DataFrame,
+    X_test: pd.DataFrame,
+    y_train: np.ndarray,
+    y_test: np.ndarray,
+    label_encoder,
+    cache: StageCache,
+    mmap_artifacts: bool = False,
+    compact: bool = False,
+    compact_tolerance: float = DEFAULT_COMPACT_TOLERANCE,
+    compress: int = 0,
+) -> Tuple[str, Dict[str, Any], Dict[str, float], List[str]]:
+    """Fit, evaluate and export one model; runs in a worker process in parallel mode.
+
+    Each stage is looked up in ``cache`` first. The fitted pipeline is only
+    loaded or fitted when a downstream stage actually needs it.
+    """
+    timings: Dict[str, float] = {"fit": 0.0}
+    cached_stages: List[str] = []
+    fit_key = cache.key(
+        f"fit:{name}",
+        {
+            "data": split_key,
+            "hyperparameters": _hyperparameters(estimator),
+            "code": _source(_build_preprocessor, _build_pipeline, _train_model),
+            "sklearn": sklearn.__version__,
+        },
+    )
+    fitted: Dict[str, Pipeline] = {}
+
+    def trained_pipeline() -> Pipeline:
+        if "pipeline" not in fitted:
+            def fit() -> Pipeline:
+                logger.info("Training %s model", name)
+                return _train_model(_build_pipeline(estimator), X_train, y_train)
+
+            with _timed(timings, "fit"):
+                fitted["pipeline"], hit = cache.run(fit_key, fit)
+            if hit:
+                cached_stages.append("fit")
+        return fitted["pipeline"]
+
+    def evaluate() -> Dict[str, Any]:
+        pipeline = trained_pipeline()
         logger.info("Evaluating %s model", name)
-        metrics = _evaluate_model(trained_pipeline, X_test, y_test, label_encoder)
-        all_metrics[name] = metrics
+        return _evaluate_model(pipeline, X_test, y_test, label_encoder)
 
-        preprocessor = trained_pipeline.named_steps["preprocessor"]
-        classifier = trained_pipeline.named_steps["classifier"]
-        feature_importances: Dict[str, float] = {}
+    def importance() -> Dict[str, float]:
+        pipeline = trained_pipeline()
+        preprocessor = pipeline.named_steps["preprocessor"]
+        classifier = pipeline.named_steps["classifier"]
+        if not hasattr(classifier, "feature_importances_"):
+            return {}
+        aggregated = aggregate_feature_importances(
+            preprocessor.get_feature_names_out(), classifier.feature_importances_
+        )
+        return dict(aggregated)
 
-        if hasattr(classifier, "feature_importances_"):
-            transformed_names = preprocessor.get_feature_names_out()
-            aggregated = aggregate_feature_importances(
-                transformed_names, classifier.feature_importances_
+    evaluate_key = cache.key(
+        f"evaluate:{name}", {"model": fit_key.digest, "code": _source(_evaluate_model)}
+    )
+    importance_key = cache.key(
+        f"importance:{name}",
+        {"model": fit_key.digest, "code": _source(base_feature_name, aggregate_feature_importances)},
+    )
+
+    for stage, key, compute in (("evaluate", evaluate_key, evaluate), ("importance", importance_key, importance)):
+        started, fit_before = time.perf_counter(), timings["fit"]
+        value, hit = cache.run(key, compute)
+        # Time spent fitting on behalf of this stage is reported under "fit".
+        timings[stage] = round(time.perf_counter() - started - (timings["fit"] - fit_before), 4)
+        if hit:
+            cached_stages.append(stage)
+        if stage == "evaluate":
+            metrics = value
+        else:
+            feature_importances = value
+
+    def export() -> Dict[str, Tuple[int, int]]:
+        written = _export_model(
+            name,
+            trained_pipeline(),
+            label_encoder,
+            feature_importances,
+            metrics,
+            parity_frame=X_test,
+            mmap_artifact=mmap_artifacts,
+        )
+        return {path.name: (path.stat().st_size, path.stat().st_mtime_ns) for path in written}
+
+    export_key = cache.key(
+        f"export:{name}",
+        {
+            "model": fit_key.digest,
+            "metrics": evaluate_key.digest,
+            "importances": importance_key.digest,
+            "mmap": mmap_artifacts,
+            "code": code_version(BASE_DIR / module for module in _EXPORT_MODULES) + _source(_model_payload, _export_model),
+        },
+    )
+    with _timed(timings, "export"):
+        _, hit = cache.run(export_key, export, validate=_outputs_intact)
+    if hit:
+        cached_stages.append("export")
+
+    if compact:
+        compact_key = cache.key(
+            f"compact:{name}",
+            {
+                "export": export_key.digest,
+                "tolerance": compact_tolerance,
+                "compress": compress,
+                "code": code_version(BASE_DIR / module for module in _EXPORT_MODULES)
+                + _source(_compact_candidates, _forest_summary, _single_row_latency_ms, _export_compact_model),
+            },
+        )
+
+        def export_compact() -> Dict[str, Any]:
+            return _export_compact_model(
+                name,
+                trained_pipeline(),
+                label_encoder,
+                feature_importances,
+                metrics,
+                X_train,
+                y_train,
+                X_test,
+                y_test,
+                tolerance=compact_tolerance,
+                compress=compress,
+            )
+
+        with _timed(timings, "compact"):
+            compacted, hit = cache.run(
+                compact_key, export_compact, validate=lambda value: _outputs_intact(value["outputs"])
             )
-            feature_importances = dict(aggregated)
+        if hit:
+            cached_stages.append("compact")
+        metrics = {**metrics, "export_variants": compacted["variants"]}
 
-        _export_model(name, trained_pipeline, label_encoder, feature_importances, metrics)
+    return name, metrics, timings, cached_stages
 
+
+def _refresh_compact_model(
+    name: str,
+    pipeline: Pipeline,
+    label_encoder,
+    feature_importances: Dict[str, float],
+    metrics: Dict[str, Any],
+    X_train: pd.DataFrame,
+    y_train: np.ndarray,
+    X_test: pd.DataFrame,
+    y_test: np.ndarray,
+) -> Dict[str, Any]:
+    """Re-derive ``<name>.compact.joblib`` from a re-exported model, if one was exported before.
+
+    The tolerance and compression are those recorded in the existing
+    artifact. Returns its ``export_variants`` report, or ``{}`` when the
+    model has no compact artifact.
+    """
+    compact_path = compact_artifact_path(MODELS_DIR / f"{name}.joblib")
+    if not compact_path.exists():
+        return {}
+    details = load_artifact(compact_path).get("compact", {})
+    return _export_compact_model(
+        name,
+        pipeline,
+        label_encoder,
+        feature_importances,
+        metrics,
+        X_train,
+        y_train,
+        X_test,
+        y_test,
+        tolerance=details.get("tolerance", DEFAULT_COMPACT_TOLERANCE),
+        compress=details.get("compress", 0),
+    )["variants"]
+
+
+def _prepare_split(cache: StageCache, stage_timings: Dict[str, float]):
+    """Preprocess and split the dataset through ``cache``.
+
+    Returns ``(split_key, (X_train, X_test, y_train, y_test, label_encoder),
+    cached_stages)`` and records the preprocess and split wall times.
+    """
+    preprocess_key = cache.key(
+        "preprocess",
+        {
+            "dataset": Path(DEFAULT_INPUT_PATH),
+            "schema": SCHEMA,
+            "code": code_version(BASE_DIR / module for module in _PREPROCESS_MODULES),
+            "pandas": pd.__version__,
+        },
+    )
+    split_key = cache.key("split", {"data": preprocess_key.digest, "code": _source(_split_dataset)})
+    cached_stages: List[str] = []
+
+    def preprocess() -> pd.DataFrame:
+        logger.info("Starting preprocessing pipeline")
+        return preprocess_data()
+
+    def split():
+        with _timed(stage_timings, "preprocess"):
+            processed_df, hit = cache.run(preprocess_key, preprocess)
+        if hit:
+            cached_stages.append("preprocess")
+            if not PROCESSED_DATA_PATH.exists():
+                processed_df.to_csv(PROCESSED_DATA_PATH, index=False)
+        return _split_dataset(processed_df)
+
+    stage_timings["preprocess"] = 0.0
+    with _timed(stage_timings, "split"):
+        split_outputs, hit = cache.run(split_key, split)
+    if hit:
+        cached_stages.append("split")
+    else:
+        stage_timings["split"] = round(stage_timings["split"] - stage_timings["preprocess"], 4)
+
+    return split_key, split_outputs, cached_stages
+
+
+@profiled("train")
+def train_and_save_models(
+    mmap_artifacts: bool = False,
+    parallel: bool = False,
+    max_workers: int | None = None,
+    n_jobs: int | None = None,
+    use_cache: bool = True,
+    compact: bool = False,
+    compact_tolerance: float = DEFAULT_COMPACT_TOLERANCE,
+    compress: int = 0,
+) -> None:
+    """Train every model in ``_build_models`` and export it.
+
+    With ``parallel`` each model is fitted, evaluated and exported in its own
+    worker process (``max_workers`` at most); ``n_jobs`` is passed to
+    estimators that parallelize internally. Estimators are seeded, so exports
+    are identical whichever mode is used. Per-stage wall times are written to
+    ``model_metrics.json`` under ``run.stage_timings`` and per model under
+    ``timings``.
+
+    Stage outputs are cached under ``models/cache`` keyed by the dataset
+    bytes, schema, hyperparameters and code they depend on, so only stages
+    whose inputs changed are re-run; ``use_cache=False`` (``--no-cache``)
+    recomputes all. The last ``STAGE_CACHE_MAX_ENTRIES`` outputs per stage
+    are kept; ``--clear-cache`` deletes the cache before the run.
+
+    ``compact`` also writes ``<model>.compact.joblib`` serving artifacts (see
+    ``_export_compact_model``) and records size, load time, latency and
+    macro-F1 per variant under ``export_variants``.
+
+    A ``PROFILE_SAMPLE_RATE`` fraction of runs, and every run called with
+    ``profile="deterministic"`` or ``"sampling"``, is profiled into
+    ``PROFILE_DIR`` (see ``profiling.Profiler``).
+    """
+    _configure_logging()
+    run_started = time.perf_counter()
+    stage_timings: Dict[str, float] = {}
+    cache = StageCache(CACHE_DIR, enabled=use_cache)
+
+    split_key, (X_train, X_test, y_train, y_test, label_encoder), cached_stages = _prepare_split(
+        cache, stage_timings
+    )
+
+    models = _build_models(n_jobs=n_jobs)
+    all_metrics: Dict[str, Any] = {}
+    model_timings: Dict[str, Dict[str, float]] = {}
+
+    serialize_feature_schema(MODELS_DIR / "feature_schema.json")
+
+    arguments = [
+        (
+            name,
+            estimator,
+            split_key.digest,
+            X_train,
+            X_test,
+            y_train,
+            y_test,
+            label_encoder,
+            cache,
+            mmap_artifacts,
+            compact,
+            compact_tolerance,
+            compress,
+        )
+        for name, estimator in models.items()
+    ]
+    with _timed(stage_timings, "models"):
+        if parallel:
+            workers = min(max_workers or os.cpu_count() or 1, len(models))
+            logger.info("Training %s models across %s worker processes", len(models), workers)
+            with ProcessPoolExecutor(max_workers=workers, initializer=_configure_logging, initargs=("a",)) as pool:
+                futures = [pool.submit(_run_model, *args) for args in arguments]
+                outcomes = [future.result() for future in futures]
+        else:
+            outcomes = [_run_model(*args) for args in arguments]
+
+    for name, metrics, timings, model_cached_stages in outcomes:
+        all_metrics[name] = {**metrics, "timings": timings, "cached_stages": model_cached_stages}
+        model_timings[name] = timings
+
+    stage_timings["total"] = round(time.perf_counter() - run_started, 4)
+    all_metrics["run"] = {
+        "parallel": parallel,
+        "max_workers": max_workers,
+        "n_jobs": n_jobs,
+        "stage_cache": use_cache,
+        "cached_stages": cached_stages,
+        "stage_timings": stage_timings,
+    }
     _save_metrics(all_metrics)
+    _log_timing_report(stage_timings, model_timings)
     logger.info("Training complete")
 
 
+def _log_timing_report(stage_timings: Dict[str, float], model_timings: Dict[str, Dict[str, float]]) -> None:
+    logger.info(
+        "Stage timings: %s",
+        ", ".join(f"{stage}={seconds:.2f}s" for stage, seconds in stage_timings.items()),
+    )
+    for name, timings in model_timings.items():
+        logger.info(
+            "  %s: %s", name, ", ".join(f"{stage}={seconds:.2f}s" for stage, seconds in timings.items())
+        )
+
+
+def _load_labeled_rows(path: Path | str) -> Tuple[pd.DataFrame, np.ndarray]:
+    """Newly labeled students as ``(features, labels)``.
+
+    Accepts rows in the ``dataset.csv`` layout (with ``Target``) or already
+    processed feature rows with a ``target`` column, as in
+    ``processed_data.csv``. Rows of the first layout whose ``Target`` is not
+    a known outcome are logged and skipped.
+    """
+    raw_df = pd.read_csv(path, dtype=RAW_DTYPES)
+    if TARGET_COLUMN in raw_df.columns:
+        known = known_targets(raw_df)
+        if not known.all():
+            logger.warning(
+                "Skipping %s of %s rows in %s with unknown outcomes %s",
+                int((~known).sum()),
+                len(raw_df),
+                path,
+                sorted({str(value) for value in raw_df.loc[~known, TARGET_COLUMN]}),
+            )
+            raw_df = raw_df[known]
+        if raw_df.empty:
+            raise ValueError(f"{path} has no rows with a known '{TARGET_COLUMN}'")
+        raw_df = transform_dataset(raw_df)
+    if CANONICAL_TARGET_COLUMN not in raw_df.columns:
+        raise ValueError(f"{path} has neither a '{TARGET_COLUMN}' nor a '{CANONICAL_TARGET_COLUMN}' column")
+    labels = raw_df[CANONICAL_TARGET_COLUMN].astype(str).str.strip().to_numpy()
+    return normalize_frame(raw_df), labels
+
+
+def _replay_sample(
+    X_train: pd.DataFrame, y_train: np.ndarray, rows: int, seed: int
+) -> Tuple[pd.DataFrame, np.ndarray]:
+    """A stratified sample of the original training rows, so updates keep every class in view."""
+    if rows <= 0:
+        return X_train.iloc[:0], y_train[:0]
+    if rows >= len(X_train):
+        return X_train, y_train
+    rows = max(rows, len(np.unique(y_train)))
+    _, X_replay, _, y_replay = train_test_split(
+        X_train, y_train, test_size=rows, random_state=seed, stratify=y_train
+    )
+    return X_replay, y_replay
+
+
+def _grow_forest(forest: RandomForestClassifier, encoded: np.ndarray, y: np.ndarray, new_trees: int) -> Dict[str, int]:
+    """Append ``new_trees`` trees fitted on ``encoded`` with ``warm_start``, then retire the oldest.
+
+    The forest keeps its size. Raises ``ValueError`` when ``y`` does not
+    contain every class of the forest: ``fit`` would reset ``classes_`` and
+    leave the existing trees voting for the wrong columns.
+    """
+    classes = forest.classes_
+    if not np.array_equal(np.unique(y), np.arange(len(classes))):
+        raise ValueError("Forest updates need rows of every class; add replay rows from the training set")
+
+    size = len(forest.estimators_)
+    forest.set_params(warm_start=True, n_estimators=size + new_trees)
+    forest.fit(encoded, y)
+    forest.estimators_ = forest.estimators_[new_trees:]
+    forest.set_params(warm_start=False, n_estimators=len(forest.estimators_))
+    return {"trees_added": new_trees, "trees_retired": new_trees}
+
+
+def _partial_fit_linear(classifier: SGDClassifier, encoded: np.ndarray, y: np.ndarray) -> Dict[str, int]:
+    # partial_fit rejects class_weight="balanced"; the same weighting is applied per update batch instead.
+    class_weight = classifier.class_weight
+    sample_weight = compute_sample_weight(class_weight, y) if class_weight is not None else None
+    classifier.set_params(class_weight=None)
+    try:
+        classifier.partial_fit(encoded, y, sample_weight=sample_weight)
+    finally:
+        classifier.set_params(class_weight=class_weight)
+    return {}
+
+
+def _incremental_step(classifier) -> Optional[str]:
+    if isinstance(classifier, RandomForestClassifier):
+        return "warm_start"
+    if hasattr(classifier, "partial_fit"):
+        return "partial_fit"
+    return None
+
+
+def _headline(metrics: Dict[str, Any]) -> Dict[str, float]:
+    return {key: metrics[key] for key in ("accuracy", "macro_f1")}
+
+
+def update_models(
+    new_data_path: Path | str,
+    model_names: Optional[Sequence[str]] = None,
+    new_trees: int = DEFAULT_UPDATE_TREES,
+    replay_rows: Optional[int] = None,
+    holdout_fraction: float = DEFAULT_UPDATE_HOLDOUT,
+    compare_full: bool = False,
+) -> Dict[str, Dict[str, Any]]:
+    """Refresh exported models with newly labeled students instead of retraining them.
+
+    The fitted preprocessor of each model is reused as is. Random forests
+    grow ``new_trees`` trees on the new rows and retire as many of their
+    oldest trees; models with ``partial_fit`` take one pass over the new
+    rows. Other models, such as the decision tree, are skipped: they need a
+    full retrain. Each update also sees ``replay_rows`` stratified rows of the
+    original training split (default: as many as there are new rows) so the
+    model does not drift towards the latest cohort alone.
+
+    Updates are scored on the original test split plus ``holdout_fraction``
+    of the new rows, before and after; ``compare_full`` also refits each model
+    from scratch on all training rows for reference. The new artifacts get
+    a ``lineage`` entry, and their ``.mmap``/``.compact`` variants are
+    rewritten if they exist.
+    """
+    _configure_logging("a")
+    run_started = time.perf_counter()
+    _, (X_train, X_test, y_train, y_test, label_encoder), _ = _prepare_split(StageCache(CACHE_DIR), {})
+
+    X_new, labels = _load_labeled_rows(new_data_path)
+    unknown = sorted(set(labels) - set(label_encoder.classes_))
+    if unknown:
+        raise ValueError(f"New rows have unknown outcomes {unknown}; a full retrain is required")
+    y_new = label_encoder.transform(labels)
+    _, counts = np.unique(y_new, return_counts=True)
+    X_update, X_holdout, y_update, y_holdout = train_test_split(
+        X_new,
+        y_new,
+        test_size=holdout_fraction,
+        random_state=42,
+        stratify=y_new if counts.min() >= 2 else None,
+    )
+    X_eval = pd.concat([X_test, X_holdout], ignore_index=True)
+    y_eval = np.concatenate([y_test, y_holdout])
+    source = {"path": Path(new_data_path).name, "hash": content_hash(new_data_path)}
+    # Seeded by the new data, so rerunning the same update replays the same rows.
+    X_replay, y_replay = _replay_sample(
+        X_train, y_train, len(X_update) if replay_rows is None else replay_rows, seed=int(source["hash"][:8], 16)
+    )
+    X_fit = pd.concat([X_update, X_replay], ignore_index=True)
+    y_fit = np.concatenate([y_update, y_replay])
+    logger.info(
+        "Updating models with %s new rows (%s held out) and %s replay rows",
+        len(X_update),
+        len(X_holdout),
+        len(X_replay),
+    )
+
+    all_metrics: Dict[str, Any] = {}
+    if METRICS_PATH.exists():
+        with METRICS_PATH.open("r", encoding="utf-8") as fp:
+            all_metrics = json.load(fp)
+
+    reports: Dict[str, Dict[str, Any]] = {}
+    for name in model_names or [name for name in _build_models() if (MODELS_DIR / f"{name}.joblib").exists()]:
+        model_path = MODELS_DIR / f"{name}.joblib"
+        model_payload = load_artifact(model_path)
+        if "model" not in model_payload:
+            raise ValueError(f"{model_path} is a serving artifact without a pipeline to update")
+        if list(model_payload["label_encoder"].classes_) != list(label_encoder.classes_):
+            raise ValueError(f"{name} was trained on different classes; a full retrain is required")
+
+        pipeline = model_payload["model"]
+        classifier = pipeline.named_steps["classifier"]
+        step = _incremental_step(classifier)
+        if step is None:
+            logger.info("Skipping %s: %s cannot be updated incrementally", name, type(classifier).__name__)
+            continue
+
+        started = time.perf_counter()
+        before = _evaluate_model(pipeline, X_eval, y_eval, label_encoder)
+        fit_started = time.perf_counter()
+        encoded = pipeline.named_steps["preprocessor"].transform(X_fit)
+        if step == "warm_start":
+            changes = _grow_forest(classifier, encoded, y_fit, new_trees)
+        else:
+            changes = _partial_fit_linear(classifier, encoded, y_fit)
+        fit_seconds = round(time.perf_counter() - fit_started, 4)
+        metrics = _evaluate_model(pipeline, X_eval, y_eval, label_encoder)
+
+        feature_importances = {}
+        if hasattr(classifier, "feature_importances_"):
+            feature_importances = dict(
+                aggregate_feature_importances(
+                    pipeline.named_steps["preprocessor"].get_feature_names_out(), classifier.feature_importances_
+                )
+            )
+        lineage = list(model_payload.get("lineage") or [{"mode": "full", "rows": len(X_train)}])
+        lineage.append(
+            {
+                "mode": step,
+                "updated_at": datetime.now(timezone.utc).isoformat(),
+                "parent_hash": content_hash(model_path),
+                "source": source,
+                "rows": len(X_update),
+                "replay_rows": len(X_replay),
+                **changes,
+            }
+        )
+
+        updated = _model_payload(pipeline, label_encoder, feature_importances, metrics, X_test)
+        updated["lineage"] = lineage
+        dump_atomic(updated, model_path)
+        if mmap_artifact_path(model_path).exists():
+            write_mmap_artifact(updated, model_path)
+        variants = _refresh_compact_model(
+            name, pipeline, label_encoder, feature_importances, metrics, X_train, y_train, X_eval, y_eval
+        )
+        seconds = round(time.perf_counter() - started, 4)
+
+        report = {
+            **lineage[-1],
+            "fit_seconds": fit_seconds,
+            "seconds": seconds,
+            "before": _headline(before),
+            "after": _headline(metrics),
+        }
+        if compare_full:
+            full_started = time.perf_counter()
+            full = _train_model(
+                _build_pipeline(clone(_build_models()[name])),
+                pd.concat([X_train, X_update], ignore_index=True),
+                np.concatenate([y_train, y_update]),
+            )
+            report["full_retrain"] = {
+                **_headline(_evaluate_model(full, X_eval, y_eval, label_encoder)),
+                "fit_seconds": round(time.perf_counter() - full_started, 4),
+            }
+        logger.info(
+            "Updated %s by %s in %.2fs (fit %.2fs): macro-F1 %.4f -> %.4f%s",
+            name,
+            step,
+            seconds,
+            fit_seconds,
+            before["macro_f1"],
+            metrics["macro_f1"],
+            f" (full retrain {report['full_retrain']['macro_f1']:.4f}, fit {report['full_retrain']['fit_seconds']:.2f}s)"
+            if compare_full
+            else "",
+        )
+
+        all_metrics[name] = {**metrics, "lineage": lineage, "incremental": report}
+        if variants:
+            all_metrics[name]["export_variants"] = variants
+        reports[name] = report
+
+    _save_metrics(all_metrics)
+    logger.info("Incremental update complete in %.2fs", time.perf_counter() - run_started)
+    return reports
+
+
 if __name__ == "__main__":
-    train_and_save_models()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train and export dropout prediction models")
+    parser.add_argument(
+        "--mmap",
+        action="store_true",
+        help="Also write <model>.mmap.joblib serving artifacts that load with mmap_mode='r'",
+    )
+    parser.add_argument("--parallel", action="store_true", help="Fit models in parallel worker processes")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes for --parallel")
+    parser.add_argument("--n-jobs", type=int, default=None, help="n_jobs for estimators that support it")
+    parser.add_argument("--no-cache", action="store_true", help="Recompute every stage instead of using models/cache")
+    parser.add_argument("--clear-cache", action="store_true", help="Delete models/cache before running")
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Also write <model>.compact.joblib serving artifacts (fewer trees or pruned, float32)",
+    )
+    parser.add_argument(
+        "--compact-tolerance",
+        type=float,
+        default=DEFAULT_COMPACT_TOLERANCE,
+        help="Largest macro-F1 drop allowed for --compact",
+    )
+    parser.add_argument("--compress", type=int, default=0, help="joblib zlib level (0-9) for --compact artifacts")
+    parser.add_argument(
+        "--profile",
+        choices=PROFILE_MODES,
+        default=None,
+        help="Profile this run and write the profile and a hot-function summary to PROFILE_DIR",
+    )
+    parser.add_argument(
+        "--incremental",
+        metavar="CSV",
+        type=Path,
+        default=None,
+        help="Update the exported models with newly labeled rows from CSV instead of retraining",
+    )
+    parser.add_argument("--models", nargs="+", default=None, help="Models to update with --incremental")
+    parser.add_argument("--update-trees", type=int, default=DEFAULT_UPDATE_TREES, help="Trees added and retired per forest update")
+    parser.add_argument("--replay-rows", type=int, default=None, help="Original training rows replayed per update")
+    parser.add_argument("--compare-full", action="store_true", help="Also fit each model from scratch and report both")
+    args = parser.parse_args()
+
+    if args.clear_cache:
+        StageCache(CACHE_DIR).clear()
+    if args.incremental is not None:
+        reports = update_models(
+            args.incremental,
+            model_names=args.models,
+            new_trees=args.update_trees,
+            replay_rows=args.replay_rows,
+            compare_full=args.compare_full,
+        )
+        print(json.dumps(reports, indent=2))
+    else:
+        train_and_save_models(
+            mmap_artifacts=args.mmap,
+            parallel=args.parallel,
+            max_workers=args.workers,
+            n_jobs=args.n_jobs,
+            use_cache=not args.no_cache,
+            compact=args.compact,
+            compact_tolerance=args.compact_tolerance,
+            compress=args.compress,
+            profile=args.profile,
+        )